@@ -7,10 +7,88 @@ class Settings(BaseSettings):
     # App
     APP_ENV: str = "dev"
     SECRET_KEY: str
-    JWT_EXPIRES_MIN: int = 1440
+    JWT_EXPIRES_MIN: int = 1440  # durata refresh token (= durata sessione)
+    ACCESS_TOKEN_EXPIRES_MIN: int = 15  # access token breve, rinnovato via /auth/refresh
+
+    # Cache identità utente (deps.get_current_user): evita una SELECT per request
+    AUTH_CACHE_TTL_SEC: int = 60
+    AUTH_CACHE_MAX: int = 1024
+
+    # bcrypt in un process pool dedicato (0 = inline) + coda limitata
+    HASH_POOL_SIZE: int = 2
+    HASH_QUEUE_MAX: int = 16
+    HASH_QUEUE_TIMEOUT_SEC: float = 5.0
+
+    # Throttle tentativi su /auth/login e /auth/register (finestra scorrevole)
+    LOGIN_THROTTLE_WINDOW_SEC: int = 300
+    LOGIN_MAX_ATTEMPTS_PER_IP: int = 30
+    LOGIN_MAX_FAILURES_PER_EMAIL: int = 5
+    # proxy fidati davanti all'app (Render: 1). L'IP del client è la voce di
+    # X-Forwarded-For aggiunta dall'ultimo proxy, contando da destra: quelle a
+    # sinistra le scrive il client e non valgono. 0 = IP della connessione.
+    TRUSTED_PROXY_HOPS: int = 0
 
     # DB
     DB_URL: str
+    # applica le migrazioni mancanti all'avvio (backend/app/migrations)
+    AUTO_MIGRATE: bool = True
+
+    # Pulizia periodica in background (services.maintenance): archivio slot passati, token reset
+    CLEANUP_WORKER: bool = True
+    CLEANUP_INTERVAL_SEC: int = 300
+    CLEANUP_BATCH_SIZE: int = 500
+    CLEANUP_MAX_BATCHES: int = 200  # per task e per giro: il resto al giro dopo
+
+    # /booking/availability: finestra di giorni se non si passano from/to
+    AVAILABILITY_WINDOW_DAYS: int = 28
+    AVAILABILITY_MAX_WINDOW_DAYS: int = 92
+    # /booking/availability/summary: cache in processo del riepilogo mensile
+    SUMMARY_CACHE_TTL_SEC: int = 30
+
+    # /booking/events (SSE): heartbeat, coda per connessione, storia per Last-Event-ID
+    EVENTS_HEARTBEAT_SEC: int = 15
+    EVENTS_QUEUE_MAX: int = 100
+    EVENTS_HISTORY: int = 1000
+
+    # /booking/changes: oltre queste righe cambiate il client ricarica tutto
+    CHANGES_MAX_ROWS: int = 1000
+
+    # Outbox email (services.outbox): le email si accodano nella transazione, le invia un thread
+    OUTBOX_WORKER: bool = True
+    OUTBOX_BATCH: int = 20  # righe prese per giro
+    OUTBOX_POLL_SEC: int = 5  # giro di sicurezza anche senza commit che svegliano il worker
+    OUTBOX_MAX_ATTEMPTS: int = 8  # poi FAILED
+    OUTBOX_BACKOFF_BASE_SEC: int = 30
+    OUTBOX_BACKOFF_MAX_SEC: int = 3600
+    OUTBOX_LEASE_SEC: int = 120  # un invio rimasto a metà (crash) si ritenta dopo questo tempo
+    OUTBOX_RETENTION_DAYS: int = 30  # righe SENT/FAILED eliminate dalla manutenzione
+
+    # Riepilogo per i manager (services.digest): le notifiche non urgenti si
+    # accumulano per destinatario e partono in un'unica email dopo la finestra
+    MANAGER_DIGEST_WINDOW_MIN: int = 10  # 0 = email subito, una per evento
+    MANAGER_DIGEST_URGENT: str = "producer_cancel,artist_cancel"  # eventi che non aspettano
+
+    # Invio di più email insieme (email_gmail.send_many, usato dall'outbox):
+    # batch HTTP di Gmail (un round-trip per GMAIL_BATCH_MAX email) o thread in parallelo
+    GMAIL_BATCH: bool = True
+    GMAIL_BATCH_MAX: int = 50
+    EMAIL_SEND_THREADS: int = 4
+
+    # Trasporto email (services.email_transport): auto | gmail | smtp | capture
+    # auto = gmail se configurato, altrimenti smtp se c'è SMTP_HOST, altrimenti capture
+    EMAIL_TRANSPORT: str = "auto"
+    SMTP_HOST: str | None = None
+    SMTP_PORT: int = 587
+    SMTP_USER: str | None = None
+    SMTP_PASSWORD: str | None = None
+    SMTP_STARTTLS: bool = True
+    SMTP_SSL: bool = False  # TLS implicito (di solito porta 465)
+    SMTP_POOL_SIZE: int = 2  # connessioni tenute aperte
+    SMTP_PIPELINING: bool = True  # se il server annuncia PIPELINING
+    SMTP_TIMEOUT_SEC: int = 30
+    # capture: email tenute in memoria e (opzionale) aggiunte a un file JSONL
+    EMAIL_CAPTURE_PATH: str | None = None
+    EMAIL_CAPTURE_MAX: int = 1000
 
     # Gmail / Calendar (possono essere None in dev: in quel caso si logga soltanto)
     GOOGLE_CLIENT_ID: str | None = None
@@ -23,6 +101,10 @@ class Settings(BaseSettings):
     # NB: lo usiamo per costruire i link del reset password -> /frontend/auth/reset.html
     PUBLIC_BASE_URL: str = "http://127.0.0.1:8000"
 
+    # Reset password: durata del link e massimo token attivi per utente
+    PASSWORD_RESET_TTL_MIN: int = 120
+    PASSWORD_RESET_MAX_PER_USER: int = 3
+
     # --- NEON API (card statistiche) ---
     NEON_API_KEY: str | None = None
     NEON_PROJECT_ID: str | None = None
@@ -32,6 +114,8 @@ class Settings(BaseSettings):
 
     # Email manager (opzionale): CSV/; o newline. Se vuoto -> fallback ai manager nel DB.
     MANAGER_EMAILS: str | None = None
+    # Destinatari (manager + opt-out) in cache per processo; rilettura al più ogni N secondi
+    RECIPIENTS_CACHE_TTL_SEC: int = 300
 
 
 settings = Settings()
\ No newline at end of file
@@ -0,0 +1,81 @@
+# backend/app/core/hashing.py
+"""
+bcrypt fuori dal threadpool di FastAPI.
+
+hash/verify sono CPU-bound e tengono il GIL: durante un picco di login
+affamano tutte le altre request. Qui li eseguiamo in un ProcessPool dedicato
+e limitato (HASH_POOL_SIZE processi + HASH_QUEUE_MAX in coda); chi non trova
+posto entro HASH_QUEUE_TIMEOUT_SEC riceve 503 invece di accodarsi all'infinito.
+Con HASH_POOL_SIZE=0 si torna al calcolo inline (utile in dev).
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from ..config import settings
+
+# istanza usata anche nei processi worker (il modulo viene re-importato con spawn)
+pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_executor: ProcessPoolExecutor | None = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(
+    max(1, settings.HASH_POOL_SIZE + settings.HASH_QUEUE_MAX)
+)
+
+
+def _hash(p: str) -> str:
+    return pwd.hash(p)
+
+
+def _verify(p: str, hashed: str) -> bool:
+    return pwd.verify(p, hashed)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: niente fork di un processo con thread e connessioni DB aperte
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.HASH_POOL_SIZE,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+
+def _run(fn, *args):
+    if settings.HASH_POOL_SIZE <= 0:
+        return fn(*args)
+
+    if not _slots.acquire(timeout=settings.HASH_QUEUE_TIMEOUT_SEC):
+        raise HTTPException(
+            status_code=503,
+            detail="Server occupato, riprova tra qualche secondo",
+            headers={"Retry-After": "5"},
+        )
+    try:
+        # il thread della request resta in attesa senza GIL: le altre request girano
+        return _get_executor().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def hash_password(p: str) -> str:
+    return _run(_hash, p)
+
+
+def verify_password(p: str, hashed: str) -> bool:
+    return _run(_verify, p, hashed)
+
+
+def shutdown() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -1,24 +1,78 @@
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError
-from passlib.context import CryptContext
+from sqlalchemy import event, inspect
 from ..config import settings
+from ..database import SessionLocal
+from ..models.user import User
+from . import hashing
 
 ALGO = "HS256"
-pwd = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+ACCESS = "access"
+REFRESH = "refresh"
 
 def hash_password(p: str) -> str:
-    return pwd.hash(p)
+    return hashing.hash_password(p)
 
 def verify_password(p: str, hashed: str) -> bool:
-    return pwd.verify(p, hashed)
+    return hashing.verify_password(p, hashed)
 
-def create_access_token(sub: str) -> str:
-    exp = datetime.now(timezone.utc) + timedelta(minutes=settings.JWT_EXPIRES_MIN)
-    payload = {"sub": sub, "exp": exp}
+def _encode(payload: dict, minutes: int) -> str:
+    payload["exp"] = datetime.now(timezone.utc) + timedelta(minutes=minutes)
     return jwt.encode(payload, settings.SECRET_KEY, algorithm=ALGO)
 
-def decode_token(token: str) -> dict | None:
+def create_access_token(user: User) -> str:
+    """
+    Access token breve: porta id, ruolo, nome e token_version, così i controlli
+    di ruolo non hanno bisogno della riga User.
+    """
+    payload = {
+        "typ": ACCESS,
+        "sub": user.email,
+        "uid": user.id,
+        "role": user.role.value,
+        "name": user.display_name,
+        "ver": user.token_version or 0,
+    }
+    return _encode(payload, settings.ACCESS_TOKEN_EXPIRES_MIN)
+
+def create_refresh_token(user: User) -> str:
+    """Refresh token lungo (JWT_EXPIRES_MIN): serve solo su /auth/refresh."""
+    payload = {
+        "typ": REFRESH,
+        "sub": user.email,
+        "uid": user.id,
+        "ver": user.token_version or 0,
+    }
+    return _encode(payload, settings.JWT_EXPIRES_MIN)
+
+def decode_token(token: str, typ: str = ACCESS) -> dict | None:
     try:
-        return jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGO])
+        data = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGO])
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+    # i token "vecchi" (solo sub) non hanno typ/ver: vanno rifatti col login
+    if data.get("typ") != typ or "uid" not in data or "ver" not in data:
+        return None
+    return data
+
+def revoke_tokens(user: User) -> None:
+    """Invalida tutti i token emessi finora per l'utente."""
+    user.token_version = (user.token_version or 0) + 1
+
+
+# Cambio ruolo, disattivazione o nuova password => i token già emessi non valgono
+# più. Lo facciamo a livello di flush così vale per qualsiasi percorso ORM.
+_REVOKING_ATTRS = ("role", "is_active", "password_hash")
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _bump_token_version(session, flush_context, instances):
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if state.attrs.token_version.history.has_changes():
+            continue
+        if any(state.attrs[a].history.has_changes() for a in _REVOKING_ATTRS):
+            revoke_tokens(obj)
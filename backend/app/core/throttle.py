@@ -0,0 +1,83 @@
+# backend/app/core/throttle.py
+import threading
+import time
+from collections import deque
+
+from fastapi import HTTPException, Request
+
+from ..config import settings
+
+
+class AttemptThrottle:
+    """
+    Finestra scorrevole in memoria: al massimo `max_attempts` tentativi per
+    chiave ogni `window_sec`. Per-processo (con più worker il limite reale è
+    moltiplicato), ma basta a fermare raffiche e brute-force dallo stesso client.
+    """
+
+    def __init__(self, max_attempts: int, window_sec: float, max_keys: int = 10000):
+        self.max_attempts = max_attempts
+        self.window_sec = window_sec
+        self.max_keys = max_keys
+        self._hits: dict[str, deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, key: str, now: float) -> deque[float]:
+        q = self._hits.get(key)
+        if q is None:
+            if len(self._hits) >= self.max_keys:
+                self._evict(now)
+            q = self._hits[key] = deque()
+        while q and q[0] <= now - self.window_sec:
+            q.popleft()
+        return q
+
+    def _evict(self, now: float) -> None:
+        for k in [k for k, q in self._hits.items() if not q or q[-1] <= now - self.window_sec]:
+            del self._hits[k]
+        # se sono ancora tutte attive, scarta la più vecchia
+        if len(self._hits) >= self.max_keys:
+            del self._hits[next(iter(self._hits))]
+
+    def retry_after(self, key: str) -> int:
+        """0 se la chiave può tentare, altrimenti i secondi da attendere."""
+        now = time.monotonic()
+        with self._lock:
+            q = self._prune(key, now)
+            if len(q) < self.max_attempts:
+                return 0
+            return max(1, int(q[0] + self.window_sec - now) + 1)
+
+    def add(self, key: str) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._prune(key, now).append(now)
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._hits.pop(key, None)
+
+
+def client_ip(request: Request) -> str:
+    """
+    IP del client per il throttle. Dietro TRUSTED_PROXY_HOPS proxy prende la
+    voce di X-Forwarded-For scritta dal proxy più esterno (N-esima da destra):
+    chi ruota X-Forwarded-For cambia solo le voci più a sinistra.
+    """
+    hops = settings.TRUSTED_PROXY_HOPS
+    if hops > 0:
+        xff = [h.strip() for h in request.headers.get("x-forwarded-for", "").split(",") if h.strip()]
+        if len(xff) >= hops:
+            return xff[-hops]
+    return request.client.host if request.client else "unknown"
+
+
+def check(throttle: AttemptThrottle, *keys: str) -> None:
+    """Alza 429 se una delle chiavi ha esaurito i tentativi."""
+    wait = max((throttle.retry_after(k) for k in keys), default=0)
+    if wait:
+        raise HTTPException(
+            status_code=429,
+            detail="Troppi tentativi, riprova più tardi",
+            headers={"Retry-After": str(wait)},
+        )
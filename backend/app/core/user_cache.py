@@ -0,0 +1,155 @@
+# backend/app/core/user_cache.py
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.user import User, Role
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Fotografia minima dell'utente autenticato (niente password_hash)."""
+    id: int
+    email: str
+    display_name: str | None
+    role: Role
+    is_active: bool
+    token_version: int
+
+    @classmethod
+    def from_user(cls, u: User) -> "CachedUser":
+        return cls(
+            id=u.id,
+            email=u.email,
+            display_name=u.display_name,
+            role=u.role,
+            is_active=bool(u.is_active),
+            token_version=u.token_version or 0,
+        )
+
+
+class UserCache:
+    """
+    Cache LRU con TTL delle identità, chiave = subject del token (email).
+    Thread-safe: FastAPI esegue gli endpoint sync nel threadpool.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_sec: float = 60.0):
+        self.maxsize = max(1, maxsize)
+        self.ttl_sec = ttl_sec
+        self._data: OrderedDict[str, tuple[float, CachedUser]] = OrderedDict()
+        self._by_id: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: str) -> CachedUser | None:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= now:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: CachedUser) -> None:
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl_sec, value)
+            self._by_id[value.id] = key
+            while len(self._data) > self.maxsize:
+                oldest = next(iter(self._data))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+                self.invalidations += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            key = self._by_id.get(user_id)
+            if key is not None and key in self._data:
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._by_id.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_sec": self.ttl_sec,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, key: str) -> None:
+        # da chiamare con il lock preso
+        _, value = self._data.pop(key)
+        if self._by_id.get(value.id) == key:
+            del self._by_id[value.id]
+
+
+user_cache = UserCache(
+    maxsize=settings.AUTH_CACHE_MAX,
+    ttl_sec=settings.AUTH_CACHE_TTL_SEC,
+)
+
+
+# -----------------------------------------------------------------------------
+# Invalidazione automatica: ogni modifica ORM a un User (disattivazione, cambio
+# ruolo, reset password, ...) svuota la sua voce DOPO il commit, così una request
+# concorrente non può rimettere in cache la versione vecchia prima del commit.
+# NB: gli UPDATE bulk (query(...).update()) e le modifiche fatte a mano sul DB
+# non passano di qui: per quelli vale il TTL.
+# -----------------------------------------------------------------------------
+_PENDING_KEY = "user_cache_pending"
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_changed_users(session, flush_context):
+    changed = [
+        obj.id
+        for obj in list(session.dirty) + list(session.deleted)
+        if isinstance(obj, User) and obj.id is not None
+        and (obj in session.deleted or session.is_modified(obj))
+    ]
+    if changed:
+        session.info.setdefault(_PENDING_KEY, set()).update(changed)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_after_commit(session):
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        user_cache.invalidate_user(user_id)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -1,37 +1,110 @@
+from dataclasses import dataclass
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, make_transient_to_detached
 from .database import get_db
 from .core.security import decode_token
+from .core.user_cache import user_cache, CachedUser
 from .models.user import User, Role
 
 oauth2 = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2), db: Session = Depends(get_db)) -> User:
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Utente autenticato ricavato dai claim dell'access token.
+    Stessi attributi "di lettura" di User (id, email, display_name, role),
+    così helper come _user_label funzionano con entrambi.
+    """
+    id: int
+    email: str
+    display_name: str | None
+    role: Role
+    token_version: int
+
+
+def get_token_claims(token: str = Depends(oauth2)) -> dict:
     data = decode_token(token)
     if not data or "sub" not in data:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    user = db.query(User).filter(User.email == data["sub"]).first()
-    if not user or not user.is_active:
+    return data
+
+def _identity(claims: dict, db: Session) -> CachedUser:
+    """
+    Stato corrente dell'utente (cache o DB) verificato contro il token:
+    se token_version è cambiata (logout ovunque, reset password, cambio ruolo,
+    disattivazione) il token è revocato anche se non ancora scaduto.
+    """
+    sub = claims["sub"]
+    cached = user_cache.get(sub)
+    if cached is None:
+        # la Session apre la connessione solo qui: in caso di hit nessun checkout dal pool
+        user = db.query(User).filter(User.email == sub).first()
+        if not user or not user.is_active:
+            raise HTTPException(status_code=401, detail="User not found or inactive")
+        cached = CachedUser.from_user(user)
+        user_cache.put(sub, cached)
+    if not cached.is_active:
         raise HTTPException(status_code=401, detail="User not found or inactive")
-    return user
+    if cached.id != claims["uid"] or cached.token_version != claims["ver"]:
+        raise HTTPException(status_code=401, detail="Token revocato")
+    return cached
+
+def _detached_user(c: CachedUser) -> User:
+    """
+    Ricostruisce un User "detached" dalla cache: gli endpoint leggono solo
+    id/email/display_name/role. password_hash non è caricato (login/reset
+    fanno comunque la loro query).
+    """
+    u = User(
+        id=c.id,
+        email=c.email,
+        display_name=c.display_name,
+        role=c.role,
+        is_active=c.is_active,
+        token_version=c.token_version,
+    )
+    make_transient_to_detached(u)
+    return u
+
+def get_current_user(claims: dict = Depends(get_token_claims), db: Session = Depends(get_db)) -> User:
+    return _detached_user(_identity(claims, db))
+
+def get_principal(claims: dict = Depends(get_token_claims), db: Session = Depends(get_db)) -> Principal:
+    """
+    Autorizzazione dai soli claim: ruolo e id arrivano dal token, il DB serve
+    solo (in caso di cache miss) per controllare la token_version.
+    """
+    _identity(claims, db)
+    try:
+        role = Role(claims["role"])
+    except (KeyError, ValueError):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return Principal(
+        id=claims["uid"],
+        email=claims["sub"],
+        display_name=claims.get("name"),
+        role=role,
+        token_version=claims["ver"],
+    )
 
 def require_role(*allowed: Role):
-    def dep(user: User = Depends(get_current_user)) -> User:
+    def dep(user: Principal = Depends(get_principal)) -> Principal:
         if user.role not in allowed:
             raise HTTPException(status_code=403, detail="Insufficient permissions")
         return user
     return dep
 
-def auth_any_role(user: User = Depends(get_current_user)) -> User:
+def auth_any_role(user: Principal = Depends(get_principal)) -> Principal:
     return user
 
-def auth_manager(user: User = Depends(get_current_user)) -> User:
+def auth_manager(user: Principal = Depends(get_principal)) -> Principal:
     if user.role != Role.MANAGER:
         raise HTTPException(status_code=403, detail="Solo manager")
     return user
 
-def auth_producer(user: User = Depends(get_current_user)) -> User:
+def auth_producer(user: Principal = Depends(get_principal)) -> Principal:
     if user.role not in (Role.PRODUCER, Role.MANAGER):
         raise HTTPException(status_code=403, detail="Solo produttori/manager")
-    return user
\ No newline at end of file
+    return user
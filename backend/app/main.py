@@ -6,6 +6,9 @@ from fastapi.responses import RedirectResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 
 from .config import settings
+from .core import hashing
+from . import migrations
+from .services import email_transport, events, maintenance, outbox
 from .routers import auth as auth_router
 from .routers import booking as booking_router
 from .routers import users as users_router
@@ -28,6 +31,38 @@ app.include_router(ops_router.router)
 # app.include_router(wa_local_router.router)
 # app.include_router(manager_router)  # monta solo se effettivamente usato
 
+@app.on_event("startup")
+def _migrate():
+    # advisory lock nella transazione: con più worker la applica uno solo
+    if settings.AUTO_MIGRATE:
+        done = migrations.upgrade()
+        if done:
+            print("Migrazioni applicate:", ", ".join(done))
+
+@app.on_event("startup")
+def _start_cleanup():
+    if settings.CLEANUP_WORKER:
+        maintenance.start()
+
+@app.on_event("startup")
+def _start_events():
+    # dopo le migrazioni: legge la versione corrente (change_versions)
+    events.start()
+
+@app.on_event("startup")
+def _start_outbox():
+    # invia le email accodate (anche quelle rimaste in coda dal processo precedente)
+    if settings.OUTBOX_WORKER:
+        outbox.start()
+
+@app.on_event("shutdown")
+def _shutdown_workers():
+    outbox.stop()
+    email_transport.close()
+    events.stop()
+    maintenance.stop()
+    hashing.shutdown()
+
 # --- Maintenance middleware (protegge TUTTE le pagine quando attivo) ---
 @app.middleware("http")
 async def maintenance_gate(request: Request, call_next):
@@ -0,0 +1,110 @@
+# backend/app/migrations/__init__.py
+"""
+Migrazioni di schema versionate, senza dipendenze esterne.
+
+Ogni file in versions/ si chiama mNNNN_descrizione.py ed espone:
+    VERSION: int
+    NAME: str
+    def upgrade(conn): ...   # riceve una Connection dentro la transazione
+
+Le migrazioni vengono applicate in ordine, una sola volta, e registrate in
+schema_migrations. Devono essere idempotenti (IF NOT EXISTS / controlli su
+inspector): così un DB creato da zero con create_all e un DB esistente
+convergono allo stesso schema.
+
+Uso:
+    python -m backend.app.migrations upgrade   # applica le mancanti
+    python -m backend.app.migrations status    # elenco applicate/mancanti
+    python -m backend.app.migrations check     # EXPLAIN delle query calde
+"""
+import importlib
+import pkgutil
+from types import ModuleType
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from ..database import engine as default_engine
+
+# chiave arbitraria ma fissa per pg_advisory_xact_lock (più worker all'avvio)
+_LOCK_KEY = 0x57_38_43_41  # "W8CA"
+
+
+def _discover() -> list[ModuleType]:
+    from . import versions
+
+    mods = [
+        importlib.import_module(f"{versions.__name__}.{info.name}")
+        for info in pkgutil.iter_modules(versions.__path__)
+        if info.name.startswith("m")
+    ]
+    mods.sort(key=lambda m: m.VERSION)
+    seen: set[int] = set()
+    for m in mods:
+        if m.VERSION in seen:
+            raise RuntimeError(f"Versione migrazione duplicata: {m.VERSION}")
+        seen.add(m.VERSION)
+    return mods
+
+
+def _ensure_table(conn: Connection) -> None:
+    conn.execute(
+        text(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(200) NOT NULL,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+    )
+
+
+def _lock(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        # rilasciato automaticamente a fine transazione
+        conn.execute(text("SELECT pg_advisory_xact_lock(:k)"), {"k": _LOCK_KEY})
+
+
+def _applied(conn: Connection) -> set[int]:
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def upgrade(engine: Engine | None = None) -> list[str]:
+    """Applica le migrazioni mancanti in un'unica transazione. Ritorna i nomi applicati."""
+    engine = engine or default_engine
+    done: list[str] = []
+    with engine.begin() as conn:
+        _lock(conn)
+        _ensure_table(conn)
+        applied = _applied(conn)
+        for m in _discover():
+            if m.VERSION in applied:
+                continue
+            m.upgrade(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+                {"v": m.VERSION, "n": m.NAME},
+            )
+            done.append(f"{m.VERSION:04d}_{m.NAME}")
+    return done
+
+
+def status(engine: Engine | None = None) -> list[dict]:
+    engine = engine or default_engine
+    with engine.connect() as conn:
+        applied = _applied(conn) if inspect(conn).has_table("schema_migrations") else set()
+    return [
+        {"version": m.VERSION, "name": m.NAME, "applied": m.VERSION in applied}
+        for m in _discover()
+    ]
+
+
+# --- helper per i file di migrazione ---------------------------------------
+def has_table(conn: Connection, table: str) -> bool:
+    return inspect(conn).has_table(table)
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
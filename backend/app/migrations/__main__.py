@@ -0,0 +1,24 @@
+import sys
+
+from . import upgrade, status
+from . import check
+
+
+def main(argv: list[str]) -> int:
+    cmd = argv[0] if argv else "upgrade"
+    if cmd == "upgrade":
+        done = upgrade()
+        print("Applicate:", ", ".join(done) if done else "nessuna (schema aggiornato)")
+        return 0
+    if cmd == "status":
+        for m in status():
+            print(f"[{'x' if m['applied'] else ' '}] {m['version']:04d} {m['name']}")
+        return 0
+    if cmd == "check":
+        return 0 if check.run(verbose="-v" in argv) else 1
+    print("Uso: python -m backend.app.migrations [upgrade|status|check [-v]]")
+    return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
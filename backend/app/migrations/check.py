@@ -0,0 +1,95 @@
+# backend/app/migrations/check.py
+"""
+Controllo EXPLAIN: le query calde usano gli indici della migrazione 0004?
+
+Le query sono costruite dagli stessi helper usati dagli endpoint
+(routers/booking.py). Su PostgreSQL il piano è calcolato con
+enable_seqscan=off: su tabelle piccole il planner sceglie comunque il seq scan,
+qui verifichiamo che l'indice sia *utilizzabile* dalla query così com'è scritta.
+"""
+import json
+from datetime import date, time, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from ..database import engine as default_engine
+
+
+def _hot_queries(db: Session):
+    from ..routers import booking as b
+
+    return [
+        ("availability (futuri)", b._slots_query(db), {"ix_slots_live_date_start"}),
+        # con un giorno fisso anche (manager_id, date) è un indice valido
+        ("availability (?day=)", b._slots_query(db, date.today()),
+         {"ix_slots_live_date_start", "ix_slots_manager_date"}),
+        # pagina successiva: cursore keyset (date, start_time, id)
+        ("availability (cursor)",
+         b._slots_query(db, until=date.today() + timedelta(days=28),
+                        after=(date.today(), time(12, 0), 0, 0)).limit(201),
+         {"ix_slots_live_date_start"}),
+        ("producer_incoming", b._producer_incoming_query(db, 1), {"ix_bookings_producer_pending"}),
+        ("manager_pending", b._manager_pending_query(db), {"ix_bookings_manager_pending"}),
+        ("agenda_confirmed", b._agenda_confirmed_query(db), {"ix_bookings_confirmed"}),
+    ]
+
+
+def _pg_indexes(plan: dict) -> set[str]:
+    found = set()
+    if "Index Name" in plan:
+        found.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        found |= _pg_indexes(child)
+    return found
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN <select>: compilato insieme alla select, così i parametri
+    (date/time) passano dai normali bind processor del dialetto."""
+    inherit_cache = False
+
+    def __init__(self, statement, prefix: str):
+        self.statement = statement
+        self.prefix = prefix
+
+
+@compiles(_Explain)
+def _compile_explain(element, compiler, **kw):
+    return f"{element.prefix} {compiler.process(element.statement, **kw)}"
+
+
+def _explain(db: Session, query) -> tuple[set[str], str]:
+    conn = db.connection()
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        row = conn.execute(_Explain(query.statement, "EXPLAIN (FORMAT JSON)")).scalar()
+        plan = (row if isinstance(row, list) else json.loads(row))[0]["Plan"]
+        return _pg_indexes(plan), json.dumps(plan, indent=1)
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(_Explain(query.statement, "EXPLAIN QUERY PLAN")).fetchall()
+        detail = "\n".join(r[-1] for r in rows)
+        found = {w for r in rows for w in r[-1].replace("(", " ").split() if w.startswith("ix_")}
+        return found, detail
+    raise RuntimeError(f"EXPLAIN non supportato per {conn.dialect.name}")
+
+
+def run(engine=None, verbose: bool = False) -> bool:
+    """
+    Stampa una riga per query; ritorna False se una query non usa nessuno
+    degli indici attesi.
+    """
+    ok = True
+    with Session(engine or default_engine) as db:
+        for name, query, expected in _hot_queries(db):
+            used, detail = _explain(db, query)
+            hit = bool(expected & used)
+            ok = ok and hit
+            print(f"{'OK  ' if hit else 'MISS'} {name:<24} usa: {', '.join(sorted(used)) or '-'}"
+                  + ("" if hit else f" | atteso: {' o '.join(sorted(expected))}"))
+            if verbose or not hit:
+                print(detail)
+        db.rollback()
+    return ok
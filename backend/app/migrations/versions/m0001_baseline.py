@@ -0,0 +1,11 @@
+"""Schema iniziale: crea le tabelle mancanti dai modelli (DB nuovo)."""
+from ...database import Base
+from ... import models  # noqa: F401  registra tutti i modelli su Base.metadata
+
+VERSION = 1
+NAME = "baseline"
+
+
+def upgrade(conn):
+    # checkfirst: sui DB esistenti non tocca nulla
+    Base.metadata.create_all(conn, checkfirst=True)
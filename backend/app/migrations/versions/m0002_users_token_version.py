@@ -0,0 +1,14 @@
+"""users.token_version per la revoca dei token (vedi core.security)."""
+from sqlalchemy import text
+
+from .. import has_column
+
+VERSION = 2
+NAME = "users_token_version"
+
+
+def upgrade(conn):
+    if not has_column(conn, "users", "token_version"):
+        conn.execute(
+            text("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0")
+        )
@@ -0,0 +1,34 @@
+"""
+password_reset_tokens: token in chiaro -> token_hash (sha256 hex).
+I token esistenti non sono convertibili: vengono eliminati (durano 2 ore).
+"""
+from sqlalchemy import text
+
+from .. import has_column
+
+VERSION = 3
+NAME = "password_reset_token_hash"
+
+
+def upgrade(conn):
+    if has_column(conn, "password_reset_tokens", "token"):
+        conn.execute(text("DELETE FROM password_reset_tokens"))
+        # SQLite non toglie una colonna ancora indicizzata
+        conn.execute(text("DROP INDEX IF EXISTS ix_password_reset_tokens_token"))
+        conn.execute(text("ALTER TABLE password_reset_tokens DROP COLUMN token"))
+    if not has_column(conn, "password_reset_tokens", "token_hash"):
+        conn.execute(
+            text("ALTER TABLE password_reset_tokens ADD COLUMN token_hash VARCHAR(64) NOT NULL")
+        )
+    conn.execute(
+        text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_password_reset_tokens_token_hash "
+            "ON password_reset_tokens (token_hash)"
+        )
+    )
+    conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_password_reset_tokens_expires_at "
+            "ON password_reset_tokens (expires_at)"
+        )
+    )
@@ -0,0 +1,38 @@
+"""
+Indici per le query calde di routers/booking.py:
+  - slot vivi per data/ora (_only_future, availability?day=, liste ordinate)
+  - slot per manager+giorno (bulk)
+  - prenotazioni per stato: parziali su PENDING_PRODUCER / PENDING_MANAGER / CONFIRMED
+  - prenotazioni attive per slot e per artista
+Dichiarati anche nei modelli (__table_args__), così create_all li crea su DB nuovi.
+"""
+from sqlalchemy import text
+
+VERSION = 4
+NAME = "hot_query_indexes"
+
+STATEMENTS = [
+    "CREATE INDEX IF NOT EXISTS ix_slots_live_date_start "
+    "ON availability_slots (date, start_time, end_time) WHERE is_deleted = false",
+    "CREATE INDEX IF NOT EXISTS ix_slots_manager_date "
+    "ON availability_slots (manager_id, date) WHERE is_deleted = false",
+    "CREATE INDEX IF NOT EXISTS ix_bookings_slot_status "
+    "ON bookings (slot_id, status)",
+    "CREATE INDEX IF NOT EXISTS ix_bookings_artist_status "
+    "ON bookings (artist_id, status)",
+    "CREATE INDEX IF NOT EXISTS ix_bookings_producer_pending "
+    "ON bookings (producer_id, id) WHERE status = 'PENDING_PRODUCER'",
+    "CREATE INDEX IF NOT EXISTS ix_bookings_manager_pending "
+    "ON bookings (slot_id) WHERE status = 'PENDING_MANAGER'",
+    "CREATE INDEX IF NOT EXISTS ix_bookings_confirmed "
+    "ON bookings (slot_id) WHERE status = 'CONFIRMED'",
+]
+
+
+def upgrade(conn):
+    for sql in STATEMENTS:
+        if conn.dialect.name == "sqlite":
+            # SQLite usa l'indice parziale solo se il predicato combacia
+            # con quello generato da SQLAlchemy (is_deleted = 0)
+            sql = sql.replace("is_deleted = false", "is_deleted = 0")
+        conn.execute(text(sql))
@@ -0,0 +1,18 @@
+"""
+Al massimo una prenotazione attiva (PENDING_PRODUCER / PENDING_MANAGER /
+CONFIRMED) per slot: indice unico parziale usato da services.booking_state.
+Se esistono già duplicati la migrazione fallisce e va sistemato il dato a mano.
+"""
+from sqlalchemy import text
+
+VERSION = 5
+NAME = "active_booking_per_slot"
+
+
+def upgrade(conn):
+    conn.execute(
+        text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ux_bookings_active_slot ON bookings (slot_id) "
+            "WHERE status IN ('PENDING_PRODUCER', 'PENDING_MANAGER', 'CONFIRMED')"
+        )
+    )
@@ -0,0 +1,46 @@
+"""
+Slot vivi unici per (manager_id, date, start_time, end_time): indice unico
+parziale usato come target di ON CONFLICT DO NOTHING dalla creazione massiva
+(services.slots).
+
+I doppioni già presenti vengono soft-eliminati (is_deleted = true) tenendo, per
+ogni gruppo, lo slot con prenotazioni o altrimenti quello con id più basso.
+Gli slot con prenotazioni non vengono mai toccati: se restano doppioni così la
+migrazione fallisce e va sistemato il dato a mano.
+"""
+from sqlalchemy import text
+
+VERSION = 6
+NAME = "unique_live_slots"
+
+DEDUPE = """
+UPDATE availability_slots SET is_deleted = true
+WHERE id IN (
+    SELECT id FROM (
+        SELECT s.id,
+               EXISTS (SELECT 1 FROM bookings b WHERE b.slot_id = s.id) AS has_bookings,
+               ROW_NUMBER() OVER (
+                   PARTITION BY s.manager_id, s.date, s.start_time, s.end_time
+                   ORDER BY EXISTS (SELECT 1 FROM bookings b WHERE b.slot_id = s.id) DESC, s.id
+               ) AS rn
+        FROM availability_slots s
+        WHERE s.is_deleted = false
+    ) d
+    WHERE d.rn > 1 AND NOT d.has_bookings
+)
+"""
+
+INDEX = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_slots_live_manager_slot "
+    "ON availability_slots (manager_id, date, start_time, end_time) WHERE is_deleted = false"
+)
+
+
+def upgrade(conn):
+    for sql in (DEDUPE, INDEX):
+        if conn.dialect.name == "sqlite":
+            # come in m0004: predicato identico a quello dei modelli
+            sql = sql.replace("is_deleted = false", "is_deleted = 0").replace(
+                "is_deleted = true", "is_deleted = 1"
+            )
+        conn.execute(text(sql))
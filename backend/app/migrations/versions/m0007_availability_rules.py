@@ -0,0 +1,14 @@
+"""
+Regole di apertura ricorrenti (availability_rules) ed eccezioni
+(availability_exceptions): tabelle nuove, create dai modelli.
+"""
+from ...models.availability_rule import AvailabilityRule, AvailabilityException
+
+VERSION = 7
+NAME = "availability_rules"
+
+
+def upgrade(conn):
+    for model in (AvailabilityRule, AvailabilityException):
+        # checkfirst: crea tabella e indici solo se mancano
+        model.__table__.create(conn, checkfirst=True)
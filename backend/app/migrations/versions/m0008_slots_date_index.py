@@ -0,0 +1,14 @@
+"""
+Indice (date, end_time) su tutti gli slot, anche eliminati: la pulizia a
+batch degli slot passati (services.maintenance) lo usa invece di un full scan.
+"""
+from sqlalchemy import text
+
+VERSION = 8
+NAME = "slots_date_index"
+
+
+def upgrade(conn):
+    conn.execute(
+        text("CREATE INDEX IF NOT EXISTS ix_slots_date_end ON availability_slots (date, end_time)")
+    )
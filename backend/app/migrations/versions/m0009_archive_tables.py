@@ -0,0 +1,28 @@
+"""
+Tabelle di storico availability_slots_archive / bookings_archive
+(services.archive). Su PostgreSQL sono partizionate per mese: qui creiamo
+le tabelle padre e una partizione DEFAULT di sicurezza; le partizioni
+mensili le crea l'archiviazione prima di scriverci.
+
+In più un indice parziale sugli slot eliminati, per trovarli senza scan.
+"""
+from sqlalchemy import text
+
+from ...models.archive import SlotArchive, BookingArchive
+
+VERSION = 9
+NAME = "archive_tables"
+
+
+def upgrade(conn):
+    for model in (SlotArchive, BookingArchive):
+        model.__table__.create(conn, checkfirst=True)
+        if conn.dialect.name == "postgresql":
+            name = model.__tablename__
+            conn.execute(
+                text(f"CREATE TABLE IF NOT EXISTS {name}_default PARTITION OF {name} DEFAULT")
+            )
+    deleted = "is_deleted = 1" if conn.dialect.name == "sqlite" else "is_deleted = true"
+    conn.execute(
+        text(f"CREATE INDEX IF NOT EXISTS ix_slots_deleted ON availability_slots (id) WHERE {deleted}")
+    )
@@ -0,0 +1,20 @@
+"""
+change_versions: contatori di modifica usati per gli ETag delle liste
+(services.change_version). Crea la tabella e la riga "booking".
+"""
+from sqlalchemy import text
+
+from ...models.change_version import ChangeVersion
+
+VERSION = 10
+NAME = "change_versions"
+
+
+def upgrade(conn):
+    ChangeVersion.__table__.create(conn, checkfirst=True)
+    conn.execute(
+        text(
+            "INSERT INTO change_versions (name, version) "
+            "SELECT 'booking', 0 WHERE NOT EXISTS (SELECT 1 FROM change_versions WHERE name = 'booking')"
+        )
+    )
@@ -0,0 +1,38 @@
+"""
+change_seq su slot, prenotazioni e relativi archivi per il delta sync
+(services.changes), con indice. Le righe esistenti prendono la versione
+corrente; in più il contatore "rules" per regole/eccezioni.
+"""
+from sqlalchemy import text
+
+from .. import has_column
+
+VERSION = 11
+NAME = "change_seq"
+
+_TABLES = {
+    "availability_slots": "ix_slots_change_seq",
+    "bookings": "ix_bookings_change_seq",
+    "availability_slots_archive": "ix_slots_archive_change_seq",
+    "bookings_archive": "ix_bookings_archive_change_seq",
+}
+
+
+def upgrade(conn):
+    for table, index in _TABLES.items():
+        if not has_column(conn, table, "change_seq"):
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN change_seq BIGINT"))
+        conn.execute(
+            text(
+                f"UPDATE {table} SET change_seq = "
+                "(SELECT version FROM change_versions WHERE name = 'booking') "
+                "WHERE change_seq IS NULL"
+            )
+        )
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index} ON {table} (change_seq)"))
+    conn.execute(
+        text(
+            "INSERT INTO change_versions (name, version) "
+            "SELECT 'rules', 0 WHERE NOT EXISTS (SELECT 1 FROM change_versions WHERE name = 'rules')"
+        )
+    )
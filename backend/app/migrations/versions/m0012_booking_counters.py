@@ -0,0 +1,17 @@
+"""
+booking_counters: contatori dei badge (services.counters). Crea la tabella e
+la riempie contando le prenotazioni esistenti.
+"""
+from sqlalchemy.orm import Session
+
+from ...models.booking_counter import BookingCounter
+
+VERSION = 12
+NAME = "booking_counters"
+
+
+def upgrade(conn):
+    BookingCounter.__table__.create(conn, checkfirst=True)
+    from ...services import counters
+
+    counters.rebuild(Session(bind=conn))
@@ -0,0 +1,12 @@
+"""
+email_outbox: email scritte nella transazione della modifica e consegnate in
+background da services.outbox.
+"""
+from ...models.email_outbox import EmailOutbox
+
+VERSION = 13
+NAME = "email_outbox"
+
+
+def upgrade(conn):
+    EmailOutbox.__table__.create(conn, checkfirst=True)
@@ -0,0 +1,12 @@
+"""
+email_digest_items: notifiche ai manager accumulate per destinatario e
+spedite in un unico riepilogo da services.digest.
+"""
+from ...models.email_digest import EmailDigestItem
+
+VERSION = 14
+NAME = "email_digest"
+
+
+def upgrade(conn):
+    EmailDigestItem.__table__.create(conn, checkfirst=True)
@@ -0,0 +1,12 @@
+"""
+notification_opt_outs: eventi per cui un utente non vuole ricevere email
+(services.recipients).
+"""
+from ...models.notification_pref import NotificationOptOut
+
+VERSION = 15
+NAME = "notification_opt_outs"
+
+
+def upgrade(conn):
+    NotificationOptOut.__table__.create(conn, checkfirst=True)
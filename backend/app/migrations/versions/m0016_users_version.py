@@ -0,0 +1,17 @@
+"""
+Contatore "users" in change_versions: cambia quando cambiano gli utenti
+(registrazione, ruolo, attivazione, nome), per l'ETag di /booking/bootstrap.
+"""
+from sqlalchemy import text
+
+VERSION = 16
+NAME = "users_version"
+
+
+def upgrade(conn):
+    conn.execute(
+        text(
+            "INSERT INTO change_versions (name, version) "
+            "SELECT 'users', 0 WHERE NOT EXISTS (SELECT 1 FROM change_versions WHERE name = 'users')"
+        )
+    )
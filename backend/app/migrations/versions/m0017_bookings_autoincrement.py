@@ -0,0 +1,46 @@
+"""
+SQLite: bookings con AUTOINCREMENT. Senza, dopo l'archiviazione della
+prenotazione con l'id più alto la successiva riprende lo stesso id e le sue
+email collidono con le chiavi di dedup già nell'outbox (booking:{id}:...).
+SQLite non ha ALTER per questo: tabella ricreata, dati copiati, indici
+rifatti dal modello; la sequenza riparte dal massimo tra vive e archiviate.
+Su PostgreSQL non serve (le sequenze non riusano gli id).
+"""
+from sqlalchemy import MetaData, text
+from sqlalchemy.schema import CreateTable
+
+from .. import has_table
+from ...models.booking import Booking
+
+VERSION = 17
+NAME = "bookings_autoincrement"
+
+
+def upgrade(conn):
+    if conn.dialect.name != "sqlite":
+        return
+    ddl = conn.scalar(text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'bookings'"))
+    if "AUTOINCREMENT" in (ddl or "").upper():
+        return  # DB nuovo: create_all l'ha già creata così
+
+    table = Booking.__table__
+    md = MetaData()
+    for ref in {fk.column.table for fk in table.foreign_keys}:
+        ref.to_metadata(md)  # solo per compilare le FK della copia
+    new = table.to_metadata(md, name="bookings_new")
+    cols = ", ".join(c.name for c in table.columns)
+
+    conn.execute(CreateTable(new))
+    conn.execute(text(f"INSERT INTO bookings_new ({cols}) SELECT {cols} FROM bookings"))
+    conn.execute(text("DROP TABLE bookings"))
+    conn.execute(text("ALTER TABLE bookings_new RENAME TO bookings"))
+    for index in table.indexes:
+        index.create(conn, checkfirst=True)
+
+    top = "SELECT MAX(id) AS id FROM bookings"
+    if has_table(conn, "bookings_archive"):
+        top += " UNION ALL SELECT MAX(id) FROM bookings_archive"
+    conn.execute(text("DELETE FROM sqlite_sequence WHERE name = 'bookings'"))
+    conn.execute(
+        text(f"INSERT INTO sqlite_sequence (name, seq) SELECT 'bookings', COALESCE(MAX(id), 0) FROM ({top})")
+    )
@@ -1,4 +1,11 @@
 from .user import User, Role
 from .slot import AvailabilitySlot, SlotStatus
 from .booking import Booking, BookingStatus
-from .password_reset import PasswordResetToken
\ No newline at end of file
+from .password_reset import PasswordResetToken
+from .availability_rule import AvailabilityRule, AvailabilityException
+from .archive import SlotArchive, BookingArchive
+from .change_version import ChangeVersion
+from .booking_counter import BookingCounter
+from .email_outbox import EmailOutbox, OutboxStatus
+from .email_digest import EmailDigestItem
+from .notification_pref import NotificationOptOut
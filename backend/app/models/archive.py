@@ -0,0 +1,57 @@
+from sqlalchemy import Column, Integer, BigInteger, Date, Time, Enum, Boolean, Text, DateTime, PrimaryKeyConstraint, Index, func
+from ..database import Base
+from .slot import SlotStatus
+from .booking import BookingStatus
+
+
+class SlotArchive(Base):
+    """
+    Storico degli slot passati o eliminati, spostati qui da services.archive.
+    Su PostgreSQL è partizionata per mese sulla data dello slot (partizioni
+    create al volo, availability_slots_archive_YYYY_MM); niente FK verso le
+    tabelle vive.
+    """
+    __tablename__ = "availability_slots_archive"
+
+    id = Column(Integer, nullable=False)
+    manager_id = Column(Integer, nullable=False)
+    date = Column(Date, nullable=False)
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)
+    status = Column(Enum(SlotStatus), nullable=False)
+    is_deleted = Column(Boolean, nullable=False, default=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    # versione dell'archiviazione: per il delta sync la riga è una "tombstone"
+    change_seq = Column(BigInteger, nullable=True)
+
+    __table_args__ = (
+        # la chiave di partizione deve stare nella PK
+        PrimaryKeyConstraint("id", "date"),
+        Index("ix_slots_archive_manager_date", "manager_id", "date"),
+        Index("ix_slots_archive_change_seq", "change_seq"),
+        {"postgresql_partition_by": "RANGE (date)"},
+    )
+
+
+class BookingArchive(Base):
+    """Storico delle prenotazioni degli slot archiviati (slot_date = data dello slot)."""
+    __tablename__ = "bookings_archive"
+
+    id = Column(Integer, nullable=False)
+    slot_id = Column(Integer, nullable=False)
+    slot_date = Column(Date, nullable=False)
+    artist_id = Column(Integer, nullable=False)
+    producer_id = Column(Integer, nullable=False)
+    status = Column(Enum(BookingStatus), nullable=False)
+    notes = Column(Text, default="")
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+    change_seq = Column(BigInteger, nullable=True)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("id", "slot_date"),
+        Index("ix_bookings_archive_slot", "slot_id"),
+        Index("ix_bookings_archive_artist_date", "artist_id", "slot_date"),
+        Index("ix_bookings_archive_producer_date", "producer_id", "slot_date"),
+        Index("ix_bookings_archive_change_seq", "change_seq"),
+        {"postgresql_partition_by": "RANGE (slot_date)"},
+    )
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, Date, Time, ForeignKey, Boolean, String, Index, text
+from ..database import Base
+
+
+class AvailabilityRule(Base):
+    """
+    Apertura settimanale ricorrente di un manager: ogni `weekday` (0 = lunedì)
+    slot da step_minutes tra start_time e end_time, dentro [valid_from, valid_to].
+    Gli slot non vengono creati in anticipo: li genera services.availability
+    in lettura e diventano righe di availability_slots solo quando si prenotano.
+    """
+    __tablename__ = "availability_rules"
+
+    id = Column(Integer, primary_key=True)
+    manager_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    weekday = Column(Integer, nullable=False)
+    start_time = Column(Time, nullable=False)
+    end_time = Column(Time, nullable=False)  # 00:00 = mezzanotte
+    step_minutes = Column(Integer, nullable=False, default=60)
+    valid_from = Column(Date, nullable=True)  # None = da sempre
+    valid_to = Column(Date, nullable=True)    # None = senza scadenza
+    is_deleted = Column(Boolean, nullable=False, default=False)
+
+    __table_args__ = (
+        Index(
+            "ix_availability_rules_live_weekday", "weekday",
+            postgresql_where=text("is_deleted = false"),
+            sqlite_where=text("is_deleted = 0"),
+        ),
+    )
+
+
+class AvailabilityException(Base):
+    """
+    Chiusura puntuale dello studio: nasconde gli slot generati dalle regole
+    (di tutti i manager) nel giorno indicato, tutto il giorno se start_time /
+    end_time sono vuoti. Non tocca gli slot già salvati in availability_slots.
+    """
+    __tablename__ = "availability_exceptions"
+
+    id = Column(Integer, primary_key=True)
+    manager_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # chi l'ha creata
+    date = Column(Date, nullable=False, index=True)
+    start_time = Column(Time, nullable=True)
+    end_time = Column(Time, nullable=True)
+    reason = Column(String(200), nullable=True)
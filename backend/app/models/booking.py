@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Enum, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, Enum, ForeignKey, Text, Index, null, text
 from sqlalchemy.orm import relationship
 import enum
 from ..database import Base
@@ -15,6 +15,20 @@ class BookingStatus(str, enum.Enum):
     CANCELED_BY_ARTIST = "CANCELED_BY_ARTIST"
 
 
+# stati che "occupano" lo slot: al massimo una prenotazione così per slot
+ACTIVE_BOOKING_STATUSES = (
+    BookingStatus.PENDING_PRODUCER,
+    BookingStatus.PENDING_MANAGER,
+    BookingStatus.CONFIRMED,
+)
+_ACTIVE_SQL = "status IN ('PENDING_PRODUCER', 'PENDING_MANAGER', 'CONFIRMED')"
+
+
+def _partial(status: str, *cols: str, name: str) -> Index:
+    where = text(f"status = '{status}'")
+    return Index(name, *cols, postgresql_where=where, sqlite_where=where)
+
+
 class Booking(Base):
     __tablename__ = "bookings"
 
@@ -27,7 +41,28 @@ class Booking(Base):
     status = Column(Enum(BookingStatus), nullable=False, default=BookingStatus.PENDING_PRODUCER)
     # NB: il campo si chiama "notes" (plurale)
     notes = Column(Text, default="")
+    # come AvailabilitySlot.change_seq
+    change_seq = Column(BigInteger, nullable=True, onupdate=null())
 
     slot = relationship("AvailabilitySlot", back_populates="bookings")
     artist = relationship("User", foreign_keys=[artist_id], back_populates="artist_bookings")
-    producer = relationship("User", foreign_keys=[producer_id], back_populates="producer_bookings")
\ No newline at end of file
+    producer = relationship("User", foreign_keys=[producer_id], back_populates="producer_bookings")
+
+    __table_args__ = (
+        Index("ix_bookings_slot_status", "slot_id", "status"),
+        Index("ix_bookings_artist_status", "artist_id", "status"),
+        Index("ix_bookings_change_seq", "change_seq"),
+        # code di lavoro: producer_incoming, manager_pending, agenda
+        _partial("PENDING_PRODUCER", "producer_id", "id", name="ix_bookings_producer_pending"),
+        _partial("PENDING_MANAGER", "slot_id", name="ix_bookings_manager_pending"),
+        _partial("CONFIRMED", "slot_id", name="ix_bookings_confirmed"),
+        # invariante: una sola prenotazione attiva per slot (vedi services.booking_state)
+        Index(
+            "ux_bookings_active_slot", "slot_id", unique=True,
+            postgresql_where=text(_ACTIVE_SQL),
+            sqlite_where=text(_ACTIVE_SQL),
+        ),
+        # niente riuso degli id su SQLite dopo l'archiviazione: l'id entra nelle
+        # chiavi di dedup dell'outbox (booking:{id}:...), vedi m0017
+        {"sqlite_autoincrement": True},
+    )
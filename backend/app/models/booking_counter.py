@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String
+from ..database import Base
+
+
+class BookingCounter(Base):
+    """
+    Contatori dei badge (services.counters): prenotazioni per stato, tenuti
+    aggiornati da chi cambia lo stato, nella stessa transazione.
+    owner_id = id del producer per i contatori "suoi", 0 = totale.
+    """
+    __tablename__ = "booking_counters"
+
+    name = Column(String(50), primary_key=True)
+    owner_id = Column(Integer, primary_key=True, default=0)
+    value = Column(Integer, nullable=False, default=0)
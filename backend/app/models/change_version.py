@@ -0,0 +1,14 @@
+from sqlalchemy import Column, String, BigInteger
+from ..database import Base
+
+
+class ChangeVersion(Base):
+    """
+    Contatore di modifiche per "ambito" (es. "booking": slot, prenotazioni,
+    regole). Lo incrementa ogni scrittura nella stessa transazione; le GET lo
+    usano come ETag (services.change_version).
+    """
+    __tablename__ = "change_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index, func
+from ..database import Base
+
+
+class EmailDigestItem(Base):
+    """
+    Notifica in attesa di finire in un riepilogo (services.digest): una riga
+    per destinatario ed evento, eliminata quando parte il riepilogo.
+    """
+    __tablename__ = "email_digest_items"
+
+    id = Column(Integer, primary_key=True)
+    to_addr = Column(String(320), nullable=False)  # minuscolo
+    event = Column(String(50), nullable=False)  # es. "producer_accept"
+    booking_id = Column(Integer, nullable=True)
+    line = Column(Text, nullable=False)  # riga HTML del riepilogo
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_email_digest_items_to_addr", "to_addr", "id"),
+        # "c'è un riepilogo scaduto?" a ogni giro dell'outbox
+        Index("ix_email_digest_items_created_at", "created_at"),
+        # niente riuso degli id su SQLite: l'ultimo id fa da chiave di dedup del riepilogo
+        {"sqlite_autoincrement": True},
+    )
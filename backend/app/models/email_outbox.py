@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Enum, Index, func
+import enum
+from ..database import Base
+
+
+class OutboxStatus(str, enum.Enum):
+    PENDING = "PENDING"  # da inviare (o in invio: next_attempt_at = fine del lease)
+    SENT = "SENT"
+    FAILED = "FAILED"  # tentativi esauriti
+
+
+class EmailOutbox(Base):
+    """
+    Email da inviare, scritte nella stessa transazione della modifica che le
+    genera e consegnate da services.outbox in background.
+    """
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    # es. "booking:12:producer_accept:artist:a@b.it": la stessa notifica non si accoda due volte
+    dedup_key = Column(String(255), nullable=True)
+    to_addr = Column(String(320), nullable=False)
+    subject = Column(String(300), nullable=False)
+    html = Column(Text, nullable=False, default="")  # svuotato dopo l'invio
+    status = Column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    sent_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ux_email_outbox_dedup_key", "dedup_key", unique=True),
+        # coda: PENDING in ordine di scadenza
+        Index("ix_email_outbox_due", "status", "next_attempt_at"),
+        # purge delle righe vecchie (services.maintenance)
+        Index("ix_email_outbox_created_at", "created_at"),
+    )
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, ForeignKey
+from ..database import Base
+
+
+class NotificationOptOut(Base):
+    """
+    Preferenze email: una riga = l'utente NON vuole le email di quell'evento
+    (es. "producer_accept"). Nessuna riga = riceve tutto. Lette da services.recipients.
+    """
+    __tablename__ = "notification_opt_outs"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    event = Column(String(50), primary_key=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Date, Time, Enum, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, BigInteger, Date, Time, Enum, ForeignKey, Boolean, Index, null, text
 from sqlalchemy.orm import relationship
 import enum
 from ..database import Base
@@ -21,6 +21,39 @@ class AvailabilitySlot(Base):
     end_time = Column(Time, nullable=False)
     status = Column(Enum(SlotStatus), default=SlotStatus.LIBERO, nullable=False)
     is_deleted = Column(Boolean, default=False)
+    # sequenza di modifica per il delta sync (services.changes): ogni INSERT/UPDATE
+    # la azzera, _commit_changes la riempie con la versione del commit
+    change_seq = Column(BigInteger, nullable=True, onupdate=null())
 
     # booking collegati a questo slot
-    bookings = relationship("Booking", back_populates="slot")
\ No newline at end of file
+    bookings = relationship("Booking", back_populates="slot")
+
+    __table_args__ = (
+        # slot "vivi" per data/ora: _only_future, ?day=, ordinamento liste
+        Index(
+            "ix_slots_live_date_start", "date", "start_time", "end_time",
+            postgresql_where=text("is_deleted = false"),
+            sqlite_where=text("is_deleted = 0"),
+        ),
+        Index(
+            "ix_slots_manager_date", "manager_id", "date",
+            postgresql_where=text("is_deleted = false"),
+            sqlite_where=text("is_deleted = 0"),
+        ),
+        # pulizia/archivio degli slot passati (anche eliminati): services.maintenance
+        Index("ix_slots_date_end", "date", "end_time"),
+        Index("ix_slots_change_seq", "change_seq"),
+        Index(
+            "ix_slots_deleted", "id",
+            postgresql_where=text("is_deleted = true"),
+            sqlite_where=text("is_deleted = 1"),
+        ),
+        # niente doppioni tra gli slot vivi di un manager: target di
+        # ON CONFLICT DO NOTHING in services.slots.insert_slots
+        Index(
+            "ux_slots_live_manager_slot", "manager_id", "date", "start_time", "end_time",
+            unique=True,
+            postgresql_where=text("is_deleted = false"),
+            sqlite_where=text("is_deleted = 0"),
+        ),
+    )
@@ -20,6 +20,8 @@ class User(Base):
 
     role = Column(Enum(Role), nullable=False, default=Role.ARTIST)
     is_active = Column(Boolean, default=True)
+    # incrementato per revocare tutti i token emessi (vedi core.security)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
     # utili per joinedload / nomi in output
     artist_bookings = relationship("Booking", foreign_keys="Booking.artist_id", back_populates="artist")
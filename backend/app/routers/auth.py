@@ -1,22 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi import APIRouter, Depends, HTTPException, Form, Request
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta, timezone
-import secrets
 
 from ..database import get_db, Base, engine
 from ..models.user import User, Role
-from ..models import password_reset as pr_models
-from ..schemas.auth import RegisterIn, LoginIn, TokenOut, UserOut
-from ..core.security import hash_password, verify_password, create_access_token
+from ..services import password_reset as pr_service
+from ..schemas.auth import RegisterIn, LoginIn, TokenOut, UserOut, RefreshIn
+from ..core.security import (
+    hash_password,
+    verify_password,
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    REFRESH,
+)
 from ..deps import get_current_user
-from ..services.email_gmail import send_email_html
+from ..core.user_cache import user_cache
+from ..core.throttle import AttemptThrottle, check as check_throttle, client_ip
+from ..services import outbox
 from ..config import settings
 from ..schemas.auth import ForgotIn, ResetIn
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+# tentativi per IP (login+register) e login falliti per email
+_ip_throttle = AttemptThrottle(
+    settings.LOGIN_MAX_ATTEMPTS_PER_IP, settings.LOGIN_THROTTLE_WINDOW_SEC
+)
+_email_throttle = AttemptThrottle(
+    settings.LOGIN_MAX_FAILURES_PER_EMAIL, settings.LOGIN_THROTTLE_WINDOW_SEC
+)
+
 @router.post("/register", response_model=UserOut)
-def register(payload: RegisterIn, db: Session = Depends(get_db)):
+def register(payload: RegisterIn, request: Request, db: Session = Depends(get_db)):
+    ip_key = f"ip:{client_ip(request)}"
+    check_throttle(_ip_throttle, ip_key)
+    _ip_throttle.add(ip_key)
+
     if db.query(User).filter(User.email == payload.email).first():
         raise HTTPException(status_code=400, detail="Email già registrata")
 
@@ -25,6 +44,8 @@ def register(payload: RegisterIn, db: Session = Depends(get_db)):
     if role == Role.MANAGER:
         raise HTTPException(status_code=400, detail="Non è possibile registrarsi come manager")
 
+    # rilascia la connessione durante bcrypt (in prod il pool è da 1)
+    db.close()
     user = User(
         email=payload.email,
         password_hash=hash_password(payload.password),
@@ -37,11 +58,46 @@ def register(payload: RegisterIn, db: Session = Depends(get_db)):
     return user
 
 @router.post("/login", response_model=TokenOut)
-def login(payload: LoginIn, db: Session = Depends(get_db)):
+def login(payload: LoginIn, request: Request, db: Session = Depends(get_db)):
+    ip_key = f"ip:{client_ip(request)}"
+    email_key = f"email:{payload.email.lower()}"
+    check_throttle(_ip_throttle, ip_key)
+    check_throttle(_email_throttle, email_key)
+    _ip_throttle.add(ip_key)
+
     user = db.query(User).filter(User.email == payload.email).first()
+    # rilascia la connessione durante bcrypt (in prod il pool è da 1);
+    # expire_on_commit=False: gli attributi già letti restano disponibili
+    db.close()
     if not user or not verify_password(payload.password, user.password_hash):
+        _email_throttle.add(email_key)
         raise HTTPException(status_code=401, detail="Credenziali non valide")
-    return TokenOut(access_token=create_access_token(sub=user.email))
+    _email_throttle.reset(email_key)
+    if not user.is_active:
+        raise HTTPException(status_code=401, detail="Utente disattivato")
+    return _token_pair(user)
+
+def _token_pair(user: User) -> TokenOut:
+    return TokenOut(
+        access_token=create_access_token(user),
+        refresh_token=create_refresh_token(user),
+        expires_in=settings.ACCESS_TOKEN_EXPIRES_MIN * 60,
+    )
+
+@router.post("/refresh", response_model=TokenOut)
+def refresh(payload: RefreshIn, db: Session = Depends(get_db)):
+    """
+    Scambia un refresh token valido con una nuova coppia di token.
+    Qui leggiamo sempre il DB (niente cache): è raro e deve vedere subito
+    una revoca (token_version incrementata).
+    """
+    data = decode_token(payload.refresh_token, typ=REFRESH)
+    if not data:
+        raise HTTPException(status_code=401, detail="Refresh token non valido")
+    user = db.get(User, data["uid"])
+    if not user or not user.is_active or (user.token_version or 0) != data["ver"]:
+        raise HTTPException(status_code=401, detail="Refresh token revocato")
+    return _token_pair(user)
 
 @router.get("/me", response_model=UserOut)
 def me(current: User = Depends(get_current_user)):
@@ -54,16 +110,7 @@ def forgot(payload: ForgotIn, db: Session = Depends(get_db)):
     if not user:
         return {"ok": True}
 
-    token = secrets.token_urlsafe(48)
-    expires = datetime.now(timezone.utc) + timedelta(hours=2)
-    item = pr_models.PasswordResetToken(
-        user_id=user.id,
-        token=token,
-        expires_at=expires,
-        used=False
-    )
-    db.add(item)
-    db.commit()
+    token = pr_service.issue_token(db, user.id)
 
     reset_link = f"{settings.PUBLIC_BASE_URL}/frontend/auth/reset.html?token={token}"
     html = f"""
@@ -75,10 +122,10 @@ def forgot(payload: ForgotIn, db: Session = Depends(get_db)):
     </div>
     """
 
-    try:
-        send_email_html(user.email, "Reset password", html)
-    except Exception as e:
-        print("Email error:", e, "| Link manuale:", reset_link)
+    # accodata insieme al token (la invia services.outbox): la risposta non aspetta Gmail
+    outbox.enqueue(db, [user.email], "Reset password", html)
+    # i token scaduti/usati li elimina services.maintenance in background
+    db.commit()
 
     resp = {"ok": True}
     if settings.APP_ENV == "dev":
@@ -87,18 +134,26 @@ def forgot(payload: ForgotIn, db: Session = Depends(get_db)):
 
 @router.post("/reset")
 def reset_password(payload: ResetIn, db: Session = Depends(get_db)):
-    now = datetime.now(timezone.utc)
-    rec = db.query(pr_models.PasswordResetToken)\
-            .filter(pr_models.PasswordResetToken.token == payload.token)\
-            .first()
-    if not rec or rec.used or rec.expires_at < now:
+    if pr_service.peek_token(db, payload.token) is None:
         raise HTTPException(status_code=400, detail="Token non valido o scaduto")
 
-    user = db.query(User).filter(User.id == rec.user_id).first()
+    # bcrypt senza connessione né lock (in prod il pool è da 1): se va in 503
+    # il token resta valido
+    db.close()
+    new_hash = hash_password(payload.new_password)
+
+    # poi consumo del token e nuova password in una transazione breve
+    user_id = pr_service.consume_token(db, payload.token)
+    if user_id is None:
+        raise HTTPException(status_code=400, detail="Token non valido o scaduto")
+    user = db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=400, detail="Utente non trovato")
 
-    user.password_hash = hash_password(payload.new_password)
-    rec.used = True
+    # il cambio di password_hash incrementa token_version: sessioni esistenti revocate
+    user.password_hash = new_hash
+    pr_service.revoke_user_tokens(db, user.id)
     db.commit()
-    return {"ok": True}
\ No newline at end of file
+    # esplicito: la sessione invalida già dopo il commit, ma il reset deve valere subito
+    user_cache.invalidate(user.email)
+    return {"ok": True}
@@ -1,28 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload, aliased
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload, aliased, contains_eager
 from datetime import date, datetime, time, timedelta
 from typing import List
-import re
+import asyncio
+import base64
+import json
 
 from ..database import get_db, Base, engine
-from ..deps import get_current_user, require_role
+from ..deps import get_current_user, get_principal, require_role, Principal
 from ..models.user import User, Role
 from ..models.slot import (
     AvailabilitySlot,
     SlotStatus,
 )  # LIBERO / IN_SOSPESO / OCCUPATO / CHIUSO
 from ..models.booking import Booking, BookingStatus
-from ..schemas.booking import SlotOut, SlotBulkIn, CreateBookingFromSlotIn, BookingOut
-from ..services.email_gmail import send_email_html
+from ..models.availability_rule import AvailabilityRule, AvailabilityException
+from ..models.archive import SlotArchive, BookingArchive
+from ..schemas.booking import (
+    SlotOut,
+    SlotBulkIn,
+    SlotRangeIn,
+    DaySummaryOut,
+    FreeRunOut,
+    RuleIn,
+    RuleOut,
+    ExceptionIn,
+    ExceptionOut,
+    BootstrapOut,
+    CountersOut,
+    CreateBookingFromSlotIn,
+    BookingOut,
+)
 from ..services.calendar import create_calendar_event
+from ..services.booking_state import (
+    claim_slot,
+    SlotUnavailable,
+    apply_transition,
+    TransitionRejected,
+    TransitionResult,
+    TRANSITIONS,
+)
+from ..services.slots import day_times, days_in_range, insert_slots
+from ..services.availability import virtual_slots, materialize, month_summary, free_runs
+from ..services import change_version, changes, counters, digest, events, outbox, recipients
 from ..config import settings
-from sqlalchemy import and_, or_
+from .users import users_query
+from sqlalchemy import and_, or_, tuple_, literal
 
 
 # -----------------------------------------
 # Helpers
 # -----------------------------------------
-def _user_label(u: User | None) -> str:
+def _user_label(u: User | Principal | None) -> str:
     if not u:
         return ""
     return (u.display_name or "").strip() or u.email
@@ -32,32 +62,89 @@ def _fmt_slot(s: AvailabilitySlot) -> str:
     return f"{s.date.isoformat()} • {str(s.start_time)[:5]}–{str(s.end_time)[:5]}"
 
 
-def _managers(db: Session) -> list[User]:
-    return (
-        db.query(User).filter(User.role == Role.MANAGER, User.is_active == True).all()
+def _commit_changes(db: Session, rules: bool = False) -> None:
+    """
+    Commit di una scrittura su slot/prenotazioni/regole: incrementa la versione
+    per gli ETag e con quella numera le righe toccate (delta sync) e gli eventi
+    live accodati (events.emit). Scrive anche i delta dei contatori badge,
+    dopo il lock sulla versione (services.counters). rules=True se cambiano
+    regole/eccezioni.
+    """
+    db.flush()  # autoflush è spento: le modifiche ORM devono esserci prima di stamp
+    if rules:
+        change_version.bump(db, change_version.RULES)
+    version = change_version.bump(db)
+    counters.apply(db)
+    change_version.stamp(db, version)
+    events.stage(db, version)
+    db.commit()
+
+
+def _emit_booking(db: Session, b, prev: BookingStatus | None = None) -> None:
+    events.emit(
+        db,
+        "booking",
+        id=b.id,
+        slot_id=b.slot_id,
+        status=BookingStatus(b.status).value,
+        prev=prev.value if prev else None,
+        artist_id=b.artist_id,
+        producer_id=b.producer_id,
     )
 
 
-def _send_to_many(addresses: list[str], subject: str, html: str) -> None:
+def _emit_slots(db: Session, reason: str, date_from: date | None = None, date_to: date | None = None, **data) -> None:
+    events.emit(
+        db,
+        "slots",
+        reason=reason,
+        date_from=date_from.isoformat() if date_from else None,
+        date_to=(date_to or date_from).isoformat() if (date_to or date_from) else None,
+        **data,
+    )
+
+
+def _transition(db: Session, name: str, booking_id: int, me: Principal) -> TransitionResult:
     """
-    Invio tollerante + dedup case-insensitive per evitare duplicati.
-    In dev senza Gmail configurata, la funzione di servizio stampa/loga.
+    Applica una transizione della macchina a stati; errori -> HTTP.
+    Non fa commit: l'handler accoda le email (outbox) e poi chiama _commit_changes.
     """
-    # de-dup
-    seen = set()
-    deduped: list[str] = []
-    for a in addresses or []:
-        key = (a or "").strip().lower()
-        if key and key not in seen:
-            seen.add(key)
-            deduped.append(a)
+    try:
+        b = apply_transition(db, name, booking_id, me.id, me.role)
+    except TransitionRejected as e:
+        db.rollback()
+        raise HTTPException(e.status_code, e.detail)
+    t = TRANSITIONS[name]
+    _emit_booking(db, b, prev=t.source)
+    if t.slot_status is not None and b.slot:
+        _emit_slots(db, "status", b.slot.date, slot_id=b.slot_id, status=t.slot_status.value)
+    return b
 
-    print("EMAIL ->", deduped, "|", subject)  # log
-    for a in deduped:
-        try:
-            send_email_html(a, subject, html)
-        except Exception as e:
-            print("Email error:", e)
+
+def _send_to_many(db: Session, event: str, addresses: list[str], subject: str, html: str, key: str) -> None:
+    """
+    Accoda le email nell'outbox, nella transazione della modifica (le invia il
+    worker di services.outbox dopo il commit). Dedup case-insensitive e via chi
+    ha disattivato le email di `event` (services.recipients, senza query);
+    con `key` dedup anche tra richieste ripetute. Il log lo fa il trasporto
+    all'invio (services.email_transport).
+    """
+    to = recipients.allowed(db, addresses, event)
+    if to:
+        outbox.enqueue(db, to, subject, html, key=key)
+
+
+def _notify_managers(
+    db: Session, event: str, b, addresses: list[str], subject: str, html: str, line: str, suffix: str = "managers"
+) -> None:
+    """
+    Email ai manager per `event` sulla prenotazione b: subito, oppure una riga
+    (`line`) nel prossimo riepilogo per destinatario (services.digest).
+    """
+    if digest.coalesced(event):
+        digest.add(db, addresses, event, line, booking_id=b.id)
+    else:
+        _send_to_many(db, event, addresses, subject, html, key=f"booking:{b.id}:{event}:{suffix}")
 
 
 def _now_parts():
@@ -76,102 +163,211 @@ def _only_future(q):
     )
 
 
-_LAST_CLEANUP_AT: datetime | None = None
-_CLEANUP_COOLDOWN_SEC = 300  # non più di una volta ogni 5 minuti
+# -----------------------------------------
+# Query "calde": costruite qui così che endpoint e controllo EXPLAIN
+# (python -m backend.app.migrations check) usino esattamente la stessa SQL.
+# -----------------------------------------
+def _slots_query(
+    db: Session,
+    day: date | None = None,
+    until: date | None = None,
+    statuses: list[SlotStatus] | None = None,
+    after: tuple | None = None,
+):
+    """
+    Slot non eliminati: del giorno `day` o, se assente, solo futuri (fino a
+    `until`), opzionalmente solo negli stati `statuses`. Ordinati per
+    (date, start_time, id); `after` = cursore keyset (vedi _decode_cursor).
+    """
+    q = db.query(AvailabilitySlot).filter(AvailabilitySlot.is_deleted == False)
+    if day:
+        q = q.filter(AvailabilitySlot.date == day)
+    else:
+        q = _only_future(q)
+        if until:
+            q = q.filter(AvailabilitySlot.date <= until)
+    if statuses:
+        q = q.filter(AvailabilitySlot.status.in_(statuses))
+    if after:
+        d, st, kind, key = after
+        if kind == 0:
+            q = q.filter(
+                tuple_(AvailabilitySlot.date, AvailabilitySlot.start_time, AvailabilitySlot.id)
+                > tuple_(literal(d), literal(st), literal(key))
+            )
+        else:
+            # il cursore è su uno slot generato: quelli salvati alla stessa ora vengono prima
+            q = q.filter(
+                tuple_(AvailabilitySlot.date, AvailabilitySlot.start_time)
+                > tuple_(literal(d), literal(st))
+            )
+    return q.order_by(
+        AvailabilitySlot.date.asc(), AvailabilitySlot.start_time.asc(), AvailabilitySlot.id.asc()
+    )
 
 
-def _cleanup_past_slots(db: Session) -> int:
+# -----------------------------------------
+# Paginazione keyset delle liste slot: ordine (date, start_time, tipo, id)
+# con tipo 0 = slot salvato (id), 1 = slot generato da regola (rule_id)
+# -----------------------------------------
+def _slot_key(s) -> tuple:
+    if s.id is not None:
+        return (s.date, s.start_time, 0, s.id)
+    return (s.date, s.start_time, 1, s.rule_id)
+
+
+def _encode_cursor(key: tuple) -> str:
+    d, st, kind, k = key
+    raw = f"{d.isoformat()}|{st.isoformat()}|{kind}|{k}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        d, st, kind, k = raw.split("|")
+        return (date.fromisoformat(d), time.fromisoformat(st), int(kind), int(k))
+    except Exception:
+        raise HTTPException(400, "cursor non valido")
+
+
+def _slot_window(day: date | None, date_from: date | None, date_to: date | None) -> tuple[date, date]:
+    """Finestra [lo, hi] richiesta: `day` oppure from/to (default oggi + AVAILABILITY_WINDOW_DAYS)."""
+    if day:
+        return day, day
+    today = date.today()
+    lo = max(date_from or today, today)
+    hi = date_to or lo + timedelta(days=settings.AVAILABILITY_WINDOW_DAYS - 1)
+    if hi < lo:
+        raise HTTPException(400, "'to' deve essere dopo 'from' (e non nel passato)")
+    if (hi - lo).days >= settings.AVAILABILITY_MAX_WINDOW_DAYS:
+        raise HTTPException(400, f"Finestra massima {settings.AVAILABILITY_MAX_WINDOW_DAYS} giorni")
+    return lo, hi
+
+
+def _manager_slot_window(date_from: date | None, date_to: date | None) -> tuple[date, date | None]:
     """
-    Cancella tutti gli slot già terminati (data < oggi oppure end_time < adesso se oggi).
-    Prima elimina le bookings collegate, poi gli slot.
-    Throttling interno per non farlo troppo spesso.
-    Ritorna il numero di slot eliminati.
+    Come _slot_window ma senza limite in avanti se manca `to`: il manager deve
+    vedere (e poter eliminare) anche gli slot creati oltre la finestra di
+    /availability. Le pagine le limita il cursore.
     """
-    global _LAST_CLEANUP_AT
-    now = datetime.now()
-    if (
-        _LAST_CLEANUP_AT
-        and (now - _LAST_CLEANUP_AT).total_seconds() < _CLEANUP_COOLDOWN_SEC
-    ):
-        return 0  # throttled
+    if date_to:
+        return _slot_window(None, date_from, date_to)
+    today = date.today()
+    return max(date_from or today, today), None
+
+
+def _slot_page(
+    db: Session,
+    day: date | None,
+    lo: date,
+    hi: date | None,
+    statuses: list[SlotStatus] | None,
+    cursor: str | None,
+    limit: int,
+    with_rules: bool,
+    generated: list | None = None,
+) -> tuple[list, str | None]:
+    """
+    Una pagina di slot (salvati + generati se with_rules) nella finestra e,
+    se ce ne sono altri, il cursore della pagina dopo (None = finiti).
+    `generated`: virtual_slots già calcolati, anche su una finestra più larga.
+    """
+    after = _decode_cursor(cursor) if cursor else None
 
-    today, now_time = _now_parts()
+    q = _slots_query(db, day, until=None if day else hi, statuses=statuses, after=after)
+    if not day:
+        q = q.filter(AvailabilitySlot.date >= lo)
+    items = q.limit(limit + 1).all()
 
-    # seleziona ID slot passati
-    past_q = db.query(AvailabilitySlot.id).filter(
-        or_(
-            AvailabilitySlot.date < today,
-            and_(AvailabilitySlot.date == today, AvailabilitySlot.end_time < now_time),
+    if with_rules and (not statuses or SlotStatus.LIBERO in statuses):
+        if generated is None:
+            generated = virtual_slots(db, lo, hi)
+        generated = [v for v in generated if lo <= v.date <= hi]
+        if after:
+            generated = [v for v in generated if _slot_key(v) > after]
+        if generated:
+            items = sorted(items + generated, key=_slot_key)
+
+    if len(items) > limit:
+        items = items[:limit]
+        return items, _encode_cursor(_slot_key(items[-1]))
+    return items, None
+
+
+def _with_next_cursor(response: Response, page: tuple[list, str | None]) -> list:
+    items, next_cursor = page
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return items
+
+
+def _producer_incoming_query(db: Session, producer_id: int | None):
+    """Richieste PENDING_PRODUCER future (di un producer, o tutte se None)."""
+    q = (
+        db.query(Booking)
+        .join(AvailabilitySlot, Booking.slot_id == AvailabilitySlot.id)
+        .options(contains_eager(Booking.slot), joinedload(Booking.artist))
+        .filter(Booking.status == BookingStatus.PENDING_PRODUCER)
+        .order_by(Booking.id.desc())
+    )
+    if producer_id is not None:
+        q = q.filter(Booking.producer_id == producer_id)
+    return _only_future(q)
+
+
+def _manager_pending_query(db: Session):
+    Artist = aliased(User)
+    Producer = aliased(User)
+    return (
+        db.query(
+            Booking.id.label("booking_id"),
+            Booking.status.label("b_status"),
+            AvailabilitySlot.date.label("s_date"),
+            AvailabilitySlot.start_time.label("s_start"),
+            AvailabilitySlot.end_time.label("s_end"),
+            Artist.display_name.label("artist_name"),
+            Artist.email.label("artist_email"),
+            Producer.display_name.label("producer_name"),
+            Producer.email.label("producer_email"),
         )
+        .join(AvailabilitySlot, Booking.slot_id == AvailabilitySlot.id)
+        .join(Artist, Booking.artist_id == Artist.id)
+        .join(Producer, Booking.producer_id == Producer.id)
+        .filter(Booking.status == BookingStatus.PENDING_MANAGER)
+        .order_by(AvailabilitySlot.date.asc(), AvailabilitySlot.start_time.asc())
     )
-    past_ids = [row[0] for row in past_q.all()]
-    if not past_ids:
-        _LAST_CLEANUP_AT = now
-        return 0
-
-    # elimina prima le prenotazioni, poi gli slot
-    db.query(Booking).filter(Booking.slot_id.in_(past_ids)).delete(
-        synchronize_session=False
+
+
+def _agenda_confirmed_query(db: Session):
+    q = (
+        db.query(Booking)
+        .join(AvailabilitySlot, Booking.slot_id == AvailabilitySlot.id)
+        .options(
+            contains_eager(Booking.slot),
+            joinedload(Booking.artist),
+            joinedload(Booking.producer),
+        )
+        .filter(Booking.status == BookingStatus.CONFIRMED)
     )
-    deleted = (
-        db.query(AvailabilitySlot)
-        .filter(AvailabilitySlot.id.in_(past_ids))
-        .delete(synchronize_session=False)
+    q = _only_future(q)  # solo eventi futuri
+    return q.order_by(AvailabilitySlot.date.asc(), AvailabilitySlot.start_time.asc())
+
+
+def _rules_query(db: Session):
+    return (
+        db.query(AvailabilityRule)
+        .filter(AvailabilityRule.is_deleted == False)
+        .order_by(AvailabilityRule.weekday, AvailabilityRule.start_time)
     )
-    db.commit()
 
-    _LAST_CLEANUP_AT = now
-    return deleted
-
-
-def _parse_manager_emails_from_env() -> list[str]:
-    """
-    Legge settings.MANAGER_EMAILS (CSV, ; o newline),
-    pulisce, deduplica case-insensitive e filtra formati invaldi.
-    """
-    raw = (settings.MANAGER_EMAILS or "").strip()
-    if not raw:
-        return []
-
-    parts = re.split(r"[,\n;]+", raw)
-    emails = []
-    seen = set()
-    email_re = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
-
-    for p in parts:
-        e = p.strip()
-        if not e:
-            continue
-        if not email_re.match(e):
-            continue
-        key = e.lower()
-        if key in seen:
-            continue
-        seen.add(key)
-        emails.append(e)
-
-    return emails
-
-
-def _manager_emails(db: Session) -> list[str]:
-    """
-    Sorgente primaria: MANAGER_EMAILS da .env (se presente).
-    Fallback: prendi i manager dal DB.
-    """
-    env_emails = _parse_manager_emails_from_env()
-    if env_emails:
-        return env_emails
-    # fallback DB
-    db_emails = [m.email for m in _managers(db) if m.email]
-    # de-dup case-insensitive
-    seen = set()
-    out: list[str] = []
-    for p in db_emails:
-        key = (p or "").strip().lower()
-        if key and key not in seen:
-            seen.add(key)
-            out.append(p)
-    return out
+
+def _exceptions_query(db: Session):
+    return (
+        db.query(AvailabilityException)
+        .filter(AvailabilityException.date >= date.today())
+        .order_by(AvailabilityException.date, AvailabilityException.start_time)
+    )
 
 
 # -----------------------------------------
@@ -184,123 +380,185 @@ router = APIRouter(prefix="/booking", tags=["booking"])
 # -----------------------------------------------------------------------------
 @router.get("/availability", response_model=List[SlotOut])
 def availability(
+    request: Request,
+    response: Response,
     day: date | None = None,
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    status: List[SlotStatus] | None = Query(None),
+    cursor: str | None = None,
+    limit: int = Query(200, ge=1, le=1000),
     db: Session = Depends(get_db),
-    me: User = Depends(get_current_user),
+    me: Principal = Depends(get_principal),
 ):
-    # lazy GC
-    _cleanup_past_slots(db)
+    """
+    Slot salvati + slot generati dalle regole ricorrenti (id=None, rule_id).
+    Con `day` solo quel giorno; altrimenti i futuri tra `from` e `to`
+    (default oggi + AVAILABILITY_WINDOW_DAYS). `status` ripetibile
+    (es. ?status=LIBERO). Al massimo `limit` righe: se ce ne sono altre
+    l'header X-Next-Cursor va ripassato come ?cursor= per la pagina dopo.
+    """
+    lo, hi = _slot_window(day, date_from, date_to)
 
-    q = db.query(AvailabilitySlot).filter(AvailabilitySlot.is_deleted == False)
-    if day:
-        q = q.filter(AvailabilitySlot.date == day)
+    # niente è cambiato dall'ultima volta: 304 senza query né serializzazione
+    not_modified = change_version.not_modified(request, response, change_version.etag(db))
+    if not_modified:
+        return not_modified
+
+    return _with_next_cursor(response, _slot_page(db, day, lo, hi, status, cursor, limit, with_rules=True))
+
+
+@router.get("/availability/summary", response_model=List[DaySummaryOut])
+def availability_summary(
+    request: Request,
+    response: Response,
+    month: str | None = Query(None, pattern=r"^\d{4}-\d{2}$"),
+    db: Session = Depends(get_db),
+    me: Principal = Depends(get_principal),
+):
+    """
+    Calendario del mese (?month=YYYY-MM, default il corrente): per ogni giorno
+    quanti slot futuri sono liberi / in sospeso / occupati / chiusi.
+    Un GROUP BY invece della lista completa degli slot.
+    """
+    if month:
+        year, mon = int(month[:4]), int(month[5:])
+        if not 1 <= mon <= 12:
+            raise HTTPException(400, "Mese non valido")
     else:
-        q = _only_future(q)  # solo futuri se non c'è filtro
+        year, mon = date.today().year, date.today().month
 
-    return q.order_by(
-        AvailabilitySlot.date.asc(), AvailabilitySlot.start_time.asc()
-    ).all()
+    tag = change_version.etag(db)
+    not_modified = change_version.not_modified(request, response, tag)
+    if not_modified:
+        return not_modified
+
+    return month_summary(db, year, mon, tag)
+
+
+@router.get("/availability/search", response_model=List[FreeRunOut])
+def availability_search(
+    request: Request,
+    response: Response,
+    minutes: int = Query(..., ge=15, le=24 * 60),
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    me: Principal = Depends(get_principal),
+):
+    """
+    "Una sessione di 3 ore la settimana prossima": prime `limit` sequenze di
+    slot liberi consecutivi lunghe almeno `minutes` tra `from` e `to` (stessa
+    finestra di /availability). Ogni sequenza ha i suoi slot da prenotare.
+    """
+    lo, hi = _slot_window(None, date_from, date_to)
+
+    not_modified = change_version.not_modified(request, response, change_version.etag(db))
+    if not_modified:
+        return not_modified
+
+    return free_runs(db, lo, hi, minutes, limit)
 
 
 # -----------------------------------------------------------------------------
 # MANAGER: crea/lista/elimina slot
 # -----------------------------------------------------------------------------
+def _slot_times(start: time, end: time, step_minutes: int) -> list[tuple[time, time]]:
+    if step_minutes <= 0 or step_minutes > 480:
+        raise HTTPException(400, "step_minutes non valido")
+    if end != time(0, 0) and end <= start:
+        raise HTTPException(400, "Fine deve essere dopo l'inizio")
+    times = day_times(start, end, step_minutes)
+    if not times:
+        raise HTTPException(400, "Nessuno slot generato")
+    return times
+
+
 @router.post("/manager/slots/bulk")
 def manager_slots_bulk(
     payload: SlotBulkIn,
     db: Session = Depends(get_db),
-    me: User = Depends(get_current_user),
+    me: Principal = Depends(get_principal),
 ):
     if me.role != Role.MANAGER:
         raise HTTPException(403, "Solo i manager possono creare slot")
 
-    if payload.step_minutes <= 0 or payload.step_minutes > 480:
-        raise HTTPException(400, "step_minutes non valido")
-
-    # calcolo window
-    start_dt = datetime.combine(payload.date, payload.start_time)
-    end_dt = datetime.combine(payload.date, payload.end_time)
+    times = _slot_times(payload.start_time, payload.end_time, payload.step_minutes)
+    created = insert_slots(db, me.id, [payload.date], times)
+    if created:
+        _emit_slots(db, "created", payload.date)
+    _commit_changes(db)
 
-    # 00:00 = giorno successivo
-    if payload.end_time == time(0, 0):
-        end_dt += timedelta(days=1)
+    # non alzare eccezioni: torna conteggi chiari per l’UI
+    return {"ok": True, "created": created, "skipped": len(times) - created}
 
-    if end_dt <= start_dt:
-        raise HTTPException(400, "Fine deve essere dopo l'inizio")
 
-    step = timedelta(minutes=payload.step_minutes)
+_MAX_RANGE_DAYS = 366
 
-    # costruisci la lista candidata di (start_time, end_time) nel giorno
-    candidates: list[tuple[time, time]] = []
-    cur = start_dt
-    while cur + step <= end_dt:
-        st = cur.time()
-        et = (cur + step).time()
-        candidates.append((st, et))
-        cur += step
 
-    if not candidates:
-        raise HTTPException(400, "Nessuno slot generato")
+@router.post("/manager/slots/range")
+def manager_slots_range(
+    payload: SlotRangeIn,
+    db: Session = Depends(get_db),
+    me: Principal = Depends(get_principal),
+):
+    """
+    Come /manager/slots/bulk ma su un intervallo di giorni (es. un mese intero),
+    opzionalmente solo in alcuni giorni della settimana. Un solo round-trip per
+    blocco di righe; i doppioni li salta il DB.
+    """
+    if me.role != Role.MANAGER:
+        raise HTTPException(403, "Solo i manager possono creare slot")
 
-    # PRE-FILTRO: prendi gli slot esistenti per quel manager e giorno
-    existing = (
-        db.query(AvailabilitySlot.start_time, AvailabilitySlot.end_time)
-        .filter(
-            AvailabilitySlot.manager_id == me.id,
-            AvailabilitySlot.date == payload.date,
-            AvailabilitySlot.is_deleted == False,
-        )
-        .all()
-    )
-    existing_set = {(row[0], row[1]) for row in existing}
-
-    # inserisci solo i mancanti
-    to_insert: list[AvailabilitySlot] = []
-    skipped = 0
-    for st, et in candidates:
-        if (st, et) in existing_set:
-            skipped += 1
-            continue
-        to_insert.append(
-            AvailabilitySlot(
-                manager_id=me.id,
-                date=payload.date,
-                start_time=st,
-                end_time=et,
-                status=SlotStatus.LIBERO,
-                is_deleted=False,
-            )
-        )
+    if payload.date_to < payload.date_from:
+        raise HTTPException(400, "date_to deve essere dopo date_from")
+    if (payload.date_to - payload.date_from).days >= _MAX_RANGE_DAYS:
+        raise HTTPException(400, f"Intervallo massimo {_MAX_RANGE_DAYS} giorni")
+    if payload.weekdays is not None and any(w < 0 or w > 6 for w in payload.weekdays):
+        raise HTTPException(400, "weekdays: valori da 0 (lunedì) a 6 (domenica)")
 
-    created = 0
-    if to_insert:
-        db.add_all(to_insert)
-        db.commit()
-        created = len(to_insert)
+    times = _slot_times(payload.start_time, payload.end_time, payload.step_minutes)
+    days = days_in_range(payload.date_from, payload.date_to, payload.weekdays)
+    created = insert_slots(db, me.id, days, times)
+    if created:
+        _emit_slots(db, "created", payload.date_from, payload.date_to)
+    _commit_changes(db)
 
-    # non alzare eccezioni: torna conteggi chiari per l’UI
-    return {"ok": True, "created": created, "skipped": skipped}
+    total = len(days) * len(times)
+    return {"ok": True, "days": len(days), "created": created, "skipped": total - created}
 
 
 @router.get("/manager/slots", response_model=List[SlotOut])
 def manager_slots_list(
-    db: Session = Depends(get_db), me: User = Depends(get_current_user)
+    request: Request,
+    response: Response,
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    status: List[SlotStatus] | None = Query(None),
+    cursor: str | None = None,
+    limit: int = Query(200, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    me: Principal = Depends(get_principal),
 ):
+    """
+    Slot salvati (non quelli generati dalle regole), stessi filtri/cursore di
+    /availability. Senza `to` tutti quelli futuri, a pagine.
+    """
     if me.role != Role.MANAGER:
         raise HTTPException(403, "Solo manager")
+    lo, hi = _manager_slot_window(date_from, date_to)
 
-    _cleanup_past_slots(db)
+    not_modified = change_version.not_modified(request, response, change_version.etag(db))
+    if not_modified:
+        return not_modified
 
-    q = db.query(AvailabilitySlot).filter(AvailabilitySlot.is_deleted == False)
-    q = _only_future(q)
-    return q.order_by(
-        AvailabilitySlot.date.asc(), AvailabilitySlot.start_time.asc()
-    ).all()
+    return _with_next_cursor(response, _slot_page(db, None, lo, hi, status, cursor, limit, with_rules=False))
 
 
 @router.delete("/manager/slots/{slot_id}")
 def manager_slots_delete(
-    slot_id: int, db: Session = Depends(get_db), me: User = Depends(get_current_user)
+    slot_id: int, db: Session = Depends(get_db), me: Principal = Depends(get_principal)
 ):
     if me.role != Role.MANAGER:
         raise HTTPException(403, "Solo manager")
@@ -308,7 +566,115 @@ def manager_slots_delete(
     if not s or s.is_deleted:
         raise HTTPException(404, "Slot non trovato")
     s.is_deleted = True
-    db.commit()
+    _emit_slots(db, "deleted", s.date, slot_id=s.id)
+    _commit_changes(db)
+    return {"ok": True}
+
+
+# -----------------------------------------------------------------------------
+# MANAGER: regole di apertura ricorrenti + eccezioni (slot generati in lettura)
+# -----------------------------------------------------------------------------
+@router.get("/manager/rules", response_model=List[RuleOut])
+def manager_rules_list(
+    db: Session = Depends(get_db), me: Principal = Depends(get_principal)
+):
+    if me.role != Role.MANAGER:
+        raise HTTPException(403, "Solo manager")
+    return _rules_query(db).all()
+
+
+@router.post("/manager/rules", response_model=List[RuleOut])
+def manager_rules_create(
+    payload: RuleIn, db: Session = Depends(get_db), me: Principal = Depends(get_principal)
+):
+    if me.role != Role.MANAGER:
+        raise HTTPException(403, "Solo manager")
+    if not payload.weekdays or any(w < 0 or w > 6 for w in payload.weekdays):
+        raise HTTPException(400, "weekdays: valori da 0 (lunedì) a 6 (domenica)")
+    if payload.valid_from and payload.valid_to and payload.valid_to < payload.valid_from:
+        raise HTTPException(400, "valid_to deve essere dopo valid_from")
+    _slot_times(payload.start_time, payload.end_time, payload.step_minutes)
+
+    rules = [
+        AvailabilityRule(
+            manager_id=me.id,
+            weekday=w,
+            start_time=payload.start_time,
+            end_time=payload.end_time,
+            step_minutes=payload.step_minutes,
+            valid_from=payload.valid_from,
+            valid_to=payload.valid_to,
+            is_deleted=False,
+        )
+        for w in sorted(set(payload.weekdays))
+    ]
+    db.add_all(rules)
+    _emit_slots(db, "rules", payload.valid_from, payload.valid_to)
+    _commit_changes(db, rules=True)
+    return rules
+
+
+@router.delete("/manager/rules/{rule_id}")
+def manager_rules_delete(
+    rule_id: int, db: Session = Depends(get_db), me: Principal = Depends(get_principal)
+):
+    """Gli slot già prenotati restano: spariscono solo quelli ancora virtuali."""
+    if me.role != Role.MANAGER:
+        raise HTTPException(403, "Solo manager")
+    r = db.get(AvailabilityRule, rule_id)
+    if not r or r.is_deleted:
+        raise HTTPException(404, "Regola non trovata")
+    r.is_deleted = True
+    _emit_slots(db, "rules", r.valid_from, r.valid_to)
+    _commit_changes(db, rules=True)
+    return {"ok": True}
+
+
+@router.get("/manager/exceptions", response_model=List[ExceptionOut])
+def manager_exceptions_list(
+    db: Session = Depends(get_db), me: Principal = Depends(get_principal)
+):
+    if me.role != Role.MANAGER:
+        raise HTTPException(403, "Solo manager")
+    return _exceptions_query(db).all()
+
+
+@router.post("/manager/exceptions", response_model=ExceptionOut)
+def manager_exceptions_create(
+    payload: ExceptionIn, db: Session = Depends(get_db), me: Principal = Depends(get_principal)
+):
+    if me.role != Role.MANAGER:
+        raise HTTPException(403, "Solo manager")
+    if (payload.start_time is None) != (payload.end_time is None):
+        raise HTTPException(400, "Indica sia start_time che end_time (o nessuno dei due)")
+    if payload.start_time and payload.end_time != time(0, 0) and payload.end_time <= payload.start_time:
+        raise HTTPException(400, "Fine deve essere dopo l'inizio")
+
+    ex = AvailabilityException(
+        manager_id=me.id,
+        date=payload.date,
+        start_time=payload.start_time,
+        end_time=payload.end_time,
+        reason=payload.reason,
+    )
+    db.add(ex)
+    _emit_slots(db, "closure", payload.date)
+    _commit_changes(db, rules=True)
+    return ex
+
+
+@router.delete("/manager/exceptions/{exception_id}")
+def manager_exceptions_delete(
+    exception_id: int, db: Session = Depends(get_db), me: Principal = Depends(get_principal)
+):
+    if me.role != Role.MANAGER:
+        raise HTTPException(403, "Solo manager")
+    ex = db.get(AvailabilityException, exception_id)
+    if not ex:
+        raise HTTPException(404, "Eccezione non trovata")
+    db.delete(ex)
+    _emit_slots(db, "closure", ex.date)
+    _commit_changes(db, rules=True)
     return {"ok": True}
 
 
@@ -319,50 +685,34 @@ def manager_slots_delete(
 def request_booking_from_slot(
     payload: CreateBookingFromSlotIn,
     db: Session = Depends(get_db),
-    me: User = Depends(get_current_user),
+    me: Principal = Depends(get_principal),
 ):
     if me.role != Role.ARTIST:
         raise HTTPException(403, "Solo gli artisti possono prenotare")
 
-    slot = db.get(AvailabilitySlot, payload.slot_id)
-    if not slot or slot.is_deleted:
-        raise HTTPException(404, "Slot non trovato")
-
-    if slot.status != SlotStatus.LIBERO:
-        raise HTTPException(409, "Slot non disponibile")
+    slot_id = payload.slot_id
+    if slot_id is None and not (payload.rule_id and payload.slot_date and payload.start_time):
+        raise HTTPException(400, "Indica slot_id oppure rule_id + slot_date + start_time")
 
-    exists = (
-        db.query(Booking)
-        .filter(
-            Booking.slot_id == slot.id,
-            Booking.status.in_(
-                [
-                    BookingStatus.PENDING_PRODUCER,
-                    BookingStatus.PENDING_MANAGER,
-                    BookingStatus.CONFIRMED,
-                ]
-            ),
+    # claim atomico: slot LIBERO -> IN_SOSPESO + booking in un solo statement
+    try:
+        if slot_id is None:
+            # slot generato da una regola: la riga nasce adesso, nella stessa transazione
+            slot_id = materialize(db, payload.rule_id, payload.slot_date, payload.start_time)
+        b = claim_slot(
+            db,
+            slot_id=slot_id,
+            artist_id=me.id,
+            producer_id=payload.producer_id,
         )
-        .first()
-    )
-    if exists:
-        raise HTTPException(409, "Slot già prenotato o in verifica")
-
-    b = Booking(
-        slot_id=slot.id,
-        artist_id=me.id,
-        producer_id=payload.producer_id,
-        status=BookingStatus.PENDING_PRODUCER,
-        notes="",
-    )
-
-    slot.status = SlotStatus.IN_SOSPESO
-    db.add(b)
-    db.commit()
-    db.refresh(b)
+    except SlotUnavailable:
+        raise HTTPException(409, "Slot non disponibile o già prenotato")
+    _emit_booking(db, b)
+    _emit_slots(db, "status", slot_id=b.slot_id, status=SlotStatus.IN_SOSPESO.value)
 
+    slot = db.get(AvailabilitySlot, b.slot_id)
     producer = db.get(User, payload.producer_id)
-    if producer and producer.is_active and producer.email:
+    if slot and producer and producer.is_active and producer.email:
         subject = "Nuova richiesta di prenotazione"
         html = f"""
         <div style="font-family:Inter,Arial,sans-serif;color:#111;font-size:15px">
@@ -373,8 +723,9 @@ def request_booking_from_slot(
           <hr><small>W8 x CAG</small>
         </div>
         """
-        _send_to_many([producer.email], subject, html)
+        _send_to_many(db, "request", [producer.email], subject, html, key=f"booking:{b.id}:request")
 
+    _commit_changes(db)
     return b
 
 
@@ -387,24 +738,18 @@ auth_any_role = require_role(Role.MANAGER, Role.PRODUCER, Role.ARTIST)
 
 @router.get("/producer/incoming")
 def producer_incoming(
-    db: Session = Depends(get_db), me: User = Depends(get_current_user)
+    db: Session = Depends(get_db), me: Principal = Depends(get_principal)
 ):
     if me.role not in (Role.PRODUCER, Role.MANAGER):
         raise HTTPException(403, "Solo produttori/manager")
 
-    q = (
-        db.query(Booking)
-        .options(joinedload(Booking.slot), joinedload(Booking.artist))
-        .filter(Booking.status == BookingStatus.PENDING_PRODUCER)
-        .order_by(Booking.id.desc())
-    )
-    if me.role == Role.PRODUCER:
-        q = q.filter(Booking.producer_id == me.id)
+    # mostra solo richieste future (il manager le vede tutte)
+    return _producer_incoming_rows(db, me.id if me.role == Role.PRODUCER else None)
 
-    q = _only_future(q)  # mostra solo richieste future
 
+def _producer_incoming_rows(db: Session, producer_id: int | None) -> list[dict]:
     out = []
-    for b in q.all():
+    for b in _producer_incoming_query(db, producer_id).all():
         s = b.slot
         a = b.artist
         out.append(
@@ -423,26 +768,11 @@ def producer_incoming(
 
 @router.post("/{booking_id}/producer/accept", response_model=BookingOut)
 def producer_accept(
-    booking_id: int, db: Session = Depends(get_db), me: User = Depends(get_current_user)
+    booking_id: int, db: Session = Depends(get_db), me: Principal = Depends(get_principal)
 ):
-    b = db.get(Booking, booking_id)
-    if not b:
-        raise HTTPException(404, "Prenotazione non trovata")
-    if me.role == Role.PRODUCER and b.producer_id != me.id:
-        raise HTTPException(403, "Non autorizzato")
-    if me.role not in (Role.PRODUCER, Role.MANAGER):
-        raise HTTPException(403, "Non autorizzato")
-    if b.status != BookingStatus.PENDING_PRODUCER:
-        raise HTTPException(400, "Stato non valido")
-
-    b.status = BookingStatus.PENDING_MANAGER
-    db.commit()
-    db.refresh(b)
-
-    slot = db.get(AvailabilitySlot, b.slot_id)
-    artist = db.get(User, b.artist_id)
-    producer = db.get(User, b.producer_id)
-    to_mgrs = _manager_emails(db)
+    b = _transition(db, "producer_accept", booking_id, me)
+    slot, artist, producer = b.slot, b.artist, b.producer
+    to_mgrs = recipients.managers(db, "producer_accept")
 
     if slot and artist and producer:
         if to_mgrs:
@@ -456,7 +786,10 @@ def producer_accept(
               <hr><small>W8 x CAG</small>
             </div>
             """
-            _send_to_many(to_mgrs, subject_mgr, html_mgr)
+            _notify_managers(
+                db, "producer_accept", b, to_mgrs, subject_mgr, html_mgr,
+                line=f"<b>{_user_label(producer)}</b> ha accettato la richiesta di <b>{_user_label(artist)}</b> — {_fmt_slot(slot)}",
+            )
 
         subject_artist = "Il produttore ha accettato la tua richiesta"
         html_artist = f"""
@@ -468,34 +801,18 @@ def producer_accept(
           <hr><small>W8 x CAG</small>
         </div>
         """
-        _send_to_many([artist.email], subject_artist, html_artist)
+        _send_to_many(db, "producer_accept", [artist.email], subject_artist, html_artist, key=f"booking:{b.id}:producer_accept:artist")
 
+    _commit_changes(db)
     return b
 
 
 @router.post("/{booking_id}/producer/reject", response_model=BookingOut)
 def producer_reject(
-    booking_id: int, db: Session = Depends(get_db), me: User = Depends(get_current_user)
+    booking_id: int, db: Session = Depends(get_db), me: Principal = Depends(get_principal)
 ):
-    b = db.get(Booking, booking_id)
-    if not b:
-        raise HTTPException(404, "Prenotazione non trovata")
-    if me.role == Role.PRODUCER and b.producer_id != me.id:
-        raise HTTPException(403, "Non autorizzato")
-    if me.role not in (Role.PRODUCER, Role.MANAGER):
-        raise HTTPException(403, "Non autorizzato")
-    if b.status != BookingStatus.PENDING_PRODUCER:
-        raise HTTPException(400, "Stato non valido")
-
-    b.status = BookingStatus.REJECTED_BY_PRODUCER
-    slot = db.get(AvailabilitySlot, b.slot_id)
-    if slot:
-        slot.status = SlotStatus.LIBERO
-    db.commit()
-    db.refresh(b)
-
-    artist = db.get(User, b.artist_id)
-    producer = db.get(User, b.producer_id)
+    b = _transition(db, "producer_reject", booking_id, me)
+    slot, artist, producer = b.slot, b.artist, b.producer
     if slot and artist and producer and artist.email:
         subject = "La tua richiesta è stata rifiutata dal produttore"
         html = f"""
@@ -506,8 +823,9 @@ def producer_reject(
           <hr><small>W8 x CAG</small>
         </div>
         """
-        _send_to_many([artist.email], subject, html)
+        _send_to_many(db, "producer_reject", [artist.email], subject, html, key=f"booking:{b.id}:producer_reject")
 
+    _commit_changes(db)
     return b
 
 
@@ -516,36 +834,16 @@ def producer_reject(
 # -----------------------------------------------------------------------------
 @router.get("/manager/pending")
 def manager_pending(
-    db: Session = Depends(get_db), me: User = Depends(get_current_user)
+    db: Session = Depends(get_db), me: Principal = Depends(get_principal)
 ):
     if me.role != Role.MANAGER:
         raise HTTPException(403, "Solo manager")
+    return _manager_pending_rows(db)
 
-    Artist = aliased(User)
-    Producer = aliased(User)
 
-    q = (
-        db.query(
-            Booking.id.label("booking_id"),
-            Booking.status.label("b_status"),
-            AvailabilitySlot.date.label("s_date"),
-            AvailabilitySlot.start_time.label("s_start"),
-            AvailabilitySlot.end_time.label("s_end"),
-            Artist.display_name.label("artist_name"),
-            Artist.email.label("artist_email"),
-            Producer.display_name.label("producer_name"),
-            Producer.email.label("producer_email"),
-        )
-        .join(AvailabilitySlot, Booking.slot_id == AvailabilitySlot.id)
-        .join(Artist, Booking.artist_id == Artist.id)
-        .join(Producer, Booking.producer_id == Producer.id)
-        .filter(Booking.status == BookingStatus.PENDING_MANAGER)
-        .order_by(AvailabilitySlot.date.asc(), AvailabilitySlot.start_time.asc())
-    )
-
-    rows = q.all()
+def _manager_pending_rows(db: Session) -> list[dict]:
     out = []
-    for r in rows:
+    for r in _manager_pending_query(db).all():
         out.append(
             {
                 "id": r.booking_id,
@@ -564,49 +862,12 @@ def manager_pending(
 
 @router.post("/{booking_id}/manager/accept", response_model=BookingOut)
 def manager_accept(
-    booking_id: int, db: Session = Depends(get_db), me: User = Depends(get_current_user)
+    booking_id: int, db: Session = Depends(get_db), me: Principal = Depends(get_principal)
 ):
-    if me.role != Role.MANAGER:
-        raise HTTPException(403, "Solo manager")
-    b = db.get(Booking, booking_id)
-    if not b or b.status != BookingStatus.PENDING_MANAGER:
-        raise HTTPException(400, "Stato non valido")
-
-    b.status = BookingStatus.CONFIRMED
-
-    slot = db.get(AvailabilitySlot, b.slot_id)
-    if slot:
-        try:
-            slot.status = SlotStatus.OCCUPATO
-        except Exception:
-            slot.status = getattr(SlotStatus, "BOOKED", slot.status)
-
-    # Calendar (best-effort)
-    try:
-        cal_id = settings.GOOGLE_CALENDAR_ID or "primary"
-        artist = db.get(User, b.artist_id)
-        producer = db.get(User, b.producer_id)
-        create_calendar_event(
-            calendar_id=cal_id,
-            slot_date=slot.date,
-            start_time=slot.start_time,
-            end_time=slot.end_time,
-            artist_name=(artist.display_name if artist else None),
-            artist_email=(artist.email if artist else None),
-            producer_name=(producer.display_name if producer else None),
-            producer_email=(producer.email if producer else None),
-            manager_name=_user_label(me),
-            description=f"Prenotazione confermata (ID {b.id}).",
-        )
-    except Exception as e:
-        print("Calendar error:", e)
-
-    db.commit()
-    db.refresh(b)
+    b = _transition(db, "manager_accept", booking_id, me)
+    slot, artist, producer = b.slot, b.artist, b.producer
 
     if slot:
-        artist = db.get(User, b.artist_id)
-        producer = db.get(User, b.producer_id)
         tos = [x.email for x in (artist, producer) if x and x.email]
         if tos:
             subject = "Prenotazione confermata"
@@ -621,31 +882,37 @@ def manager_accept(
               <hr><small>W8 x CAG</small>
             </div>
             """
-            _send_to_many(tos, subject, html)
+            _send_to_many(db, "manager_accept", tos, subject, html, key=f"booking:{b.id}:manager_accept")
+    _commit_changes(db)
+
+    # Calendar (best-effort): dopo il commit, così la chiamata HTTP a Google
+    # non tiene aperta la transazione né i lock sulle righe
+    try:
+        cal_id = settings.GOOGLE_CALENDAR_ID or "primary"
+        create_calendar_event(
+            calendar_id=cal_id,
+            slot_date=slot.date,
+            start_time=slot.start_time,
+            end_time=slot.end_time,
+            artist_name=artist.display_name,
+            artist_email=artist.email,
+            producer_name=producer.display_name,
+            producer_email=producer.email,
+            manager_name=_user_label(me),
+            description=f"Prenotazione confermata (ID {b.id}).",
+        )
+    except Exception as e:
+        print("Calendar error:", e)
 
     return b
 
 
 @router.post("/{booking_id}/manager/reject", response_model=BookingOut)
 def manager_reject(
-    booking_id: int, db: Session = Depends(get_db), me: User = Depends(get_current_user)
+    booking_id: int, db: Session = Depends(get_db), me: Principal = Depends(get_principal)
 ):
-    if me.role != Role.MANAGER:
-        raise HTTPException(403, "Solo manager")
-    b = db.get(Booking, booking_id)
-    if not b or b.status != BookingStatus.PENDING_MANAGER:
-        raise HTTPException(400, "Stato non valido")
-
-    b.status = BookingStatus.REJECTED_BY_MANAGER
-    slot = db.get(AvailabilitySlot, b.slot_id)
-    if slot:
-        slot.status = SlotStatus.LIBERO
-
-    db.commit()
-    db.refresh(b)
-
-    artist = db.get(User, b.artist_id)
-    producer = db.get(User, b.producer_id)
+    b = _transition(db, "manager_reject", booking_id, me)
+    slot, artist, producer = b.slot, b.artist, b.producer
     if slot and artist and producer:
         subject = "Prenotazione rifiutata dal manager"
         html = f"""
@@ -660,8 +927,9 @@ def manager_reject(
         </div>
         """
         tos = [x.email for x in (artist, producer) if x and x.email]
-        _send_to_many(tos, subject, html)
+        _send_to_many(db, "manager_reject", tos, subject, html, key=f"booking:{b.id}:manager_reject")
 
+    _commit_changes(db)
     return b
 
 
@@ -670,7 +938,7 @@ def manager_reject(
 # -----------------------------------------------------------------------------
 @router.post("/{booking_id}/producer/cancel", response_model=BookingOut)
 def producer_cancel(
-    booking_id: int, db: Session = Depends(get_db), me: User = Depends(get_current_user)
+    booking_id: int, db: Session = Depends(get_db), me: Principal = Depends(get_principal)
 ):
     """
     Il PRODUTTORE annulla una prenotazione confermata per imprevisti.
@@ -679,29 +947,9 @@ def producer_cancel(
       - avviso all'artista
       - avviso a tutti i manager
     """
-    b = db.get(Booking, booking_id)
-    if not b:
-        raise HTTPException(404, "Prenotazione non trovata")
-    if me.role != Role.PRODUCER:
-        raise HTTPException(403, "Solo il produttore può annullare")
-    if b.producer_id != me.id:
-        raise HTTPException(403, "Non autorizzato")
-    if b.status != BookingStatus.CONFIRMED:
-        raise HTTPException(
-            400,
-            "Solo le prenotazioni confermate possono essere annullate dal produttore",
-        )
-
-    b.status = BookingStatus.CANCELED_BY_PRODUCER
-    slot = db.get(AvailabilitySlot, b.slot_id)
-    if slot:
-        slot.status = SlotStatus.LIBERO
-    db.commit()
-    db.refresh(b)
-
-    artist = db.get(User, b.artist_id)
-    producer = db.get(User, b.producer_id)
-    to_mgrs = _manager_emails(db)
+    b = _transition(db, "producer_cancel", booking_id, me)
+    slot, artist, producer = b.slot, b.artist, b.producer
+    to_mgrs = recipients.managers(db, "producer_cancel")
 
     # conferma al producer
     if producer and producer.email and slot:
@@ -714,7 +962,7 @@ def producer_cancel(
           <hr><small>W8 x CAG</small>
         </div>
         """
-        _send_to_many([producer.email], subject_p, html_p)
+        _send_to_many(db, "producer_cancel", [producer.email], subject_p, html_p, key=f"booking:{b.id}:producer_cancel:producer")
 
     # avvisi
     if artist and artist.email and slot:
@@ -727,7 +975,7 @@ def producer_cancel(
           <hr><small>W8 x CAG</small>
         </div>
         """
-        _send_to_many([artist.email], subject_a, html_a)
+        _send_to_many(db, "producer_cancel", [artist.email], subject_a, html_a, key=f"booking:{b.id}:producer_cancel:artist")
 
     if to_mgrs and slot:
         subject_m = "Prenotazione annullata dal produttore"
@@ -739,14 +987,18 @@ def producer_cancel(
           <hr><small>W8 x CAG</small>
         </div>
         """
-        _send_to_many(to_mgrs, subject_m, html_m)
+        _notify_managers(
+            db, "producer_cancel", b, to_mgrs, subject_m, html_m,
+            line=f"<b>{_user_label(producer)}</b> ha annullato la prenotazione confermata con <b>{_user_label(artist)}</b> — {_fmt_slot(slot)}",
+        )
 
+    _commit_changes(db)
     return b
 
 
 @router.post("/{booking_id}/artist/cancel", response_model=BookingOut)
 def artist_cancel(
-    booking_id: int, db: Session = Depends(get_db), me: User = Depends(get_current_user)
+    booking_id: int, db: Session = Depends(get_db), me: Principal = Depends(get_principal)
 ):
     """
     L'ARTISTA annulla una prenotazione confermata.
@@ -755,28 +1007,9 @@ def artist_cancel(
       - avviso al relativo produttore
       - avviso a tutti i manager
     """
-    b = db.get(Booking, booking_id)
-    if not b:
-        raise HTTPException(404, "Prenotazione non trovata")
-    if me.role != Role.ARTIST:
-        raise HTTPException(403, "Solo l'artista può annullare")
-    if b.artist_id != me.id:
-        raise HTTPException(403, "Non autorizzato")
-    if b.status != BookingStatus.CONFIRMED:
-        raise HTTPException(
-            400, "Solo le prenotazioni confermate possono essere annullate dall'artista"
-        )
-
-    b.status = BookingStatus.CANCELED_BY_ARTIST
-    slot = db.get(AvailabilitySlot, b.slot_id)
-    if slot:
-        slot.status = SlotStatus.LIBERO
-    db.commit()
-    db.refresh(b)
-
-    artist = db.get(User, b.artist_id)
-    producer = db.get(User, b.producer_id)
-    to_mgrs = _manager_emails(db)
+    b = _transition(db, "artist_cancel", booking_id, me)
+    slot, artist, producer = b.slot, b.artist, b.producer
+    to_mgrs = recipients.managers(db, "artist_cancel")
 
     # conferma all'artista
     if artist and artist.email and slot:
@@ -789,7 +1022,7 @@ def artist_cancel(
           <hr><small>W8 x CAG</small>
         </div>
         """
-        _send_to_many([artist.email], subject_a, html_a)
+        _send_to_many(db, "artist_cancel", [artist.email], subject_a, html_a, key=f"booking:{b.id}:artist_cancel:artist")
 
     # avviso al producer
     if producer and producer.email and slot:
@@ -802,7 +1035,7 @@ def artist_cancel(
           <hr><small>W8 x CAG</small>
         </div>
         """
-        _send_to_many([producer.email], subject_p, html_p)
+        _send_to_many(db, "artist_cancel", [producer.email], subject_p, html_p, key=f"booking:{b.id}:artist_cancel:producer")
 
     # avviso a manager
     if to_mgrs and slot:
@@ -815,8 +1048,12 @@ def artist_cancel(
           <hr><small>W8 x CAG</small>
         </div>
         """
-        _send_to_many(to_mgrs, subject_m, html_m)
+        _notify_managers(
+            db, "artist_cancel", b, to_mgrs, subject_m, html_m,
+            line=f"<b>{_user_label(artist)}</b> ha annullato la prenotazione confermata con <b>{_user_label(producer)}</b> — {_fmt_slot(slot)}",
+        )
 
+    _commit_changes(db)
     return b
 
 
@@ -825,22 +1062,20 @@ def artist_cancel(
 # -----------------------------------------------------------------------------
 @router.get("/agenda/confirmed")
 def agenda_confirmed(
-    current: User = Depends(get_current_user), db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    current: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
 ):
-    q = (
-        db.query(Booking)
-        .options(
-            joinedload(Booking.slot),
-            joinedload(Booking.artist),
-            joinedload(Booking.producer),
-        )
-        .filter(Booking.status == BookingStatus.CONFIRMED)
-    )
-    q = _only_future(q)  # solo eventi futuri
-    q = q.order_by(AvailabilitySlot.date.asc(), AvailabilitySlot.start_time.asc())
+    not_modified = change_version.not_modified(request, response, change_version.etag(db))
+    if not_modified:
+        return not_modified
+    return _agenda_confirmed_rows(db)
 
+
+def _agenda_confirmed_rows(db: Session) -> list[dict]:
     out = []
-    for b in q.all():
+    for b in _agenda_confirmed_query(db).all():
         s = b.slot
         out.append(
             {
@@ -856,4 +1091,238 @@ def agenda_confirmed(
                 else None,
             }
         )
-    return out
\ No newline at end of file
+    return out
+
+
+# -----------------------------------------------------------------------------
+# DASHBOARD: primo caricamento in una richiesta sola
+# -----------------------------------------------------------------------------
+_BOOTSTRAP_PAGE = 200  # come il limit di default di /availability e /manager/slots
+
+
+@router.get("/bootstrap", response_model=BootstrapOut)
+def dashboard_bootstrap(
+    request: Request,
+    response: Response,
+    me: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Utente + liste della dashboard del suo ruolo, con la stessa sessione (una
+    connessione dal pool, un solo controllo del token) e una query per lista:
+      - artista:  producer, prima pagina di disponibilità, calendario del mese, agenda
+      - producer: richieste in arrivo, agenda
+      - manager:  da approvare, prima pagina di slot, regole, eccezioni, agenda
+    Le pagine successive restano sugli endpoint normali (next_cursor). Le
+    versioni si leggono per prime: cursor ed events_id non saltano modifiche
+    arrivate mentre si costruiscono le liste (al più le rimandano).
+    """
+    v = change_version.versions(db)
+    booking_v = v[change_version.BOOKING]
+    tag = change_version.etag(db, version=booking_v)
+    # stessa versione ma liste diverse per ogni utente; USERS per la lista
+    # dei producer (un producer nuovo non tocca la versione delle prenotazioni)
+    not_modified = change_version.not_modified(
+        request, response, f'{tag[:-1]}-{v[change_version.USERS]}-u{me.id}.{me.token_version}"'
+    )
+    if not_modified:
+        return not_modified
+
+    out = {
+        "me": me,
+        "cursor": changes.make_cursor(booking_v, v[change_version.RULES]),
+        "events_id": events.id_after(booking_v),
+    }
+    if me.role == Role.MANAGER:
+        lo, hi = _manager_slot_window(None, None)
+        items, next_cursor = _slot_page(db, None, lo, hi, None, None, _BOOTSTRAP_PAGE, with_rules=False)
+        out["pending"] = _manager_pending_rows(db)
+        out["slots"] = {"items": items, "next_cursor": next_cursor}
+        out["rules"] = _rules_query(db).all()
+        out["exceptions"] = _exceptions_query(db).all()
+    elif me.role == Role.PRODUCER:
+        out["incoming"] = _producer_incoming_rows(db, me.id)
+    else:
+        lo, hi = _slot_window(None, None, None)
+        month_last = (lo.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        # slot generati calcolati una volta per la pagina e per il calendario del mese
+        generated = virtual_slots(db, lo, max(hi, month_last))
+        items, next_cursor = _slot_page(
+            db, None, lo, hi, None, None, _BOOTSTRAP_PAGE, with_rules=True, generated=generated
+        )
+        out["producers"] = users_query(db, Role.PRODUCER).all()
+        out["availability"] = {"items": items, "next_cursor": next_cursor}
+        out["calendar"] = month_summary(db, lo.year, lo.month, tag, generated)
+    out["agenda"] = _agenda_confirmed_rows(db)
+    return out
+
+
+@router.get("/counters", response_model=CountersOut)
+def dashboard_counters(
+    db: Session = Depends(get_db), me: Principal = Depends(get_principal)
+):
+    """
+    Numeri per i badge senza scaricare le liste: una query su booking_counters
+    (services.counters). pending_producer = richieste in arrivo (del producer,
+    o tutte per il manager), pending_manager = da approvare (solo manager),
+    confirmed = agenda condivisa. null = non riguarda il ruolo.
+    """
+    keys = {"confirmed": (counters.CONFIRMED, counters.TOTAL)}
+    if me.role == Role.MANAGER:
+        keys["pending_producer"] = (counters.PENDING_PRODUCER, counters.TOTAL)
+        keys["pending_manager"] = (counters.PENDING_MANAGER, counters.TOTAL)
+    elif me.role == Role.PRODUCER:
+        keys["pending_producer"] = (counters.PENDING_PRODUCER, me.id)
+    values = counters.get(db, list(keys.values()))
+    return {field: values[k] for field, k in keys.items()}
+
+
+# -----------------------------------------------------------------------------
+# STORICO (prenotazioni archiviate da services.archive)
+# -----------------------------------------------------------------------------
+_HISTORY_MAX_DAYS = 366
+
+
+@router.get("/history")
+def history(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    current: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+):
+    """
+    Prenotazioni archiviate nell'intervallo (default ultimi 90 giorni).
+    Manager: tutte; producer/artista: solo le proprie. Legge solo l'archivio
+    (su PostgreSQL solo le partizioni dei mesi richiesti).
+    """
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=90)
+    if date_to < date_from:
+        raise HTTPException(400, "date_to deve essere dopo date_from")
+    if (date_to - date_from).days >= _HISTORY_MAX_DAYS:
+        raise HTTPException(400, f"Intervallo massimo {_HISTORY_MAX_DAYS} giorni")
+
+    Artist = aliased(User)
+    Producer = aliased(User)
+    q = (
+        db.query(
+            BookingArchive.id,
+            BookingArchive.status,
+            SlotArchive.date,
+            SlotArchive.start_time,
+            SlotArchive.end_time,
+            Artist.display_name.label("artist_name"),
+            Artist.email.label("artist_email"),
+            Producer.display_name.label("producer_name"),
+            Producer.email.label("producer_email"),
+        )
+        .join(
+            SlotArchive,
+            and_(SlotArchive.id == BookingArchive.slot_id, SlotArchive.date == BookingArchive.slot_date),
+        )
+        .outerjoin(Artist, Artist.id == BookingArchive.artist_id)
+        .outerjoin(Producer, Producer.id == BookingArchive.producer_id)
+        .filter(BookingArchive.slot_date.between(date_from, date_to))
+    )
+    if current.role == Role.PRODUCER:
+        q = q.filter(BookingArchive.producer_id == current.id)
+    elif current.role != Role.MANAGER:
+        q = q.filter(BookingArchive.artist_id == current.id)
+
+    return [
+        {
+            "id": r.id,
+            "date": r.date.isoformat(),
+            "start_time": str(r.start_time)[:5],
+            "end_time": str(r.end_time)[:5],
+            "status": r.status.value,
+            "artist_name": r.artist_name or r.artist_email,
+            "producer_name": r.producer_name or r.producer_email,
+        }
+        for r in q.order_by(SlotArchive.date.desc(), SlotArchive.start_time.desc())
+    ]
+
+
+# -----------------------------------------------------------------------------
+# DELTA SYNC: solo le righe cambiate dopo un cursore
+# -----------------------------------------------------------------------------
+@router.get("/changes")
+def booking_changes(
+    since: str | None = None,
+    current: Principal = Depends(get_principal),
+    db: Session = Depends(get_db),
+):
+    """
+    Slot e prenotazioni (visibili all'utente) cambiati dopo `since`, più il
+    cursore da passare la volta dopo. Senza `since` solo il cursore: il client
+    lo prende insieme al primo caricamento completo.
+    deleted=true = tombstone (slot eliminato o riga archiviata); reset=true =
+    troppe modifiche o cursore non valido per questo DB, ricaricare tutto;
+    rules_changed=true = ricaricare la disponibilità (slot generati dalle regole).
+    """
+    if since is None:
+        now = changes.make_cursor(
+            change_version.current(db), change_version.current(db, change_version.RULES)
+        )
+        return {"cursor": now, "reset": False, "rules_changed": False, "slots": [], "bookings": []}
+    parsed = changes.parse_cursor(since)
+    if parsed is None:
+        raise HTTPException(400, "since non valido")
+    return changes.changes_since(db, parsed, current.id, current.role)
+
+
+# -----------------------------------------------------------------------------
+# EVENTI LIVE (Server-Sent Events) per le dashboard
+# -----------------------------------------------------------------------------
+def _sse(ev: events.Event) -> str:
+    return f"id: {ev.id}\nevent: {ev.type}\ndata: {json.dumps(ev.data)}\n\n"
+
+
+@router.get("/events")
+async def booking_events(
+    request: Request,
+    last_event_id: str | None = Header(None),
+    db: Session = Depends(get_db),
+    me: Principal = Depends(get_principal),
+):
+    """
+    Stream SSE delle modifiche che riguardano l'utente: "booking" (le sue
+    prenotazioni; al manager quelle da approvare/in agenda) e "slots"
+    (disponibilità cambiata). Riconnettendo con Last-Event-ID arrivano gli
+    eventi persi; se sono troppo vecchi arriva "reset" (ricaricare le liste).
+    Commento ": ping" ogni EVENTS_HEARTBEAT_SEC per tenere viva la connessione.
+    """
+    # la connessione DB serviva solo per l'autenticazione: non tenerla per tutto lo stream
+    db.close()
+    sub, missed = events.subscribe(me.id, me.role, events.parse_id(last_event_id))
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            if missed is None:
+                yield "event: reset\ndata: {}\n\n"
+            sent = events.parse_id(last_event_id) or (0, 0)
+            for ev in missed or ():
+                sent = ev.key
+                yield _sse(ev)
+            while not await request.is_disconnected():
+                if sub.overflow:
+                    # coda piena: chiudo, il client riconnette con Last-Event-ID e recupera
+                    break
+                try:
+                    ev = await asyncio.wait_for(sub.queue.get(), settings.EVENTS_HEARTBEAT_SEC)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if ev.key <= sent:
+                    continue  # già mandato col recupero iniziale
+                sent = ev.key
+                yield _sse(ev)
+        finally:
+            events.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
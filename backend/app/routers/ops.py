@@ -7,6 +7,8 @@ from ..deps import get_current_user
 from ..models.user import User, Role
 from ..database import get_db
 from ..services.neon_ops import neon_usage_last_days, list_projects_and_resolve
+from ..core.user_cache import user_cache
+from ..services import maintenance, outbox
 
 router = APIRouter(prefix="/ops", tags=["ops"])
 
@@ -62,4 +64,39 @@ def neon_usage(
         project_name=meta.get("project_name"),
         last_updated=now_iso,
         raw=payload if include_raw else None,
-    )
\ No newline at end of file
+    )
+
+
+@router.get("/auth-cache")
+def auth_cache_stats(me: User = Depends(get_current_user)):
+    """Contatori della cache identità (hit/miss/evictions/invalidations)."""
+    _ensure_manager(me)
+    return {"ok": True, **user_cache.stats()}
+
+
+@router.get("/cleanup")
+def cleanup_report(me: User = Depends(get_current_user)):
+    """Ultimo giro della pulizia in background (righe trattate, batch, durata)."""
+    _ensure_manager(me)
+    return {"ok": True, "last": maintenance.last_report}
+
+
+@router.post("/cleanup/run")
+def cleanup_run(me: User = Depends(get_current_user)):
+    """Esegue subito un giro di pulizia (stesso lock del worker)."""
+    _ensure_manager(me)
+    return {"ok": True, **maintenance.run_once()}
+
+
+@router.get("/outbox")
+def outbox_stats(me: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Email in coda/consegnate/fallite, la più vecchia in attesa e gli ultimi errori."""
+    _ensure_manager(me)
+    return {"ok": True, **outbox.stats(db)}
+
+
+@router.post("/outbox/run")
+def outbox_run(me: User = Depends(get_current_user)):
+    """Un giro di invii subito, senza aspettare il worker."""
+    _ensure_manager(me)
+    return {"ok": True, **outbox.run_once()}
@@ -1,14 +1,50 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from ..database import get_db
+from ..deps import get_principal, Principal
+from ..models.notification_pref import NotificationOptOut
 from ..models.user import User, Role
+from ..schemas.auth import NotificationPrefsIn, NotificationPrefsOut
+from ..services import recipients
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-@router.get("")
-def list_users(role: Role | None = None, db: Session = Depends(get_db)):
+def users_query(db: Session, role: Role | None = None):
     q = db.query(User)
     if role:
         q = q.filter(User.role == role)
     # ordina prima per display_name se presente, altrimenti per email
-    return q.order_by(User.display_name.is_(None), User.display_name, User.email).all()
\ No newline at end of file
+    return q.order_by(User.display_name.is_(None), User.display_name, User.email)
+
+
+@router.get("")
+def list_users(role: Role | None = None, db: Session = Depends(get_db)):
+    return users_query(db, role).all()
+
+
+def _opt_outs(db: Session, user_id: int) -> list[NotificationOptOut]:
+    return db.query(NotificationOptOut).filter(NotificationOptOut.user_id == user_id).all()
+
+
+@router.get("/me/notifications", response_model=NotificationPrefsOut)
+def my_notifications(db: Session = Depends(get_db), me: Principal = Depends(get_principal)):
+    return {"events": recipients.EVENTS, "opt_out": sorted(o.event for o in _opt_outs(db, me.id))}
+
+
+@router.put("/me/notifications", response_model=NotificationPrefsOut)
+def set_my_notifications(
+    payload: NotificationPrefsIn, db: Session = Depends(get_db), me: Principal = Depends(get_principal)
+):
+    wanted = set(payload.opt_out)
+    unknown = wanted - recipients.EVENTS.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Eventi sconosciuti: {', '.join(sorted(unknown))}")
+    # add/delete via ORM: il commit svuota la cache di services.recipients
+    current = {o.event: o for o in _opt_outs(db, me.id)}
+    for ev, o in current.items():
+        if ev not in wanted:
+            db.delete(o)
+    for ev in wanted - current.keys():
+        db.add(NotificationOptOut(user_id=me.id, event=ev))
+    db.commit()
+    return {"events": recipients.EVENTS, "opt_out": sorted(wanted)}
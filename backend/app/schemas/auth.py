@@ -14,6 +14,11 @@ class LoginIn(BaseModel):
 class TokenOut(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: str | None = None
+    expires_in: int | None = None  # secondi di vita dell'access token
+
+class RefreshIn(BaseModel):
+    refresh_token: str
 
 class UserOut(BaseModel):
     id: int
@@ -28,4 +33,10 @@ class ForgotIn(BaseModel):
 
 class ResetIn(BaseModel):
     token: str
-    new_password: str
\ No newline at end of file
+    new_password: str
+class NotificationPrefsIn(BaseModel):
+    opt_out: list[str]  # eventi per cui NON ricevere email (chiavi di services.recipients.EVENTS)
+
+class NotificationPrefsOut(BaseModel):
+    events: dict[str, str]  # evento -> descrizione
+    opt_out: list[str]
@@ -2,9 +2,10 @@
 from __future__ import annotations
 from pydantic import BaseModel, Field
 from datetime import date, time
-from typing import Optional
+from typing import List, Optional
 from sqlalchemy.orm import aliased
 from ..models.user import User
+from .auth import UserOut
 
 # -----------------------------
 # SLOT (disponibilità studio)
@@ -23,8 +24,18 @@ class SlotBulkIn(BaseModel):
     end_time: time
     step_minutes: int = Field(60, ge=15, le=240)
 
+class SlotRangeIn(BaseModel):
+    """Creazione su più giorni: da date_from a date_to (inclusi), solo nei weekday indicati."""
+    date_from: date
+    date_to: date
+    weekdays: Optional[List[int]] = None  # 0 = lunedì ... 6 = domenica; None = tutti
+    start_time: time
+    end_time: time
+    step_minutes: int = Field(60, ge=15, le=240)
+
 class SlotOut(BaseModel):
-    id: int
+    id: Optional[int] = None       # None = slot generato da una regola, non ancora salvato
+    rule_id: Optional[int] = None  # presente solo per gli slot generati
     date: date
     start_time: time
     end_time: time
@@ -32,14 +43,81 @@ class SlotOut(BaseModel):
     class Config:
         from_attributes = True  # pydantic v2
 
+class DaySummaryOut(BaseModel):
+    """Riepilogo di un giorno per il calendario: numero di slot per stato."""
+    date: date
+    libero: int = 0
+    in_sospeso: int = 0
+    occupato: int = 0
+    chiuso: int = 0
+
+class FreeRunOut(BaseModel):
+    """Sequenza di slot liberi consecutivi (stesso manager, stesso giorno)."""
+    manager_id: int
+    date: date
+    start_time: time
+    end_time: time
+    minutes: int
+    slots: List[SlotOut]
+    class Config:
+        from_attributes = True
+
+# -----------------------------
+# REGOLE ricorrenti ed eccezioni
+# -----------------------------
+
+class RuleIn(BaseModel):
+    """Apertura settimanale: una regola per ogni weekday indicato (0 = lunedì)."""
+    weekdays: List[int]
+    start_time: time
+    end_time: time
+    step_minutes: int = Field(60, ge=15, le=240)
+    valid_from: Optional[date] = None
+    valid_to: Optional[date] = None
+
+class RuleOut(BaseModel):
+    id: int
+    manager_id: int
+    weekday: int
+    start_time: time
+    end_time: time
+    step_minutes: int
+    valid_from: Optional[date] = None
+    valid_to: Optional[date] = None
+    class Config:
+        from_attributes = True
+
+class ExceptionIn(BaseModel):
+    """Chiusura di un giorno (o di una fascia, se start_time/end_time sono indicati)."""
+    date: date
+    start_time: Optional[time] = None
+    end_time: Optional[time] = None
+    reason: Optional[str] = Field(None, max_length=200)
+
+class ExceptionOut(BaseModel):
+    id: int
+    manager_id: int
+    date: date
+    start_time: Optional[time] = None
+    end_time: Optional[time] = None
+    reason: Optional[str] = None
+    class Config:
+        from_attributes = True
+
 # -----------------------------
 # BOOKING (prenotazioni)
 # -----------------------------
 
 class CreateBookingFromSlotIn(BaseModel):
-    """Richiesta artista: prenota uno slot esistente scegliendo il producer."""
+    """
+    Richiesta artista: prenota uno slot scegliendo il producer.
+    Slot salvato -> slot_id; slot generato da una regola -> rule_id + slot_date + start_time.
+    """
     producer_id: int
-    slot_id: int
+    slot_id: Optional[int] = None
+    rule_id: Optional[int] = None
+    slot_date: Optional[date] = None
+    start_time: Optional[time] = None
 
 class BookingOut(BaseModel):
     id: int
@@ -64,4 +142,41 @@ class BookingOut(BaseModel):
     producer_email: Optional[str] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+# -----------------------------
+# DASHBOARD (primo caricamento)
+# -----------------------------
+
+class SlotPageOut(BaseModel):
+    """Prima pagina di slot; next_cursor come X-Next-Cursor delle liste."""
+    items: List[SlotOut]
+    next_cursor: Optional[str] = None
+
+class BootstrapOut(BaseModel):
+    """
+    Tutto quello che serve alla dashboard del ruolo in una risposta.
+    cursor -> /booking/changes?since=, events_id -> Last-Event-ID di /booking/events.
+    I campi degli altri ruoli restano null.
+    """
+    me: UserOut
+    cursor: str
+    events_id: str
+    # artista
+    producers: Optional[List[UserOut]] = None
+    availability: Optional[SlotPageOut] = None
+    calendar: Optional[List[DaySummaryOut]] = None
+    # producer
+    incoming: Optional[List[dict]] = None
+    # manager
+    pending: Optional[List[dict]] = None
+    slots: Optional[SlotPageOut] = None
+    rules: Optional[List[RuleOut]] = None
+    exceptions: Optional[List[ExceptionOut]] = None
+    # tutti
+    agenda: Optional[List[dict]] = None
+
+class CountersOut(BaseModel):
+    """Badge delle dashboard (GET /booking/counters); None = non riguarda il ruolo."""
+    pending_producer: Optional[int] = None
+    pending_manager: Optional[int] = None
+    confirmed: int = 0
@@ -0,0 +1,138 @@
+# backend/app/services/archive.py
+"""
+Archivio di slot e prenotazioni.
+
+Le righe non più "vive" escono da availability_slots / bookings e finiscono in
+availability_slots_archive / bookings_archive (models.archive):
+  - slot terminati (data < oggi, oppure oggi con end_time < adesso)
+  - slot eliminati dal manager (is_deleted) senza prenotazioni attive
+insieme a tutte le loro prenotazioni. Le tabelle calde restano piccole e gli
+indici parziali su is_deleted = false coprono praticamente tutto.
+
+Lo sposta services.maintenance a batch (INSERT ... SELECT + DELETE nella stessa
+transazione). Su PostgreSQL l'archivio è partizionato per mese: la query di
+storico con un intervallo di date legge solo le partizioni che servono.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import and_, delete, distinct, exists, insert, or_, select, text, update
+from sqlalchemy.orm import Session
+
+from ..models.archive import SlotArchive, BookingArchive
+from ..models.booking import Booking, ACTIVE_BOOKING_STATUSES
+from ..models.slot import AvailabilitySlot
+from . import change_version, counters
+
+_SLOT_COLS = ("id", "manager_id", "date", "start_time", "end_time", "status", "is_deleted")
+_BOOKING_COLS = ("id", "slot_id", "artist_id", "producer_id", "status", "notes")
+
+
+def _month_bounds(d: date) -> tuple[date, date]:
+    first = d.replace(day=1)
+    return first, (first + timedelta(days=32)).replace(day=1)
+
+
+def ensure_partitions(db: Session, days) -> None:
+    """Crea (se mancano) le partizioni mensili che contengono i giorni indicati."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for first, nxt in sorted({_month_bounds(d) for d in days}):
+        for table in (SlotArchive.__tablename__, BookingArchive.__tablename__):
+            db.execute(
+                text(
+                    f"CREATE TABLE IF NOT EXISTS {table}_{first:%Y_%m} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{first.isoformat()}') TO ('{nxt.isoformat()}')"
+                )
+            )
+
+
+def _archivable_ids(db: Session, batch_size: int) -> list[int]:
+    now = datetime.now()
+    today, now_time = now.date(), now.time().replace(microsecond=0)
+    ids = list(db.scalars(
+        select(AvailabilitySlot.id)
+        .where(
+            or_(
+                AvailabilitySlot.date < today,
+                and_(AvailabilitySlot.date == today, AvailabilitySlot.end_time < now_time),
+            )
+        )
+        .limit(batch_size)
+    ))
+    if len(ids) < batch_size:
+        active = exists().where(
+            Booking.slot_id == AvailabilitySlot.id,
+            Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+        )
+        ids += db.scalars(
+            select(AvailabilitySlot.id)
+            .where(AvailabilitySlot.is_deleted == True, ~active)
+            .limit(batch_size - len(ids))
+        ).all()
+    return list(dict.fromkeys(ids))
+
+
+def archive_batch(db: Session, batch_size: int) -> tuple[int, int]:
+    """
+    Sposta in archivio al massimo `batch_size` slot con le loro prenotazioni.
+    Le righe archiviate prendono change_seq = nuova versione: per il delta sync
+    sono le tombstone delle righe sparite. Non fa commit. Ritorna (slot,
+    prenotazioni) archiviati.
+
+    Come _commit_changes, bump è in fondo (dopo DDL, INSERT e DELETE): il lock
+    sulla versione dura solo fino al commit e si prende sempre dopo quelli
+    sulle prenotazioni, poi i contatori; le righe d'archivio nascono con
+    change_seq NULL e si numerano dopo il bump.
+    """
+    ids = _archivable_ids(db, batch_size)
+    if not ids:
+        return 0, 0
+
+    ensure_partitions(
+        db, db.scalars(select(distinct(AvailabilitySlot.date)).where(AvailabilitySlot.id.in_(ids)))
+    )
+
+    db.execute(
+        insert(BookingArchive).from_select(
+            ["slot_date", *_BOOKING_COLS],
+            select(AvailabilitySlot.date, *(getattr(Booking, c) for c in _BOOKING_COLS))
+            .join(AvailabilitySlot, AvailabilitySlot.id == Booking.slot_id)
+            .where(Booking.slot_id.in_(ids)),
+        )
+    )
+    gone = db.execute(
+        delete(Booking).where(Booking.slot_id.in_(ids)).returning(Booking.status, Booking.producer_id)
+    ).all()
+    counters.forget(db, gone)
+    bookings = len(gone)
+
+    db.execute(
+        insert(SlotArchive).from_select(
+            list(_SLOT_COLS),
+            select(*(getattr(AvailabilitySlot, c) for c in _SLOT_COLS)).where(AvailabilitySlot.id.in_(ids)),
+        )
+    )
+    slots = db.execute(delete(AvailabilitySlot).where(AvailabilitySlot.id.in_(ids))).rowcount or 0
+
+    version = change_version.bump(db)
+    counters.apply(db)
+    for model, key in ((BookingArchive, BookingArchive.slot_id), (SlotArchive, SlotArchive.id)):
+        db.execute(
+            update(model)
+            .where(key.in_(ids), model.change_seq.is_(None))
+            .values(change_seq=version)
+            .execution_options(synchronize_session=False)
+        )
+    return slots, bookings
+
+
+def deleted_slot_keys(db: Session, date_from: date, date_to: date) -> set[tuple]:
+    """(manager_id, date, start_time, end_time) degli slot eliminati e già archiviati nel periodo."""
+    return {
+        tuple(r)
+        for r in db.execute(
+            select(
+                SlotArchive.manager_id, SlotArchive.date, SlotArchive.start_time, SlotArchive.end_time
+            ).where(SlotArchive.date.between(date_from, date_to), SlotArchive.is_deleted == True)
+        )
+    }
@@ -0,0 +1,393 @@
+# backend/app/services/availability.py
+"""
+Disponibilità "pigra" dalle regole ricorrenti.
+
+Gli slot generati dalle AvailabilityRule non esistono nel DB: virtual_slots li
+calcola solo per la finestra richiesta, togliendo quelli coperti da una
+AvailabilityException e quelli che hanno già una riga in availability_slots
+(prenotati, liberati dopo un rifiuto, o eliminati dal manager, anche se
+già spostati in archivio).
+
+Una riga viene scritta solo quando un artista prenota: materialize la crea con
+lo stesso INSERT ... ON CONFLICT DO NOTHING della creazione massiva, poi il
+claim procede come per gli slot normali.
+
+month_summary dà i conteggi per giorno e stato di un mese (calendario): un
+GROUP BY sugli slot salvati + gli slot generati contati in memoria, con una
+piccola cache in processo.
+
+free_runs cerca sessioni lunghe (es. 3 ore): sequenze di slot LIBERO
+consecutivi dello stesso manager nello stesso giorno. Le "isole" di slot
+salvati le calcola il DB con funzioni finestra (lag/lead + somma progressiva),
+poi si uniscono agli slot generati dalle regole.
+"""
+import threading
+import time as _time
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import and_, case, func, select, or_
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.availability_rule import AvailabilityRule, AvailabilityException
+from ..models.slot import AvailabilitySlot, SlotStatus
+from .archive import deleted_slot_keys
+from .booking_state import SlotUnavailable
+from .slots import day_times, days_in_range, insert_slots
+
+
+@dataclass(frozen=True)
+class VirtualSlot:
+    rule_id: int
+    manager_id: int
+    date: date
+    start_time: time
+    end_time: time
+    id: int | None = None
+    status: SlotStatus = SlotStatus.LIBERO
+
+
+def _minutes(t: time | None) -> int:
+    return 0 if t is None else t.hour * 60 + t.minute
+
+
+def _end_minutes(t: time | None) -> int:
+    # 00:00 come fine = mezzanotte successiva
+    return 24 * 60 if t is None or t == time(0, 0) else _minutes(t)
+
+
+def _closed(ranges: list[tuple[int, int]], st: time, et: time) -> bool:
+    a, b = _minutes(st), _end_minutes(et)
+    return any(a < hi and b > lo for lo, hi in ranges)
+
+
+def _live_rules(db: Session, date_from: date, date_to: date) -> list[AvailabilityRule]:
+    return db.scalars(
+        select(AvailabilityRule).where(
+            AvailabilityRule.is_deleted == False,
+            or_(AvailabilityRule.valid_from.is_(None), AvailabilityRule.valid_from <= date_to),
+            or_(AvailabilityRule.valid_to.is_(None), AvailabilityRule.valid_to >= date_from),
+        )
+    ).all()
+
+
+def _rule_applies(rule: AvailabilityRule, day: date) -> bool:
+    return (
+        day.weekday() == rule.weekday
+        and (rule.valid_from is None or rule.valid_from <= day)
+        and (rule.valid_to is None or rule.valid_to >= day)
+    )
+
+
+def _exceptions(db: Session, date_from: date, date_to: date) -> dict[date, list[tuple[int, int]]]:
+    """Chiusure per giorno, come intervalli in minuti [inizio, fine)."""
+    q = select(
+        AvailabilityException.date,
+        AvailabilityException.start_time,
+        AvailabilityException.end_time,
+    ).where(AvailabilityException.date.between(date_from, date_to))
+    out: dict[date, list[tuple[int, int]]] = {}
+    for d, st, et in db.execute(q):
+        out.setdefault(d, []).append((_minutes(st), _end_minutes(et)))
+    return out
+
+
+def _is_past(day: date, et: time, now: datetime) -> bool:
+    # stesso criterio di _only_future nel router
+    return day < now.date() or (day == now.date() and et < now.time().replace(microsecond=0))
+
+
+def virtual_slots(db: Session, date_from: date, date_to: date, now: datetime | None = None) -> list[VirtualSlot]:
+    """Slot liberi generati dalle regole in [date_from, date_to], solo futuri."""
+    now = now or datetime.now()
+    rules = _live_rules(db, date_from, date_to)
+    if not rules:
+        return []
+
+    closed = _exceptions(db, date_from, date_to)
+    # qualsiasi riga esistente (anche eliminata, anche già in archivio) "copre" lo slot virtuale
+    existing = deleted_slot_keys(db, date_from, date_to) | {
+        tuple(r)
+        for r in db.execute(
+            select(
+                AvailabilitySlot.manager_id,
+                AvailabilitySlot.date,
+                AvailabilitySlot.start_time,
+                AvailabilitySlot.end_time,
+            ).where(AvailabilitySlot.date.between(date_from, date_to))
+        )
+    }
+
+    by_weekday: dict[int, list[AvailabilityRule]] = {}
+    for r in rules:
+        by_weekday.setdefault(r.weekday, []).append(r)
+
+    out: list[VirtualSlot] = []
+    for day in days_in_range(date_from, date_to):
+        for rule in by_weekday.get(day.weekday(), ()):
+            if not _rule_applies(rule, day):
+                continue
+            ranges = closed.get(day, [])
+            for st, et in day_times(rule.start_time, rule.end_time, rule.step_minutes):
+                if (rule.manager_id, day, st, et) in existing:
+                    continue
+                if ranges and _closed(ranges, st, et):
+                    continue
+                if _is_past(day, et, now):
+                    continue
+                out.append(VirtualSlot(rule.id, rule.manager_id, day, st, et))
+    return out
+
+
+def materialize(db: Session, rule_id: int, day: date, start_time: time) -> int:
+    """
+    Scrive la riga availability_slots dello slot virtuale (rule_id, day,
+    start_time) e ne ritorna l'id; se la riga c'è già ritorna quella.
+    Alza SlotUnavailable se la regola non genera quello slot, se è chiuso da
+    un'eccezione, passato o eliminato dal manager. Non fa commit.
+    """
+    rule = db.get(AvailabilityRule, rule_id)
+    if rule is None or rule.is_deleted or not _rule_applies(rule, day):
+        raise SlotUnavailable()
+    times = dict(day_times(rule.start_time, rule.end_time, rule.step_minutes))
+    end_time = times.get(start_time)
+    if end_time is None or _is_past(day, end_time, datetime.now()):
+        raise SlotUnavailable()
+    ranges = _exceptions(db, day, day).get(day, [])
+    if ranges and _closed(ranges, start_time, end_time):
+        raise SlotUnavailable()
+
+    key = (
+        AvailabilitySlot.manager_id == rule.manager_id,
+        AvailabilitySlot.date == day,
+        AvailabilitySlot.start_time == start_time,
+        AvailabilitySlot.end_time == end_time,
+    )
+    rows = db.execute(select(AvailabilitySlot.id, AvailabilitySlot.is_deleted).where(*key)).all()
+    live = [r.id for r in rows if not r.is_deleted]
+    if live:
+        return live[0]
+    if rows or (rule.manager_id, day, start_time, end_time) in deleted_slot_keys(db, day, day):
+        # eliminato dal manager: non torna prenotabile dalla regola
+        raise SlotUnavailable()
+
+    insert_slots(db, rule.manager_id, [day], [(start_time, end_time)])
+    # se un'altra richiesta l'ha creato in parallelo, ON CONFLICT lo ha saltato
+    # e qui leggiamo la sua riga
+    return db.scalar(select(AvailabilitySlot.id).where(*key, AvailabilitySlot.is_deleted == False))
+
+
+# -----------------------------------------------------------------------------
+# Riepilogo mensile
+# -----------------------------------------------------------------------------
+# (anno, mese) -> (scadenza monotonic, etag con cui è stato calcolato, righe)
+_summary_cache: dict[tuple[int, int], tuple[float, str, list[dict]]] = {}
+_summary_lock = threading.Lock()
+
+
+def _month_counts(
+    db: Session, first: date, last: date, now: datetime, generated: list[VirtualSlot] | None
+) -> dict[date, dict[SlotStatus, int]]:
+    today, now_time = now.date(), now.time().replace(microsecond=0)
+    q = (
+        select(AvailabilitySlot.date, AvailabilitySlot.status, func.count())
+        .where(
+            AvailabilitySlot.is_deleted == False,
+            AvailabilitySlot.date.between(first, last),
+            # stesso criterio di _only_future nel router
+            or_(
+                AvailabilitySlot.date > today,
+                and_(AvailabilitySlot.date == today, AvailabilitySlot.end_time >= now_time),
+            ),
+        )
+        .group_by(AvailabilitySlot.date, AvailabilitySlot.status)
+    )
+    out: dict[date, dict[SlotStatus, int]] = {}
+    for d, st, n in db.execute(q):
+        out.setdefault(d, {})[SlotStatus(st)] = n
+    lo = max(first, today)
+    if lo <= last:
+        if generated is None:
+            generated = virtual_slots(db, lo, last, now)
+        for v in generated:
+            if not lo <= v.date <= last:
+                continue
+            day = out.setdefault(v.date, {})
+            day[SlotStatus.LIBERO] = day.get(SlotStatus.LIBERO, 0) + 1
+    return out
+
+
+def month_summary(
+    db: Session, year: int, month: int, tag: str, generated: list[VirtualSlot] | None = None
+) -> list[dict]:
+    """
+    Conteggi per giorno e stato (solo slot futuri, come /availability) del
+    mese, un elemento per ogni giorno con almeno uno slot.
+    `tag` = change_version.etag(...) corrente: se è cambiato dall'ultimo
+    calcolo (scrittura o nuovo quarto d'ora) la cache non vale più; in ogni
+    caso dura al massimo SUMMARY_CACHE_TTL_SEC.
+    `generated`: virtual_slots già calcolati su una finestra che copre il mese
+    da oggi in poi (li passa il bootstrap della dashboard), se no li calcola.
+    """
+    key = (year, month)
+    now_mono = _time.monotonic()
+    with _summary_lock:
+        hit = _summary_cache.get(key)
+        if hit and hit[0] > now_mono and hit[1] == tag:
+            return hit[2]
+
+    first = date(year, month, 1)
+    last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    counts = _month_counts(db, first, last, datetime.now(), generated)
+    rows = [
+        {
+            "date": d,
+            "libero": c.get(SlotStatus.LIBERO, 0),
+            "in_sospeso": c.get(SlotStatus.IN_SOSPESO, 0),
+            "occupato": c.get(SlotStatus.OCCUPATO, 0),
+            "chiuso": c.get(SlotStatus.CHIUSO, 0),
+        }
+        for d, c in sorted(counts.items())
+    ]
+
+    with _summary_lock:
+        _summary_cache[key] = (now_mono + settings.SUMMARY_CACHE_TTL_SEC, tag, rows)
+        # pochi mesi consultati davvero: tolgo solo le voci scadute
+        for k in [k for k, v in _summary_cache.items() if v[0] <= now_mono]:
+            del _summary_cache[k]
+    return rows
+
+
+# -----------------------------------------------------------------------------
+# Ricerca di tempo libero contiguo
+# -----------------------------------------------------------------------------
+@dataclass
+class FreeRun:
+    manager_id: int
+    date: date
+    start_time: time
+    end_time: time
+    minutes: int
+    slots: list  # AvailabilitySlot / VirtualSlot in ordine di orario
+
+
+def _future_filter(now: datetime):
+    # stesso criterio di _only_future nel router
+    today, now_time = now.date(), now.time().replace(microsecond=0)
+    return or_(
+        AvailabilitySlot.date > today,
+        and_(AvailabilitySlot.date == today, AvailabilitySlot.end_time >= now_time),
+    )
+
+
+def _free_islands(db: Session, date_from: date, date_to: date, now: datetime) -> list[tuple]:
+    """
+    Slot salvati LIBERO raggruppati in isole di slot consecutivi (fine di uno =
+    inizio del successivo) per (manager, giorno): (manager_id, date, inizio, fine).
+    """
+    S = AvailabilitySlot
+    part = dict(partition_by=(S.manager_id, S.date), order_by=S.start_time)
+    marked = (
+        select(
+            S.manager_id,
+            S.date,
+            S.start_time,
+            S.end_time,
+            # 1 = primo slot di un'isola / ultimo slot di un'isola
+            case((func.lag(S.end_time).over(**part) == S.start_time, 0), else_=1).label("first"),
+            case((func.lead(S.start_time).over(**part) == S.end_time, 0), else_=1).label("last"),
+        )
+        .where(
+            S.is_deleted == False,
+            S.status == SlotStatus.LIBERO,
+            S.date.between(date_from, date_to),
+            _future_filter(now),
+        )
+        .subquery()
+    )
+    m = marked.c
+    grouped = select(
+        m.manager_id,
+        m.date,
+        m.start_time,
+        m.end_time,
+        m.last,
+        func.sum(m.first)
+        .over(partition_by=(m.manager_id, m.date), order_by=m.start_time, rows=(None, 0))
+        .label("island"),
+    ).subquery()
+    g = grouped.c
+    return db.execute(
+        select(
+            g.manager_id,
+            g.date,
+            func.min(g.start_time),
+            # una sola riga "last" per isola: il max è la sua fine (anche se 00:00)
+            func.max(case((g.last == 1, g.end_time))),
+        ).group_by(g.manager_id, g.date, g.island)
+    ).all()
+
+
+def free_runs(
+    db: Session,
+    date_from: date,
+    date_to: date,
+    minutes: int,
+    limit: int,
+    now: datetime | None = None,
+) -> list[FreeRun]:
+    """
+    Prime `limit` sequenze (per data e ora) di slot liberi consecutivi lunghe
+    almeno `minutes`, tra date_from e date_to. Ogni sequenza è restituita
+    intera, con i suoi slot (salvati e generati) da prenotare.
+    """
+    now = now or datetime.now()
+    # blocchi: isole salvate + slot generati, poi fusione dei contigui
+    blocks = [(mid, d, st, et) for mid, d, st, et in _free_islands(db, date_from, date_to, now)]
+    generated = virtual_slots(db, date_from, date_to, now)
+    blocks += [(v.manager_id, v.date, v.start_time, v.end_time) for v in generated]
+    blocks.sort(key=lambda b: (b[0], b[1], b[2]))
+
+    runs: list[list] = []
+    for mid, d, st, et in blocks:
+        cur = runs[-1] if runs else None
+        # contigui o sovrapposti (es. slot da 1h di una regola sopra slot salvati da 30')
+        if cur and cur[0] == mid and cur[1] == d and _minutes(st) <= _end_minutes(cur[3]):
+            if _end_minutes(et) > _end_minutes(cur[3]):
+                cur[3] = et
+        else:
+            runs.append([mid, d, st, et])
+
+    found = sorted(
+        (r for r in runs if _end_minutes(r[3]) - _minutes(r[2]) >= minutes),
+        key=lambda r: (r[1], r[2], r[0]),
+    )[:limit]
+    if not found:
+        return []
+
+    def _inside(mid, d, st, et):
+        return lambda s: (
+            s.manager_id == mid and s.date == d and s.start_time >= st
+            and _end_minutes(s.end_time) <= _end_minutes(et)
+        )
+
+    # gli slot salvati delle sequenze scelte, in una query sola
+    S = AvailabilitySlot
+    saved = db.scalars(
+        select(S).where(
+            S.is_deleted == False,
+            S.status == SlotStatus.LIBERO,
+            or_(*(and_(S.manager_id == mid, S.date == d, S.start_time >= st) for mid, d, st, _ in found)),
+        )
+    ).all()
+
+    out: list[FreeRun] = []
+    for mid, d, st, et in found:
+        inside = _inside(mid, d, st, et)
+        slots = sorted(
+            [s for s in saved if inside(s)] + [v for v in generated if inside(v)],
+            key=lambda s: s.start_time,
+        )
+        out.append(FreeRun(mid, d, st, et, _end_minutes(et) - _minutes(st), slots))
+    return out
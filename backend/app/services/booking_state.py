@@ -0,0 +1,339 @@
+# backend/app/services/booking_state.py
+"""
+Macchina a stati di prenotazioni e slot.
+
+Tabella unica delle transizioni (TRANSITIONS) e operazioni atomiche:
+  - claim_slot:        slot LIBERO -> IN_SOSPESO + booking PENDING_PRODUCER
+  - apply_transition:  booking da->a + stato slot, in un solo UPDATE guardato
+Entrambe aggiornano i contatori dei badge (services.counters).
+
+Il DB garantisce l'invariante "al massimo una prenotazione attiva per slot"
+(indice unico parziale ux_bookings_active_slot); qui le operazioni sono scritte
+come singoli statement condizionali, così due richieste concorrenti non possono
+passare entrambe un controllo fatto in Python.
+"""
+from dataclasses import dataclass
+from datetime import date, time
+
+from sqlalchemy import insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+
+from ..models.booking import Booking, BookingStatus
+from ..models.slot import AvailabilitySlot, SlotStatus
+from ..models.user import User, Role
+from . import counters
+
+
+@dataclass(frozen=True)
+class Transition:
+    name: str
+    source: BookingStatus
+    target: BookingStatus
+    slot_status: SlotStatus | None  # None = lo slot non cambia
+    roles: tuple[Role, ...]
+    # per questi ruoli la prenotazione deve essere "loro" (campo booking -> id utente)
+    owner_field: dict[Role, str]
+    role_error: str
+    state_error: str = "Stato non valido"
+
+
+TRANSITIONS: dict[str, Transition] = {
+    t.name: t
+    for t in (
+        Transition(
+            "producer_accept",
+            BookingStatus.PENDING_PRODUCER, BookingStatus.PENDING_MANAGER, None,
+            (Role.PRODUCER, Role.MANAGER), {Role.PRODUCER: "producer_id"},
+            "Non autorizzato",
+        ),
+        Transition(
+            "producer_reject",
+            BookingStatus.PENDING_PRODUCER, BookingStatus.REJECTED_BY_PRODUCER, SlotStatus.LIBERO,
+            (Role.PRODUCER, Role.MANAGER), {Role.PRODUCER: "producer_id"},
+            "Non autorizzato",
+        ),
+        Transition(
+            "manager_accept",
+            BookingStatus.PENDING_MANAGER, BookingStatus.CONFIRMED, SlotStatus.OCCUPATO,
+            (Role.MANAGER,), {},
+            "Solo manager",
+        ),
+        Transition(
+            "manager_reject",
+            BookingStatus.PENDING_MANAGER, BookingStatus.REJECTED_BY_MANAGER, SlotStatus.LIBERO,
+            (Role.MANAGER,), {},
+            "Solo manager",
+        ),
+        Transition(
+            "producer_cancel",
+            BookingStatus.CONFIRMED, BookingStatus.CANCELED_BY_PRODUCER, SlotStatus.LIBERO,
+            (Role.PRODUCER,), {Role.PRODUCER: "producer_id"},
+            "Solo il produttore può annullare",
+            "Solo le prenotazioni confermate possono essere annullate dal produttore",
+        ),
+        Transition(
+            "artist_cancel",
+            BookingStatus.CONFIRMED, BookingStatus.CANCELED_BY_ARTIST, SlotStatus.LIBERO,
+            (Role.ARTIST,), {Role.ARTIST: "artist_id"},
+            "Solo l'artista può annullare",
+            "Solo le prenotazioni confermate possono essere annullate dall'artista",
+        ),
+    )
+}
+
+
+class TransitionRejected(Exception):
+    """Transizione non applicabile; status_code/detail pronti per HTTPException."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass(frozen=True)
+class Party:
+    id: int
+    email: str | None
+    display_name: str | None
+
+
+@dataclass(frozen=True)
+class SlotInfo:
+    id: int
+    date: date
+    start_time: time
+    end_time: time
+    status: SlotStatus
+
+
+@dataclass(frozen=True)
+class TransitionResult:
+    """Riga della prenotazione dopo la transizione, con slot e persone per le email."""
+    id: int
+    slot_id: int
+    artist_id: int
+    producer_id: int
+    status: BookingStatus
+    slot: SlotInfo | None
+    artist: Party
+    producer: Party
+
+
+ACTIVE_SLOT_INDEX = "ux_bookings_active_slot"
+
+
+class SlotUnavailable(Exception):
+    """Lo slot non esiste, è eliminato o non è più LIBERO."""
+
+
+def _is_active_slot_violation(err: IntegrityError) -> bool:
+    diag = getattr(err.orig, "diag", None)
+    name = getattr(diag, "constraint_name", None)
+    return name == ACTIVE_SLOT_INDEX if name else ACTIVE_SLOT_INDEX in str(err.orig)
+
+
+def claim_slot(db: Session, *, slot_id: int, artist_id: int, producer_id: int) -> Booking:
+    """
+    Porta lo slot LIBERO -> IN_SOSPESO e crea la prenotazione PENDING_PRODUCER.
+
+    Su PostgreSQL è un unico statement (CTE con UPDATE ... RETURNING seguito da
+    INSERT ... SELECT): se lo slot non è più LIBERO l'UPDATE non tocca righe,
+    l'INSERT non inserisce nulla e il perdente lo scopre nella stessa andata e
+    ritorno. Altrove (SQLite in dev) UPDATE condizionale + INSERT nella stessa
+    transazione: stessa garanzia, un round-trip in più.
+
+    Non fa commit. Alza SlotUnavailable se lo slot non è prenotabile.
+    """
+    claim = (
+        update(AvailabilitySlot)
+        .where(
+            AvailabilitySlot.id == slot_id,
+            AvailabilitySlot.status == SlotStatus.LIBERO,
+            AvailabilitySlot.is_deleted == False,
+        )
+        .values(status=SlotStatus.IN_SOSPESO)
+    )
+    cols = ["slot_id", "artist_id", "producer_id", "status", "notes"]
+
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            claimed = claim.returning(AvailabilitySlot.id).cte("claimed")
+            stmt = (
+                insert(Booking)
+                .from_select(
+                    cols,
+                    select(
+                        claimed.c.id,
+                        literal(artist_id),
+                        literal(producer_id),
+                        literal(BookingStatus.PENDING_PRODUCER, Booking.status.type),
+                        literal(""),
+                    ),
+                )
+                .add_cte(claimed)
+                .returning(Booking)
+            )
+            booking = db.scalars(stmt).one_or_none()
+        else:
+            if db.execute(claim).rowcount != 1:
+                raise SlotUnavailable()
+            booking = db.scalars(
+                insert(Booking)
+                .values(
+                    slot_id=slot_id,
+                    artist_id=artist_id,
+                    producer_id=producer_id,
+                    status=BookingStatus.PENDING_PRODUCER,
+                    notes="",
+                )
+                .returning(Booking)
+            ).one()
+    except IntegrityError as e:
+        db.rollback()
+        if _is_active_slot_violation(e):
+            raise SlotUnavailable() from e
+        raise
+
+    if booking is None:
+        db.rollback()
+        raise SlotUnavailable()
+    counters.move(db, producer_id, None, BookingStatus.PENDING_PRODUCER)
+    return booking
+
+
+def apply_transition(db: Session, name: str, booking_id: int, actor_id: int, actor_role: Role) -> TransitionResult:
+    """
+    Applica la transizione `name` con un UPDATE guardato (id + stato di
+    partenza + eventuale proprietario) che sposta insieme booking e slot e
+    ritorna la riga aggiornata con slot e nomi di artista/producer.
+
+    Su PostgreSQL è un unico statement (CTE con due UPDATE ... RETURNING e la
+    SELECT finale). Se la riga non è più nello stato atteso non cambia niente:
+    solo in quel caso una lettura in più per scegliere 404/403/400.
+    Non fa commit.
+    """
+    t = TRANSITIONS[name]
+    if actor_role not in t.roles:
+        raise TransitionRejected(403, t.role_error)
+
+    guards = [Booking.id == booking_id, Booking.status == t.source]
+    owner_field = t.owner_field.get(actor_role)
+    if owner_field:
+        guards.append(getattr(Booking, owner_field) == actor_id)
+
+    booking_upd = (
+        update(Booking)
+        .where(*guards)
+        .values(status=t.target)
+        .returning(
+            Booking.id, Booking.slot_id, Booking.artist_id, Booking.producer_id, Booking.status
+        )
+    )
+
+    if db.get_bind().dialect.name == "postgresql":
+        row = db.execute(_transition_select(booking_upd, t)).one_or_none()
+    else:
+        row = _transition_stepwise(db, booking_upd, t)
+
+    if row is None:
+        _diagnose(db, t, booking_id, owner_field, actor_id)
+    counters.move(db, row.producer_id, t.source, t.target)
+    return _result(row)
+
+
+_SLOT_COLS = ("id", "date", "start_time", "end_time", "status")
+
+
+def _transition_select(booking_upd, t: Transition):
+    Artist = aliased(User)
+    Producer = aliased(User)
+    b = booking_upd.cte("b")
+    if t.slot_status is not None:
+        s = (
+            update(AvailabilitySlot)
+            .where(AvailabilitySlot.id == b.c.slot_id)
+            .values(status=t.slot_status)
+            .returning(*(getattr(AvailabilitySlot, c) for c in _SLOT_COLS))
+            .cte("s")
+        )
+    else:
+        s = AvailabilitySlot.__table__
+    return (
+        select(
+            b,
+            *(s.c[c].label(f"slot_{c}") for c in _SLOT_COLS),
+            Artist.email.label("artist_email"),
+            Artist.display_name.label("artist_name"),
+            Producer.email.label("producer_email"),
+            Producer.display_name.label("producer_name"),
+        )
+        .select_from(b)
+        .outerjoin(s, s.c.id == b.c.slot_id)
+        .join(Artist, Artist.id == b.c.artist_id)
+        .join(Producer, Producer.id == b.c.producer_id)
+    )
+
+
+def _transition_stepwise(db: Session, booking_upd, t: Transition):
+    """Fallback senza CTE modificanti (SQLite): stessi statement, in sequenza."""
+    row = db.execute(booking_upd).one_or_none()
+    if row is None:
+        return None
+    if t.slot_status is not None:
+        db.execute(
+            update(AvailabilitySlot)
+            .where(AvailabilitySlot.id == row.slot_id)
+            .values(status=t.slot_status)
+        )
+    Artist = aliased(User)
+    Producer = aliased(User)
+    s = AvailabilitySlot.__table__
+    return db.execute(
+        select(
+            Booking.id, Booking.slot_id, Booking.artist_id, Booking.producer_id, Booking.status,
+            *(s.c[c].label(f"slot_{c}") for c in _SLOT_COLS),
+            Artist.email.label("artist_email"),
+            Artist.display_name.label("artist_name"),
+            Producer.email.label("producer_email"),
+            Producer.display_name.label("producer_name"),
+        )
+        .outerjoin(s, s.c.id == Booking.slot_id)
+        .join(Artist, Artist.id == Booking.artist_id)
+        .join(Producer, Producer.id == Booking.producer_id)
+        .where(Booking.id == row.id)
+    ).one()
+
+
+def _diagnose(db: Session, t: Transition, booking_id: int, owner_field: str | None, actor_id: int):
+    current = db.execute(
+        select(Booking.status, Booking.artist_id, Booking.producer_id).where(Booking.id == booking_id)
+    ).one_or_none()
+    if current is None:
+        raise TransitionRejected(404, "Prenotazione non trovata")
+    if owner_field and getattr(current, owner_field) != actor_id:
+        raise TransitionRejected(403, "Non autorizzato")
+    raise TransitionRejected(400, t.state_error)
+
+
+def _result(row) -> TransitionResult:
+    slot = None
+    if row.slot_id is not None and row.slot_date is not None:
+        slot = SlotInfo(
+            id=row.slot_id,
+            date=row.slot_date,
+            start_time=row.slot_start_time,
+            end_time=row.slot_end_time,
+            status=SlotStatus(row.slot_status),
+        )
+    return TransitionResult(
+        id=row.id,
+        slot_id=row.slot_id,
+        artist_id=row.artist_id,
+        producer_id=row.producer_id,
+        status=BookingStatus(row.status),
+        slot=slot,
+        artist=Party(row.artist_id, row.artist_email, row.artist_name),
+        producer=Party(row.producer_id, row.producer_email, row.producer_name),
+    )
@@ -0,0 +1,134 @@
+# backend/app/services/change_version.py
+"""
+Versioni di modifica + ETag per le GET delle liste.
+
+Ogni scrittura su slot/prenotazioni/regole chiama bump(db) come ultimo
+statement prima del commit: l'UPDATE della riga del contatore fa parte della
+stessa transazione, quindi chi legge la nuova versione vede anche i dati nuovi,
+e il lock sulla riga dura solo fino al commit.
+
+Le GET confrontano If-None-Match con etag(...): se combacia rispondono 304
+senza eseguire la query della lista.
+
+La stessa versione numera le righe modificate (change_seq, vedi stamp) per il
+delta sync di services.changes. Regole ed eccezioni hanno in più il contatore
+RULES: cambiano gli slot generati senza toccare righe. USERS cambia con gli
+utenti (registrazione, ruolo, attivazione, nome/email): lo incrementa da sé
+il commit della sessione che li modifica via ORM (vedi in fondo).
+"""
+from datetime import datetime
+
+from fastapi import Request, Response
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.booking import Booking
+from ..models.change_version import ChangeVersion
+from ..models.slot import AvailabilitySlot
+from ..models.user import User
+
+BOOKING = "booking"
+RULES = "rules"
+USERS = "users"
+
+# le liste "solo futuri" cambiano anche col tempo: l'ETag include il quarto
+# d'ora corrente, così uno slot finito esce al più tardi al bucket successivo
+# (esatto per slot allineati ai 15 minuti)
+_TIME_BUCKET_MIN = 15
+
+
+def bump(db: Session, name: str = BOOKING) -> int:
+    """Incrementa il contatore `name` e ritorna la nuova versione. Non fa commit."""
+    return db.scalar(
+        update(ChangeVersion)
+        .where(ChangeVersion.name == name)
+        .values(version=ChangeVersion.version + 1)
+        .returning(ChangeVersion.version)
+    ) or 0
+
+
+def stamp(db: Session, version: int) -> None:
+    """
+    Dà change_seq = version alle righe scritte in questa transazione (ogni
+    INSERT/UPDATE lo rimette a NULL, vedi i modelli). Va chiamata dopo bump:
+    col lock sulla riga del contatore le sequenze seguono l'ordine dei commit.
+    """
+    for model in (AvailabilitySlot, Booking):
+        db.execute(
+            update(model)
+            .where(model.change_seq.is_(None))
+            .values(change_seq=version)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def current(db: Session, name: str = BOOKING) -> int:
+    return db.scalar(select(ChangeVersion.version).where(ChangeVersion.name == name)) or 0
+
+
+def versions(db: Session) -> dict[str, int]:
+    """Tutti i contatori con una query sola: {BOOKING: ..., RULES: ..., USERS: ...}."""
+    out = {BOOKING: 0, RULES: 0, USERS: 0}
+    out.update(db.execute(select(ChangeVersion.name, ChangeVersion.version)).tuples().all())
+    return out
+
+
+def etag(db: Session, name: str = BOOKING, now: datetime | None = None, version: int | None = None) -> str:
+    """version: se già letta (es. da versions) non rifà la query."""
+    now = now or datetime.now()
+    bucket = now.strftime("%Y%m%d") + f"{(now.hour * 60 + now.minute) // _TIME_BUCKET_MIN:02d}"
+    if version is None:
+        version = current(db, name)
+    return f'"{name}-{version}-{bucket}"'
+
+
+def not_modified(request: Request, response: Response, tag: str) -> Response | None:
+    """
+    Imposta ETag/Cache-Control sulla risposta; se il client ha già questa
+    versione ritorna la 304 da restituire al posto della lista.
+    """
+    headers = {"ETag": tag, "Cache-Control": "private, no-cache"}
+    inm = request.headers.get("if-none-match")
+    if inm:
+        tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+        if tag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+# -----------------------------------------------------------------------------
+# USERS: incrementato al commit di una modifica ORM agli utenti
+# -----------------------------------------------------------------------------
+_USERS_CHANGED = "users_changed"
+_USER_FIELDS = ("role", "is_active", "display_name", "email")
+
+
+def _user_changed(session, obj) -> bool:
+    if not isinstance(obj, User):
+        return False
+    if obj in session.new or obj in session.deleted:
+        return True
+    attrs = inspect(obj).attrs
+    return any(attrs[f].history.has_changes() for f in _USER_FIELDS)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_user_changes(session, flush_context):
+    if any(_user_changed(session, o) for o in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info[_USERS_CHANGED] = True
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _bump_users(session):
+    # before_commit arriva prima del flush finale: flush qui per vedere tutto,
+    # poi bump come ultimo statement (il lock dura solo fino al commit)
+    session.flush()
+    if session.info.pop(_USERS_CHANGED, False):
+        bump(session, USERS)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_user_changes(session):
+    session.info.pop(_USERS_CHANGED, None)
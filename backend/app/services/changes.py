@@ -0,0 +1,149 @@
+# backend/app/services/changes.py
+"""
+Delta sync: solo slot e prenotazioni cambiati dopo un cursore.
+
+Ogni scrittura passa da _commit_changes, che incrementa la versione "booking"
+e la copia in change_seq delle righe toccate (change_version.stamp). Le righe
+eliminate restano come tombstone:
+  - slot eliminati dal manager: is_deleted = true (deleted nel risultato)
+  - righe spostate in archivio: change_seq = versione dell'archiviazione,
+    tornano come {"id", "deleted": true}
+
+Il cursore è "<versione booking>.<versione rules>": se regole/eccezioni sono
+cambiate gli slot generati non si possono ricostruire riga per riga e il
+client ricarica la disponibilità (rules_changed). Se le righe cambiate sono
+più di CHANGES_MAX_ROWS conviene ricaricare tutto (reset).
+"""
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session, aliased
+
+from ..config import settings
+from ..models.archive import SlotArchive, BookingArchive
+from ..models.booking import Booking
+from ..models.slot import AvailabilitySlot
+from ..models.user import User, Role
+from . import change_version
+
+
+def make_cursor(booking_v: int, rules_v: int) -> str:
+    return f"{booking_v}.{rules_v}"
+
+
+def parse_cursor(raw: str) -> tuple[int, int] | None:
+    try:
+        b, r = raw.split(".")
+        b, r = int(b), int(r)
+    except (AttributeError, ValueError):
+        return None
+    return (b, r) if b >= 0 and r >= 0 else None
+
+
+def _slot_row(s: AvailabilitySlot) -> dict:
+    return {
+        "id": s.id,
+        "date": s.date.isoformat(),
+        "start_time": s.start_time.isoformat(),
+        "end_time": s.end_time.isoformat(),
+        "status": s.status.value,
+        "deleted": bool(s.is_deleted),
+    }
+
+
+def _scope(q, model, user_id: int, role: Role):
+    # stesse regole delle liste: manager tutto, producer/artista le proprie
+    if role == Role.PRODUCER:
+        return q.where(model.producer_id == user_id)
+    if role != Role.MANAGER:
+        return q.where(model.artist_id == user_id)
+    return q
+
+
+def changes_since(db: Session, since: tuple[int, int], user_id: int, role: Role) -> dict:
+    """Righe cambiate dopo `since` (già validato) e il cursore nuovo."""
+    since_b, since_r = since
+    # prima le versioni, poi le righe: tutto quello che ha change_seq <= now_b è già committato
+    now_b = change_version.current(db)
+    now_r = change_version.current(db, change_version.RULES)
+    out = {
+        "cursor": make_cursor(now_b, now_r),
+        "reset": False,
+        "rules_changed": now_r != since_r,
+        "slots": [],
+        "bookings": [],
+    }
+    if since_b > now_b or since_r > now_r:
+        out["reset"] = True  # cursore di un altro DB / dopo un restore
+        return out
+    if since_b == now_b:
+        return out
+
+    window = (since_b, now_b)
+    limit = settings.CHANGES_MAX_ROWS
+
+    def _between(col):
+        return and_(col > window[0], col <= window[1])
+
+    slots = db.scalars(
+        select(AvailabilitySlot)
+        .where(_between(AvailabilitySlot.change_seq))
+        .order_by(AvailabilitySlot.change_seq, AvailabilitySlot.id)
+        .limit(limit + 1)
+    ).all()
+    archived_slots = db.scalars(
+        select(SlotArchive.id).where(_between(SlotArchive.change_seq)).limit(limit + 1)
+    ).all()
+
+    Artist = aliased(User)
+    Producer = aliased(User)
+    bookings = db.execute(
+        _scope(
+            select(
+                Booking.id,
+                Booking.slot_id,
+                Booking.artist_id,
+                Booking.producer_id,
+                Booking.status,
+                AvailabilitySlot.date,
+                AvailabilitySlot.start_time,
+                AvailabilitySlot.end_time,
+                Artist.display_name.label("artist_name"),
+                Producer.display_name.label("producer_name"),
+            )
+            .join(AvailabilitySlot, AvailabilitySlot.id == Booking.slot_id)
+            .join(Artist, Artist.id == Booking.artist_id)
+            .join(Producer, Producer.id == Booking.producer_id)
+            .where(_between(Booking.change_seq)),
+            Booking, user_id, role,
+        )
+        .order_by(Booking.change_seq, Booking.id)
+        .limit(limit + 1)
+    ).all()
+    archived_bookings = db.scalars(
+        _scope(
+            select(BookingArchive.id).where(_between(BookingArchive.change_seq)),
+            BookingArchive, user_id, role,
+        ).limit(limit + 1)
+    ).all()
+
+    if len(slots) + len(archived_slots) + len(bookings) + len(archived_bookings) > limit:
+        out["reset"] = True
+        return out
+
+    out["slots"] = [_slot_row(s) for s in slots] + [{"id": i, "deleted": True} for i in archived_slots]
+    out["bookings"] = [
+        {
+            "id": b.id,
+            "slot_id": b.slot_id,
+            "artist_id": b.artist_id,
+            "producer_id": b.producer_id,
+            "status": b.status.value,
+            "slot_date": b.date.isoformat(),
+            "start": b.start_time.isoformat(),
+            "end": b.end_time.isoformat(),
+            "artist_name": b.artist_name,
+            "producer_name": b.producer_name,
+            "deleted": False,
+        }
+        for b in bookings
+    ] + [{"id": i, "deleted": True} for i in archived_bookings]
+    return out
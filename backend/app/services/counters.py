@@ -0,0 +1,157 @@
+# backend/app/services/counters.py
+"""
+Contatori per i badge delle dashboard (GET /booking/counters) senza contare
+righe: la tabella booking_counters tiene per ogni stato "di lavoro" quante
+prenotazioni ci sono, e chi cambia stato a una prenotazione la aggiorna nella
+stessa transazione:
+  - claim_slot / apply_transition (services.booking_state)
+  - archive_batch: le prenotazioni archiviate escono dai contatori (DELETE ... RETURNING)
+
+Contano le prenotazioni ancora in bookings: una richiesta il cui slot è
+appena passato resta nel conto finché la manutenzione non la archivia (al
+più CLEANUP_INTERVAL_SEC), mentre le liste la nascondono subito.
+rebuild() ricalcola tutto da bookings: lo usano la migrazione e il giro di
+manutenzione, come rete di sicurezza per scritture fatte a mano sul DB.
+
+Le righe globali (owner 0) le aggiorna ogni transizione, quindi i loro lock
+contano: move/forget accumulano solo i delta in session.info, e apply() li
+scrive con un solo upsert subito dopo change_version.bump (_commit_changes,
+archive_batch). Ordine dei lock sempre uguale (prenotazione, versione,
+contatori) e lock sui contatori tenuti solo fino al commit, non durante le
+email accodate dall'handler.
+"""
+from sqlalchemy import delete, event, func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.booking import Booking, BookingStatus
+from ..models.booking_counter import BookingCounter
+
+_PENDING_KEY = "counter_deltas"
+
+PENDING_PRODUCER = "pending_producer"
+PENDING_MANAGER = "pending_manager"
+CONFIRMED = "confirmed"
+
+TOTAL = 0  # owner_id delle righe globali
+
+# stato -> contatore; PENDING_PRODUCER anche per producer
+_BY_STATUS = {
+    BookingStatus.PENDING_PRODUCER: PENDING_PRODUCER,
+    BookingStatus.PENDING_MANAGER: PENDING_MANAGER,
+    BookingStatus.CONFIRMED: CONFIRMED,
+}
+_PER_PRODUCER = {PENDING_PRODUCER}
+
+
+def _keys(status: BookingStatus | None, producer_id: int) -> list[tuple[str, int]]:
+    name = _BY_STATUS.get(status)
+    if name is None:
+        return []
+    keys = [(name, TOTAL)]
+    if name in _PER_PRODUCER:
+        keys.append((name, producer_id))
+    return keys
+
+
+def _stage(db: Session, deltas: dict[tuple[str, int], int]) -> None:
+    pending = db.info.setdefault(_PENDING_KEY, {})
+    for k, v in deltas.items():
+        pending[k] = pending.get(k, 0) + v
+
+
+def _add(db: Session, deltas: dict[tuple[str, int], int]) -> None:
+    rows = [{"name": n, "owner_id": o, "value": v} for (n, o), v in sorted(deltas.items()) if v]
+    if not rows:
+        return
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(BookingCounter).values(rows)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[BookingCounter.name, BookingCounter.owner_id],
+            set_={"value": BookingCounter.value + stmt.excluded.value},
+        )
+    )
+
+
+def move(
+    db: Session,
+    producer_id: int,
+    old: BookingStatus | None,
+    new: BookingStatus | None,
+    n: int = 1,
+) -> None:
+    """n prenotazioni di `producer_id` passano da old a new (None = non esiste). Li scrive apply()."""
+    deltas: dict[tuple[str, int], int] = {}
+    for k in _keys(old, producer_id):
+        deltas[k] = deltas.get(k, 0) - n
+    for k in _keys(new, producer_id):
+        deltas[k] = deltas.get(k, 0) + n
+    _add(db, deltas)
+
+
+def forget(db: Session, rows) -> None:
+    """Tolgono dai contatori le prenotazioni eliminate: righe (status, producer_id). Li scrive apply()."""
+    deltas: dict[tuple[str, int], int] = {}
+    for status, producer_id in rows:
+        for k in _keys(BookingStatus(status), producer_id):
+            deltas[k] = deltas.get(k, 0) - 1
+    _stage(db, deltas)
+
+
+def apply(db: Session) -> None:
+    """Scrive i delta accumulati nella transazione. Dopo change_version.bump, prima del commit."""
+    _add(db, db.info.pop(_PENDING_KEY, None) or {})
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def get(db: Session, keys: list[tuple[str, int]]) -> dict[tuple[str, int], int]:
+    """Valori dei contatori richiesti (0 se la riga non c'è ancora), una query."""
+    found = dict(
+        ((n, o), v)
+        for n, o, v in db.execute(
+            select(BookingCounter.name, BookingCounter.owner_id, BookingCounter.value).where(
+                tuple_(BookingCounter.name, BookingCounter.owner_id).in_(keys)
+            )
+        )
+    )
+    return {k: found.get(k, 0) for k in keys}
+
+
+def rebuild(db: Session) -> int:
+    """
+    Ricalcola tutti i contatori da bookings e ritorna quanti erano sbagliati.
+    Tiene la tabella bloccata fino al commit: le transizioni in corso finiscono
+    prima, quelle nuove aspettano. Non fa commit.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE booking_counters IN EXCLUSIVE MODE"))
+    expected: dict[tuple[str, int], int] = {}
+    for status, producer_id, n in db.execute(
+        select(Booking.status, Booking.producer_id, func.count())
+        .where(Booking.status.in_(list(_BY_STATUS)))
+        .group_by(Booking.status, Booking.producer_id)
+    ):
+        for k in _keys(BookingStatus(status), producer_id):
+            expected[k] = expected.get(k, 0) + n
+    current = {
+        (n, o): v
+        for n, o, v in db.execute(
+            select(BookingCounter.name, BookingCounter.owner_id, BookingCounter.value)
+        )
+    }
+    wrong = {k: expected.get(k, 0) for k in expected.keys() | current.keys() if expected.get(k, 0) != current.get(k, 0)}
+    if wrong:
+        # righe a 0 eliminate: restano solo i producer con qualcosa in coda
+        db.execute(
+            delete(BookingCounter).where(tuple_(BookingCounter.name, BookingCounter.owner_id).in_(list(wrong)))
+        )
+        db.add_all(BookingCounter(name=n, owner_id=o, value=v) for (n, o), v in wrong.items() if v)
+        db.flush()
+    return len(wrong)
@@ -0,0 +1,134 @@
+# backend/app/services/digest.py
+"""
+Riepilogo delle notifiche ai manager.
+
+Invece di una email per ogni richiesta accettata dal producer, add() accoda
+una riga in email_digest_items (nella transazione della modifica, come
+l'outbox). Per ogni destinatario la finestra parte dalla prima riga: dopo
+MANAGER_DIGEST_WINDOW_MIN minuti flush_due() toglie le sue righe e accoda
+nell'outbox un'unica email con gli eventi e le richieste ancora in attesa
+di approvazione (lette al momento dell'invio: quelle già gestite non compaiono).
+
+flush_due gira all'inizio di ogni giro del worker dell'outbox. Le righe si
+prendono con DELETE ... RETURNING: con più processi un riepilogo parte una
+volta sola. Gli eventi in MANAGER_DIGEST_URGENT (e tutti, con finestra 0)
+non passano di qui: email subito come prima.
+"""
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session, aliased
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.booking import Booking, BookingStatus
+from ..models.email_digest import EmailDigestItem
+from ..models.slot import AvailabilitySlot
+from ..models.user import User
+from . import outbox
+
+_PENDING_MAX = 50  # richieste in attesa elencate nel riepilogo
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def coalesced(event: str) -> bool:
+    """True se l'evento va nel riepilogo invece che in una email subito."""
+    if settings.MANAGER_DIGEST_WINDOW_MIN <= 0:
+        return False
+    urgent = {e.strip() for e in settings.MANAGER_DIGEST_URGENT.split(",")}
+    return event not in urgent
+
+
+def add(db: Session, addresses: list[str], event: str, line: str, booking_id: int | None = None) -> None:
+    """Accoda `line` al prossimo riepilogo di ogni indirizzo. Non fa commit."""
+    now = _now()
+    seen = set()
+    for a in addresses:
+        to = (a or "").strip().lower()
+        if to and to not in seen:
+            seen.add(to)
+            db.add(EmailDigestItem(to_addr=to, event=event, booking_id=booking_id, line=line, created_at=now))
+
+
+def _pending_rows(db: Session) -> list:
+    Artist = aliased(User)
+    Producer = aliased(User)
+    return db.execute(
+        select(
+            AvailabilitySlot.date,
+            AvailabilitySlot.start_time,
+            AvailabilitySlot.end_time,
+            func.coalesce(Artist.display_name, Artist.email).label("artist"),
+            func.coalesce(Producer.display_name, Producer.email).label("producer"),
+        )
+        .select_from(Booking)
+        .join(AvailabilitySlot, Booking.slot_id == AvailabilitySlot.id)
+        .join(Artist, Booking.artist_id == Artist.id)
+        .join(Producer, Booking.producer_id == Producer.id)
+        .where(Booking.status == BookingStatus.PENDING_MANAGER, AvailabilitySlot.date >= date.today())
+        .order_by(AvailabilitySlot.date, AvailabilitySlot.start_time)
+        .limit(_PENDING_MAX + 1)
+    ).all()
+
+
+def _html(lines: list[str], pending: list) -> str:
+    items = "".join(f"<li>{x}</li>" for x in lines)
+    if pending:
+        rows = "".join(
+            f"<li>{p.date.isoformat()} • {str(p.start_time)[:5]}–{str(p.end_time)[:5]} — "
+            f"<b>{p.artist}</b> con <b>{p.producer}</b></li>"
+            for p in pending[:_PENDING_MAX]
+        )
+        more = "<li>…</li>" if len(pending) > _PENDING_MAX else ""
+        waiting = f"<p><b>In attesa di approvazione adesso:</b></p><ul>{rows}{more}</ul>"
+    else:
+        waiting = "<p>Nessuna richiesta in attesa di approvazione adesso.</p>"
+    return f"""
+    <div style="font-family:Inter,Arial,sans-serif;color:#111;font-size:15px">
+      <p>Ciao,</p>
+      <p>ecco cosa è successo negli ultimi minuti:</p>
+      <ul>{items}</ul>
+      {waiting}
+      <p>Conferma o rifiuta dalla dashboard Manager.</p>
+      <hr><small>W8 x CAG</small>
+    </div>
+    """
+
+
+@outbox.before_round
+def flush_due() -> int:
+    """Accoda nell'outbox i riepiloghi con la finestra scaduta. Ritorna quanti."""
+    cutoff = _now() - timedelta(minutes=max(0, settings.MANAGER_DIGEST_WINDOW_MIN))
+    with SessionLocal() as db:
+        # giro tipico: una query sull'indice di created_at e basta
+        if db.scalar(select(EmailDigestItem.id).where(EmailDigestItem.created_at <= cutoff).limit(1)) is None:
+            return 0
+        due = db.scalars(
+            select(EmailDigestItem.to_addr)
+            .group_by(EmailDigestItem.to_addr)
+            .having(func.min(EmailDigestItem.created_at) <= cutoff)
+        ).all()
+        pending = _pending_rows(db)
+        sent = 0
+        for to in due:
+            items = db.execute(
+                delete(EmailDigestItem)
+                .where(EmailDigestItem.to_addr == to)
+                .returning(EmailDigestItem.id, EmailDigestItem.line)
+            ).all()
+            if not items:
+                continue  # preso da un altro processo
+            items.sort(key=lambda r: r.id)
+            subject = "Riepilogo prenotazioni" if len(items) == 1 else f"Riepilogo prenotazioni: {len(items)} aggiornamenti"
+            outbox.enqueue(
+                db, [to], subject, _html([r.line for r in items], pending),
+                key=f"digest:{items[-1].id}",
+            )
+            sent += 1
+        db.commit()
+    if sent:
+        print(f"Digest: {sent} riepiloghi accodati")
+    return sent
@@ -1,8 +1,14 @@
 # backend/app/services/email_gmail.py
 import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from email.mime.text import MIMEText
 
+import google_auth_httplib2
+import httplib2
 from googleapiclient.discovery import build
+from googleapiclient.http import BatchHttpRequest
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 
@@ -11,27 +17,159 @@ from ..config import settings
 
 GMAIL_SCOPES = ["https://www.googleapis.com/auth/gmail.send"]
 TOKEN_URI = "https://oauth2.googleapis.com/token"
+API_ENDPOINT: str | None = None  # None = Gmail vero; il bench lo punta a un server finto
+BATCH_URI = "https://gmail.googleapis.com/batch/gmail/v1"
+HTTP_TIMEOUT_SEC = 30
+
+# Un client per processo: credenziali e servizio costruiti una volta sola.
+# Le credenziali sono condivise (refresh sotto lock, solo vicino alla scadenza);
+# le connessioni HTTP no, httplib2 non è thread-safe -> una per thread,
+# riusata tra un invio e l'altro (keep-alive).
+_lock = threading.Lock()
+_creds: Credentials | None = None
+_service = None
+_local = threading.local()
+_pool: ThreadPoolExecutor | None = None
+
+
+@dataclass(frozen=True)
+class Email:
+    to: str
+    subject: str
+    html: str
+
+
+def configured() -> bool:
+    return bool(
+        settings.GOOGLE_CLIENT_ID
+        and settings.GOOGLE_CLIENT_SECRET
+        and settings.GOOGLE_REFRESH_TOKEN
+        and settings.EMAIL_FROM
+    )
+
+
+def _credentials() -> Credentials:
+    """
+    Credenziali OAuth2 'installed app' con refresh token, condivise dal processo.
+    Il refresh (chiamata HTTPS al token endpoint) parte solo se manca l'access
+    token o sta per scadere (google-auth lo considera scaduto qualche minuto prima).
+    """
+    global _creds
+    with _lock:
+        if _creds is None:
+            _creds = Credentials(
+                token=None,
+                refresh_token=settings.GOOGLE_REFRESH_TOKEN,
+                token_uri=TOKEN_URI,
+                client_id=settings.GOOGLE_CLIENT_ID,
+                client_secret=settings.GOOGLE_CLIENT_SECRET,
+                scopes=GMAIL_SCOPES,
+            )
+        if not _creds.valid:
+            _creds.refresh(Request())
+        return _creds
 
 
 def _gmail_service():
     """
-    Crea il client Gmail usando OAuth2 'installed app' con refresh token.
-    Richiede: GOOGLE_CLIENT_ID, GOOGLE_CLIENT_SECRET, GOOGLE_REFRESH_TOKEN.
+    Client Gmail del processo (discovery statico, nessuna chiamata di rete).
+    Ritorna (servizio, http del thread corrente già autorizzato).
     """
-    # Costruisci credenziali con solo refresh_token: verrà fatto il refresh immediato.
-    creds = Credentials(
-        token=None,
-        refresh_token=settings.GOOGLE_REFRESH_TOKEN,
-        token_uri=TOKEN_URI,
-        client_id=settings.GOOGLE_CLIENT_ID,
-        client_secret=settings.GOOGLE_CLIENT_SECRET,
-        scopes=GMAIL_SCOPES,
-    )
-    # forza il refresh per ottenere un access token valido
-    creds.refresh(Request())
+    global _service
+    creds = _credentials()
+    with _lock:
+        if _service is None:
+            # cache_discovery=False evita warning in ambienti server
+            _service = build(
+                "gmail", "v1", credentials=creds, cache_discovery=False,
+                client_options={"api_endpoint": API_ENDPOINT} if API_ENDPOINT else None,
+            )
+        svc = _service
+    http = getattr(_local, "http", None)
+    if http is None or http.credentials is not creds:
+        http = _local.http = google_auth_httplib2.AuthorizedHttp(
+            creds, http=httplib2.Http(timeout=HTTP_TIMEOUT_SEC)
+        )
+    return svc, http
+
+
+def reset() -> None:
+    """Dimentica client e token (es. dopo aver cambiato le credenziali)."""
+    global _creds, _service
+    with _lock:
+        _creds = None
+        _service = None
+    _local.__dict__.clear()
+
+
+def _raw(e: Email) -> str:
+    # MIME codificato base64 URL-safe come richiesto da Gmail
+    msg = MIMEText(e.html, "html", "utf-8")
+    msg["to"] = e.to
+    msg["from"] = settings.EMAIL_FROM
+    msg["subject"] = e.subject
+    return base64.urlsafe_b64encode(msg.as_bytes()).decode("utf-8")
+
 
-    # cache_discovery=False evita warning in ambienti server
-    return build("gmail", "v1", credentials=creds, cache_discovery=False)
+def _error(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"[:1000]
+
+
+def _send_batch(emails: list[Email]) -> list[str | None]:
+    """Un solo POST a BATCH_URI per tutte le email (max GMAIL_BATCH_MAX)."""
+    svc, http = _gmail_service()
+    results: list[str | None] = [None] * len(emails)
+
+    def done(request_id, _response, exc):
+        if exc is not None:
+            results[int(request_id)] = _error(exc)
+
+    batch = BatchHttpRequest(callback=done, batch_uri=BATCH_URI)
+    for i, e in enumerate(emails):
+        batch.add(svc.users().messages().send(userId="me", body={"raw": _raw(e)}), request_id=str(i))
+    batch.execute(http=http)
+    return results
+
+
+def _send_one(e: Email) -> str | None:
+    try:
+        send_email_html(e.to, e.subject, e.html)
+        return None
+    except Exception as ex:
+        return _error(ex)
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max(1, settings.EMAIL_SEND_THREADS), thread_name_prefix="gmail-send")
+        return _pool
+
+
+def send_many(emails: list[Email]) -> list[str | None]:
+    """
+    Invia più email e ritorna un esito per ognuna, nello stesso ordine:
+    None se inviata, altrimenti il messaggio d'errore (non solleva).
+      - GMAIL_BATCH=True: batch HTTP di Gmail, un round-trip ogni GMAIL_BATCH_MAX email
+      - altrimenti: invii singoli in parallelo su EMAIL_SEND_THREADS thread
+    In dev senza Gmail configurata stampa e considera tutto inviato.
+    """
+    if not configured() or len(emails) == 1:
+        return [_send_one(e) for e in emails]
+    if not settings.GMAIL_BATCH:
+        return list(_executor().map(_send_one, emails))
+
+    results: list[str | None] = []
+    step = max(1, min(settings.GMAIL_BATCH_MAX, 100))  # 100 = limite di Gmail per batch
+    for i in range(0, len(emails), step):
+        chunk = emails[i:i + step]
+        try:
+            results.extend(_send_batch(chunk))
+        except Exception as ex:
+            # errore di tutto il batch (rete, token, risposta non valida)
+            results.extend([_error(ex)] * len(chunk))
+    return results
 
 
 def send_email_html(to: str, subject: str, html: str) -> None:
@@ -44,24 +182,10 @@ def send_email_html(to: str, subject: str, html: str) -> None:
       - GOOGLE_REFRESH_TOKEN
       - EMAIL_FROM
     """
-    if not (
-        settings.GOOGLE_CLIENT_ID
-        and settings.GOOGLE_CLIENT_SECRET
-        and settings.GOOGLE_REFRESH_TOKEN
-        and settings.EMAIL_FROM
-    ):
-        # Fallback non-bloccante in dev
-        print(f"[DEV] Gmail non configurato. Simulo invio a {to} — {subject}\n{html}")
+    if not configured():
+        # Fallback non-bloccante in dev (il corpo lo salva la capture di services.email_transport)
+        print(f"[DEV] Gmail non configurato. Simulo invio a {to} — {subject}")
         return
 
-    # Costruisci MIME
-    msg = MIMEText(html, "html", "utf-8")
-    msg["to"] = to
-    msg["from"] = settings.EMAIL_FROM
-    msg["subject"] = subject
-
-    # codifica base64 URL-safe come richiesto da Gmail
-    raw = base64.urlsafe_b64encode(msg.as_bytes()).decode("utf-8")
-
-    svc = _gmail_service()
-    svc.users().messages().send(userId="me", body={"raw": raw}).execute()
\ No newline at end of file
+    svc, http = _gmail_service()
+    svc.users().messages().send(userId="me", body={"raw": _raw(Email(to, subject, html))}).execute(http=http)
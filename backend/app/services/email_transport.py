@@ -0,0 +1,301 @@
+# backend/app/services/email_transport.py
+"""
+Trasporto delle email: da qui passa l'outbox (services.outbox) per inviare.
+
+EMAIL_TRANSPORT sceglie l'implementazione (una per processo, get()):
+  - "gmail":   Gmail API (services.email_gmail, batch HTTP)
+  - "smtp":    server SMTP, connessioni tenute aperte e riusate tra le email
+               (SMTP_POOL_SIZE) e, se il server lo annuncia, PIPELINING:
+               MAIL/RCPT/DATA in un solo round-trip (SMTP_PIPELINING)
+  - "capture": non invia niente; tiene le ultime EMAIL_CAPTURE_MAX email in
+               memoria e, con EMAIL_CAPTURE_PATH, le aggiunge a un file JSONL.
+               Per dev, test e prove di carico: su stdout una riga per email.
+  - "auto":    gmail se configurato, altrimenti smtp se c'è SMTP_HOST,
+               altrimenti capture
+
+Ogni trasporto ha send_many(emails) -> un esito per email, nello stesso
+ordine: None se inviata, altrimenti il messaggio d'errore (non solleva).
+"""
+import json
+import queue
+import re
+import smtplib
+import ssl
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.mime.text import MIMEText
+from email.policy import SMTP as SMTP_POLICY
+from email.utils import formatdate, make_msgid
+
+from ..config import settings
+from . import email_gmail
+from .email_gmail import Email
+
+
+def _error(e: Exception) -> str:
+    return f"{type(e).__name__}: {e}"[:1000]
+
+
+class Transport(ABC):
+    name = "?"
+
+    @abstractmethod
+    def send_many(self, emails: list[Email]) -> list[str | None]:
+        """Un esito per email, nello stesso ordine: None se inviata, altrimenti l'errore."""
+
+    def close(self) -> None:
+        pass
+
+
+class GmailTransport(Transport):
+    name = "gmail"
+
+    def send_many(self, emails: list[Email]) -> list[str | None]:
+        return email_gmail.send_many(emails)
+
+    def close(self) -> None:
+        email_gmail.reset()
+
+
+class CaptureTransport(Transport):
+    """Email "inviate" in memoria (e su file JSONL se c'è path)."""
+
+    name = "capture"
+
+    def __init__(self, path: str | None = None, max_messages: int = 1000, quiet: bool = False):
+        self.path = path
+        self.quiet = quiet
+        self.messages: deque[dict] = deque(maxlen=max_messages)
+        self._lock = threading.Lock()
+
+    def send_many(self, emails: list[Email]) -> list[str | None]:
+        at = datetime.now(timezone.utc).isoformat()
+        rows = [{"at": at, "to": e.to, "subject": e.subject, "html": e.html} for e in emails]
+        try:
+            with self._lock:
+                self.messages.extend(rows)
+                if self.path:
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+        except OSError as e:
+            return [_error(e)] * len(emails)
+        if not self.quiet:
+            for e in emails:
+                print(f"[EMAIL] catturata -> {e.to} | {e.subject}")
+        return [None] * len(emails)
+
+
+class SmtpTransport(Transport):
+    """
+    SMTP con pool di connessioni: una connessione resta aperta tra un giro e
+    l'altro (niente TCP/TLS/AUTH per ogni email). Con più email, fino a
+    pool_size connessioni in parallelo. Una connessione che dà errore di
+    protocollo si chiude e al giro dopo se ne apre una nuova.
+    """
+
+    name = "smtp"
+
+    def __init__(
+        self,
+        host: str,
+        port: int = 587,
+        user: str | None = None,
+        password: str | None = None,
+        starttls: bool = True,
+        use_ssl: bool = False,
+        sender: str | None = None,
+        pool_size: int = 2,
+        pipelining: bool = True,
+        timeout: float = 30,
+    ):
+        self.host, self.port = host, port
+        self.user, self.password = user, password
+        self.starttls, self.use_ssl = starttls, use_ssl
+        self.sender = sender or user or f"noreply@{host}"
+        self.pool_size = max(1, pool_size)
+        self.pipelining = pipelining
+        self.timeout = timeout
+        self._idle: queue.LifoQueue[smtplib.SMTP] = queue.LifoQueue()
+        self._exec = ThreadPoolExecutor(self.pool_size, thread_name_prefix="smtp-send")
+        self.connects = 0  # connessioni aperte in tutto (per il bench)
+
+    # --- connessioni ---
+    def _connect(self) -> smtplib.SMTP:
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=ssl.create_default_context())
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                conn.starttls(context=ssl.create_default_context())
+        conn.ehlo_or_helo_if_needed()
+        if self.user:
+            conn.login(self.user, self.password or "")
+        self.connects += 1
+        return conn
+
+    def _acquire(self) -> tuple[smtplib.SMTP, bool]:
+        """(connessione, riusata): una connessione riusata può essere scaduta lato server."""
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._connect(), False
+
+    def _release(self, conn: smtplib.SMTP) -> None:
+        if self._idle.qsize() < self.pool_size:
+            self._idle.put(conn)
+        else:
+            self._quit(conn)
+
+    @staticmethod
+    def _quit(conn: smtplib.SMTP) -> None:
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    # --- invio ---
+    def _data(self, e: Email) -> bytes:
+        msg = MIMEText(e.html, "html", "utf-8")
+        msg["To"] = e.to
+        msg["From"] = settings.EMAIL_FROM or self.sender
+        msg["Subject"] = e.subject
+        msg["Date"] = formatdate(localtime=True)
+        msg["Message-ID"] = make_msgid()
+        return msg.as_bytes(policy=SMTP_POLICY)  # righe CRLF
+
+    def _send_pipelined(self, conn: smtplib.SMTP, to: str, data: bytes) -> None:
+        # RFC 2920: MAIL, RCPT e DATA in un solo invio, poi le tre risposte
+        conn.send(f"MAIL FROM:<{self.sender}>\r\nRCPT TO:<{to}>\r\nDATA\r\n")
+        (mc, mm), (rc, rm), (dc, dm) = conn.getreply(), conn.getreply(), conn.getreply()
+        if dc == 354 and (mc != 250 or rc not in (250, 251)):
+            conn.send(b".\r\n")  # il server aspetta comunque il corpo: messaggio vuoto, poi RSET
+            conn.getreply()
+        if mc != 250:
+            conn.rset()
+            raise smtplib.SMTPSenderRefused(mc, mm, self.sender)
+        if rc not in (250, 251):
+            conn.rset()
+            raise smtplib.SMTPRecipientsRefused({to: (rc, rm)})
+        if dc != 354:
+            conn.rset()
+            raise smtplib.SMTPDataError(dc, dm)
+        body = re.sub(rb"(?m)^\.", b"..", data)
+        if not body.endswith(b"\r\n"):
+            body += b"\r\n"
+        conn.send(body + b".\r\n")
+        code, msg = conn.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, msg)
+
+    def _send_one(self, conn: smtplib.SMTP, e: Email) -> None:
+        data = self._data(e)
+        if self.pipelining and conn.has_extn("pipelining"):
+            self._send_pipelined(conn, e.to, data)
+        else:
+            conn.sendmail(self.sender, [e.to], data)
+
+    def _send_chunk(self, emails: list[Email]) -> list[str | None]:
+        out: list[str | None] = []
+        conn, reused = None, False
+        for e in emails:
+            try:
+                if conn is None:
+                    conn, reused = self._acquire()
+                try:
+                    self._send_one(conn, e)
+                except OSError as ex:
+                    # (le eccezioni di smtplib sono OSError: i rifiuti del server non si riprovano)
+                    if not reused or isinstance(ex, (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused)):
+                        raise
+                    # connessione del pool chiusa dal server nel frattempo: una nuova e si riprova
+                    conn.close()
+                    conn, reused = self._connect(), False
+                    self._send_one(conn, e)
+                reused = True
+                out.append(None)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as ex:
+                out.append(_error(ex))  # rifiuto di questa email: la connessione va ancora bene
+            except Exception as ex:
+                out.append(_error(ex))  # connessione caduta/protocollo: la prossima email ne apre un'altra
+                if conn is not None:
+                    conn.close()
+                conn = None
+        if conn is not None:
+            self._release(conn)
+        return out
+
+    def send_many(self, emails: list[Email]) -> list[str | None]:
+        if len(emails) <= 1:
+            return self._send_chunk(emails)
+        n = min(self.pool_size, len(emails))
+        chunks = [emails[i::n] for i in range(n)]
+        results = list(self._exec.map(self._send_chunk, chunks))
+        out: list[str | None] = [None] * len(emails)
+        for i, res in enumerate(results):
+            out[i::n] = res
+        return out
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        self._exec.shutdown(wait=False)
+
+
+def make(name: str | None = None) -> Transport:
+    """Crea il trasporto indicato (default: settings.EMAIL_TRANSPORT)."""
+    name = (name or settings.EMAIL_TRANSPORT or "auto").strip().lower()
+    if name == "auto":
+        name = "gmail" if email_gmail.configured() else ("smtp" if settings.SMTP_HOST else "capture")
+    if name == "gmail":
+        return GmailTransport()
+    if name == "smtp":
+        if not settings.SMTP_HOST:
+            raise ValueError("EMAIL_TRANSPORT=smtp ma SMTP_HOST non è impostato")
+        return SmtpTransport(
+            settings.SMTP_HOST,
+            settings.SMTP_PORT,
+            user=settings.SMTP_USER,
+            password=settings.SMTP_PASSWORD,
+            starttls=settings.SMTP_STARTTLS,
+            use_ssl=settings.SMTP_SSL,
+            sender=settings.EMAIL_FROM,
+            pool_size=settings.SMTP_POOL_SIZE,
+            pipelining=settings.SMTP_PIPELINING,
+            timeout=settings.SMTP_TIMEOUT_SEC,
+        )
+    if name == "capture":
+        return CaptureTransport(settings.EMAIL_CAPTURE_PATH, settings.EMAIL_CAPTURE_MAX)
+    raise ValueError(f"EMAIL_TRANSPORT sconosciuto: {name}")
+
+
+_lock = threading.Lock()
+_transport: Transport | None = None
+
+
+def get() -> Transport:
+    """Trasporto del processo (creato al primo uso)."""
+    global _transport
+    with _lock:
+        if _transport is None:
+            _transport = make()
+            print(f"Email transport: {_transport.name}")
+        return _transport
+
+
+def use(transport: Transport | None) -> None:
+    """Sostituisce il trasporto del processo (test, bench); None = di nuovo da settings."""
+    global _transport
+    with _lock:
+        old, _transport = _transport, transport
+    if old is not None and old is not transport:
+        old.close()
+
+
+def close() -> None:
+    use(None)
@@ -0,0 +1,257 @@
+# backend/app/services/events.py
+"""
+Eventi live di slot e prenotazioni per le dashboard (Server-Sent Events).
+
+Gli handler di routers/booking.py chiamano emit(db, ...) prima del commit;
+_commit_changes assegna agli eventi l'id = versione "booking" appena
+incrementata (services.change_version) + progressivo nella transazione, quindi
+gli id crescono nell'ordine dei commit anche con più processi.
+Gli eventi partono solo se la transazione va a buon fine:
+  - PostgreSQL: pg_notify nella transazione stessa -> consegnato al commit a
+    tutti i processi, ognuno con il suo thread in LISTEN (start/stop da main.py)
+  - altrimenti (SQLite in dev, o listener giù) consegna locale dopo il commit
+
+Ogni connessione SSE ha una coda limitata (EVENTS_QUEUE_MAX): se il client
+non tiene il passo la connessione si chiude e il browser riconnette con
+Last-Event-ID, recuperando dalla storia recente (EVENTS_HISTORY). Se l'id è
+troppo vecchio arriva un evento "reset": il client ricarica le liste.
+"""
+import asyncio
+import json
+import select
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+from ..config import settings
+from ..database import SessionLocal, engine
+from ..models.booking import BookingStatus
+from ..models.user import Role
+from . import change_version
+
+CHANNEL = "booking_events"
+
+# stati che compaiono nelle liste del manager (da approvare + agenda)
+_MANAGER_STATUSES = {BookingStatus.PENDING_MANAGER.value, BookingStatus.CONFIRMED.value}
+
+_PENDING_KEY = "events_pending"
+_STAGED_KEY = "events_staged"
+
+
+@dataclass(frozen=True)
+class Event:
+    version: int
+    n: int
+    type: str  # "booking" | "slots"
+    data: dict
+
+    @property
+    def id(self) -> str:
+        return f"{self.version}-{self.n}"
+
+    @property
+    def key(self) -> tuple[int, int]:
+        return self.version, self.n
+
+    def to_json(self) -> str:
+        return json.dumps({"v": self.version, "n": self.n, "type": self.type, "data": self.data})
+
+    @classmethod
+    def from_json(cls, raw: str) -> "Event":
+        d = json.loads(raw)
+        return cls(d["v"], d["n"], d["type"], d["data"])
+
+
+def parse_id(raw: str | None) -> tuple[int, int] | None:
+    try:
+        v, n = (raw or "").split("-")
+        return int(v), int(n)
+    except ValueError:
+        return None
+
+
+def id_after(version: int) -> str:
+    """Last-Event-ID per chi ha già letto i dati alla `version`: riceve solo gli eventi successivi."""
+    return f"{version}-{_AFTER_ALL}"
+
+
+def visible_to(ev: Event, user_id: int, role: Role) -> bool:
+    """producer -> le sue richieste, artista -> le sue, manager -> da approvare/agenda; slot a tutti."""
+    if ev.type != "booking":
+        return True
+    d = ev.data
+    if role == Role.MANAGER:
+        return d.get("status") in _MANAGER_STATUSES or d.get("prev") in _MANAGER_STATUSES
+    if role == Role.PRODUCER:
+        return d.get("producer_id") == user_id
+    return d.get("artist_id") == user_id
+
+
+# -----------------------------------------------------------------------------
+# Lato scrittura (thread delle request)
+# -----------------------------------------------------------------------------
+def emit(db: Session, type_: str, **data) -> None:
+    """Accoda un evento alla transazione di `db`; parte solo col commit."""
+    db.info.setdefault(_PENDING_KEY, []).append((type_, data))
+
+
+def stage(db: Session, version: int) -> None:
+    """Numera gli eventi accodati con la versione appena scritta. Non fa commit."""
+    pending = db.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    evs = [Event(version, i, t, d) for i, (t, d) in enumerate(pending)]
+    if db.get_bind().dialect.name == "postgresql":
+        for ev in evs:
+            db.execute(text("SELECT pg_notify(:ch, :payload)"), {"ch": CHANNEL, "payload": ev.to_json()})
+        if _listening.is_set():
+            return  # li riceve anche questo processo dal suo LISTEN
+    db.info.setdefault(_STAGED_KEY, []).extend(evs)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_after_commit(session):
+    for ev in session.info.pop(_STAGED_KEY, ()):
+        publish(ev)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_STAGED_KEY, None)
+
+
+# -----------------------------------------------------------------------------
+# Broker in processo
+# -----------------------------------------------------------------------------
+class Subscriber:
+    """Una connessione SSE: coda limitata nel suo event loop."""
+
+    def __init__(self, user_id: int, role: Role):
+        self.user_id = user_id
+        self.role = role
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(settings.EVENTS_QUEUE_MAX)
+        self.overflow = False
+
+    def offer(self, ev: Event) -> None:
+        # gira nel loop della connessione
+        if self.overflow:
+            return
+        try:
+            self.queue.put_nowait(ev)
+        except asyncio.QueueFull:
+            self.overflow = True
+
+
+_lock = threading.Lock()
+_history: deque[Event] = deque()
+_subscribers: set[Subscriber] = set()
+_last_key: tuple[int, int] = (0, 0)
+# abbiamo in _history tutti gli eventi con key > _known_since (None = non inizializzato)
+_known_since: tuple[int, int] | None = None
+_AFTER_ALL = 1 << 30  # n "infinito": (v, _AFTER_ALL) sta dopo tutti gli eventi della versione v
+
+
+def publish(ev: Event) -> None:
+    """Consegna ev alle connessioni interessate (thread-safe, idempotente per id)."""
+    global _last_key, _known_since
+    with _lock:
+        if ev.key <= _last_key:
+            return  # già visto (NOTIFY + consegna locale mentre il listener ripartiva)
+        _last_key = ev.key
+        _history.append(ev)
+        if len(_history) > settings.EVENTS_HISTORY:
+            _known_since = _history.popleft().key
+        targets = [s for s in _subscribers if visible_to(ev, s.user_id, s.role)]
+    for s in targets:
+        try:
+            s.loop.call_soon_threadsafe(s.offer, ev)
+        except RuntimeError:
+            pass  # loop chiuso: la connessione sta andando via
+
+
+def subscribe(user_id: int, role: Role, last: tuple[int, int] | None) -> tuple[Subscriber, list[Event] | None]:
+    """
+    Registra una connessione e ritorna gli eventi (visibili a lei) dopo `last`;
+    None se la storia in memoria non arriva così indietro (-> reset).
+    """
+    sub = Subscriber(user_id, role)
+    with _lock:
+        _subscribers.add(sub)
+        if last is None:
+            return sub, []
+        if _known_since is None or last < _known_since:
+            return sub, None
+        return sub, [e for e in _history if e.key > last and visible_to(e, user_id, role)]
+
+
+def unsubscribe(sub: Subscriber) -> None:
+    with _lock:
+        _subscribers.discard(sub)
+
+
+def stats() -> dict:
+    with _lock:
+        return {"subscribers": len(_subscribers), "history": len(_history), "last_id": "%d-%d" % _last_key}
+
+
+# -----------------------------------------------------------------------------
+# LISTEN su PostgreSQL (un thread per processo, connessione dedicata fuori pool)
+# -----------------------------------------------------------------------------
+_listening = threading.Event()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+
+def _listen_loop() -> None:
+    # fuori dal pool dell'app (pool_size=1 in prod): la connessione resta aperta
+    listen_engine = create_engine(settings.DB_URL, poolclass=NullPool)
+    while not _stop.is_set():
+        raw = None
+        try:
+            raw = listen_engine.raw_connection()
+            conn = raw.driver_connection
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {CHANNEL}")
+            _listening.set()
+            while not _stop.is_set():
+                if select.select([conn], [], [], 1.0)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        publish(Event.from_json(conn.notifies.pop(0).payload))
+        except Exception as e:
+            print("Events listener error:", e)
+        finally:
+            _listening.clear()
+            if raw is not None:
+                try:
+                    raw.close()
+                except Exception:
+                    pass
+        _stop.wait(5)
+
+
+def start() -> None:
+    """Da chiamare all'avvio: fissa da dove la storia è completa e, su PostgreSQL, avvia il LISTEN."""
+    global _thread, _known_since
+    with SessionLocal() as db:
+        version = change_version.current(db)
+    with _lock:
+        if _known_since is None:
+            _known_since = (version, _AFTER_ALL)
+    if engine.dialect.name != "postgresql" or (_thread and _thread.is_alive()):
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_listen_loop, name="events-listener", daemon=True)
+    _thread.start()
+
+
+def stop(timeout: float = 5.0) -> None:
+    _stop.set()
+    if _thread:
+        _thread.join(timeout)
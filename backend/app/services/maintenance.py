@@ -0,0 +1,159 @@
+# backend/app/services/maintenance.py
+"""
+Manutenzione periodica fuori dal percorso delle request.
+
+Un thread daemon per processo (start/stop da main.py) chiama run_once ogni
+CLEANUP_INTERVAL_SEC: sposta in archivio slot passati/eliminati con le loro
+prenotazioni (services.archive), elimina i token di reset scaduti e le
+email già consegnate/fallite da più di OUTBOX_RETENTION_DAYS (services.outbox),
+ricontrolla i contatori dei badge (services.counters).
+Ogni task lavora a batch di CLEANUP_BATCH_SIZE righe, un batch = una
+transazione breve, così la connessione (pool_size=1 in prod) torna libera
+tra un batch e l'altro.
+
+Coordinamento tra processi: ogni batch prende pg_try_advisory_xact_lock; se
+un altro worker ha il lock in quel momento, questo salta il giro invece di
+fare lo stesso lavoro in parallelo. Su SQLite (dev, un solo processo) basta
+un lock locale.
+
+Uso manuale / cron:
+    python -m backend.app.services.maintenance
+"""
+import random
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from . import archive, counters, outbox
+from . import password_reset as pr_service
+
+# diversa da quella delle migrazioni
+_LOCK_KEY = 0x57_38_43_42  # "W8CB"
+
+_local_lock = threading.Lock()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+# ultimo report, per /ops/cleanup
+last_report: dict | None = None
+
+
+def _try_lock(db: Session) -> bool:
+    """Lock di transazione: si rilascia da solo al commit/rollback del batch."""
+    if db.get_bind().dialect.name != "postgresql":
+        return True
+    return bool(db.scalar(text("SELECT pg_try_advisory_xact_lock(:k)"), {"k": _LOCK_KEY}))
+
+
+def _archive_task(db: Session, batch_size: int) -> dict[str, int]:
+    slots, bookings = archive.archive_batch(db, batch_size)
+    return {"slots": slots, "bookings": bookings}
+
+
+def _reset_tokens_task(db: Session, batch_size: int) -> dict[str, int]:
+    return {"tokens": pr_service.purge_expired(db, batch_size)}
+
+
+def _outbox_task(db: Session, batch_size: int) -> dict[str, int]:
+    return {"emails": outbox.purge(db, batch_size)}
+
+
+def _counters_task(db: Session, batch_size: int) -> dict[str, int]:
+    # un giro solo: ricalcola tutto, il secondo batch trova 0 da correggere
+    fixed = counters.rebuild(db)
+    if fixed:
+        print(f"Cleanup: {fixed} contatori badge corretti")
+    return {"counters_fixed": fixed}
+
+
+# task: nome -> funzione(db, batch_size) che ritorna {contatore: righe}; tutto 0 = finito
+TASKS = {
+    "archive_slots": _archive_task,
+    "password_reset_tokens": _reset_tokens_task,
+    "email_outbox": _outbox_task,
+    "booking_counters": _counters_task,  # dopo l'archivio, che li aggiorna
+}
+
+
+def run_once(batch_size: int | None = None, max_batches: int | None = None) -> dict:
+    """
+    Esegue tutti i TASKS fino a esaurimento (o max_batches per task).
+    Ritorna e salva in last_report righe trattate, batch e durata.
+    """
+    global last_report
+    batch_size = batch_size or settings.CLEANUP_BATCH_SIZE
+    max_batches = max_batches or settings.CLEANUP_MAX_BATCHES
+    started = time.perf_counter()
+    report: dict = {"started_at": datetime.now().isoformat(timespec="seconds"), "tasks": {}}
+
+    if not _local_lock.acquire(blocking=False):
+        report["skipped"] = "già in corso in questo processo"
+        return report
+    try:
+        for name, task in TASKS.items():
+            t0 = time.perf_counter()
+            counts: dict[str, int] = {}
+            batches = 0
+            skipped = False
+            while batches < max_batches:
+                with SessionLocal() as db:
+                    if not _try_lock(db):
+                        skipped = True  # lo sta facendo un altro processo
+                        break
+                    done = task(db, batch_size)
+                    db.commit()
+                batches += 1
+                for k, v in done.items():
+                    counts[k] = counts.get(k, 0) + v
+                if not any(done.values()):
+                    break
+            report["tasks"][name] = {
+                **counts,
+                "batches": batches,
+                "ms": round((time.perf_counter() - t0) * 1000, 1),
+                **({"skipped": "lock occupato"} if skipped else {}),
+            }
+    finally:
+        _local_lock.release()
+
+    report["ms"] = round((time.perf_counter() - started) * 1000, 1)
+    last_report = report
+    print(f"Cleanup: {report['tasks']} ({report['ms']}ms)")
+    return report
+
+
+def _loop() -> None:
+    # primo giro sfasato: con più worker non partono tutti insieme
+    wait = random.uniform(5, 30)
+    while not _stop.wait(wait):
+        try:
+            run_once()
+        except Exception as e:
+            print("Cleanup error:", e)
+        wait = settings.CLEANUP_INTERVAL_SEC * random.uniform(0.9, 1.1)
+
+
+def start() -> None:
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="cleanup-worker", daemon=True)
+    _thread.start()
+
+
+def stop(timeout: float = 5.0) -> None:
+    _stop.set()
+    if _thread:
+        _thread.join(timeout)
+
+
+if __name__ == "__main__":
+    import json
+
+    print(json.dumps(run_once(), indent=2))
@@ -0,0 +1,258 @@
+# backend/app/services/outbox.py
+"""
+Outbox delle email: gli handler non parlano più con Gmail.
+
+Lato request, enqueue(db, ...) scrive le righe email_outbox nella stessa
+transazione della modifica. Quindi:
+  - se la transazione fallisce non parte nessuna email
+  - se il commit riesce l'email non si perde, anche se il processo muore subito dopo
+  - dedup_key unico: la stessa notifica allo stesso indirizzo si accoda una volta sola
+
+Lato worker, un thread per processo (start/stop da main.py) si sveglia a ogni
+commit che ha accodato qualcosa, o al più ogni OUTBOX_POLL_SEC. Per ogni giro:
+  1. prende in lease fino a OUTBOX_BATCH righe scadute: transazione breve,
+     FOR UPDATE SKIP LOCKED su PostgreSQL, così più processi non si pestano i
+     piedi. Il lease sposta next_attempt_at avanti di OUTBOX_LEASE_SEC: se il
+     processo muore durante l'invio la riga torna disponibile da sola.
+  2. invia fuori dal DB tutte le righe prese con il trasporto del processo
+     (services.email_transport: Gmail in batch, SMTP, capture), un esito per email
+  3. registra gli esiti in un'altra transazione breve:
+     - SENT (il corpo viene svuotato)
+     - retry con backoff esponenziale + jitter
+     - FAILED dopo OUTBOX_MAX_ATTEMPTS tentativi
+La consegna è "almeno una volta": un crash tra invio e registrazione può
+produrre un doppione.
+
+Uso manuale:
+    python -m backend.app.services.outbox   # un giro di invii
+"""
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.email_outbox import EmailOutbox, OutboxStatus
+from . import email_transport
+from .email_transport import Email
+
+_WAKE_KEY = "outbox_wake"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# -----------------------------------------------------------------------------
+# Lato request
+# -----------------------------------------------------------------------------
+def enqueue(db: Session, addresses: list[str], subject: str, html: str, key: str | None = None) -> int:
+    """
+    Accoda una email per indirizzo nella transazione di `db` (non fa commit).
+    Con `key` la dedup_key è "<key>:<indirizzo minuscolo>": una seconda
+    enqueue con la stessa key non aggiunge niente. Ritorna le righe accodate.
+    """
+    now = _now()
+    rows = [
+        {
+            "dedup_key": f"{key}:{a.strip().lower()}"[:255] if key else None,
+            "to_addr": a.strip(),
+            "subject": subject[:300],
+            "html": html,
+            "status": OutboxStatus.PENDING,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        }
+        for a in addresses
+        if a and a.strip()
+    ]
+    if not rows:
+        return 0
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    res = db.execute(
+        insert(EmailOutbox).values(rows).on_conflict_do_nothing(index_elements=[EmailOutbox.dedup_key])
+    )
+    db.info[_WAKE_KEY] = True
+    return res.rowcount if res.rowcount is not None and res.rowcount >= 0 else len(rows)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _wake_after_commit(session):
+    if session.info.pop(_WAKE_KEY, False):
+        _wake.set()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _forget_wake(session):
+    session.info.pop(_WAKE_KEY, None)
+
+
+# -----------------------------------------------------------------------------
+# Worker
+# -----------------------------------------------------------------------------
+def _backoff(attempts: int) -> timedelta:
+    base = settings.OUTBOX_BACKOFF_BASE_SEC * 2 ** max(0, attempts - 1)
+    return timedelta(seconds=min(base, settings.OUTBOX_BACKOFF_MAX_SEC) * random.uniform(0.8, 1.2))
+
+
+def _claim(db: Session, limit: int, now: datetime) -> list:
+    due = (
+        select(EmailOutbox.id)
+        .where(EmailOutbox.status == OutboxStatus.PENDING, EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+        .limit(limit)
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        due = due.with_for_update(skip_locked=True)
+    return db.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(due.scalar_subquery()))
+        .values(
+            next_attempt_at=now + timedelta(seconds=settings.OUTBOX_LEASE_SEC),
+            attempts=EmailOutbox.attempts + 1,
+        )
+        .returning(EmailOutbox.id, EmailOutbox.to_addr, EmailOutbox.subject, EmailOutbox.html, EmailOutbox.attempts)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+
+def _record(db: Session, rows: list, errors: list[str | None]) -> dict[str, int]:
+    now = _now()
+    out = {"sent": 0, "retry": 0, "failed": 0}
+    params = []
+    for row, err in zip(rows, errors):
+        if err is None:
+            out["sent"] += 1
+            params.append({"id": row.id, "status": OutboxStatus.SENT, "sent_at": now, "html": "", "last_error": None})
+        elif row.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            out["failed"] += 1
+            print(f"Outbox: email {row.id} a {row.to_addr} fallita dopo {row.attempts} tentativi: {err}")
+            params.append({"id": row.id, "status": OutboxStatus.FAILED, "last_error": err})
+        else:
+            out["retry"] += 1
+            params.append({"id": row.id, "next_attempt_at": now + _backoff(row.attempts), "last_error": err})
+    # UPDATE per chiave primaria, raggruppati per insieme di colonne
+    by_cols: dict[tuple, list[dict]] = {}
+    for p in params:
+        by_cols.setdefault(tuple(sorted(p)), []).append(p)
+    for group in by_cols.values():
+        db.execute(update(EmailOutbox), group)
+    return out
+
+
+# chiamate all'inizio di ogni giro, es. services.digest che accoda i riepiloghi scaduti
+_before_round: list = []
+
+
+def before_round(fn):
+    """Registra fn() da chiamare prima di ogni giro del worker (decoratore)."""
+    _before_round.append(fn)
+    return fn
+
+
+def run_once(limit: int | None = None) -> dict[str, int]:
+    """Un giro: lease, invio (email_transport), esiti. Ritorna i contatori (claimed = righe prese)."""
+    limit = limit or settings.OUTBOX_BATCH
+    for fn in _before_round:
+        try:
+            fn()
+        except Exception as e:
+            print(f"Outbox: {fn.__module__}.{fn.__name__} error:", e)
+    with SessionLocal() as db:
+        rows = _claim(db, limit, _now())
+        db.commit()
+    if not rows:
+        return {"claimed": 0, "sent": 0, "retry": 0, "failed": 0}
+
+    errors = email_transport.get().send_many([Email(r.to_addr, r.subject, r.html) for r in rows])
+
+    with SessionLocal() as db:
+        out = _record(db, rows, errors)
+        db.commit()
+    return {"claimed": len(rows), **out}
+
+
+def purge(db: Session, batch_size: int) -> int:
+    """Elimina al massimo batch_size righe SENT/FAILED più vecchie di OUTBOX_RETENTION_DAYS. Non fa commit."""
+    cutoff = _now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    ids = select(EmailOutbox.id).where(
+        EmailOutbox.status != OutboxStatus.PENDING, EmailOutbox.created_at < cutoff
+    ).limit(batch_size)
+    return db.execute(
+        delete(EmailOutbox).where(EmailOutbox.id.in_(ids.scalar_subquery()))
+    ).rowcount or 0
+
+
+def stats(db: Session) -> dict:
+    """Righe per stato, età della più vecchia in coda e ultimi errori (per /ops/outbox)."""
+    counts = {s.value: 0 for s in OutboxStatus}
+    for st, n in db.execute(select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status)):
+        counts[OutboxStatus(st).value] = n
+    oldest = db.scalar(
+        select(func.min(EmailOutbox.created_at)).where(EmailOutbox.status == OutboxStatus.PENDING)
+    )
+    errors = db.execute(
+        select(EmailOutbox.id, EmailOutbox.to_addr, EmailOutbox.subject, EmailOutbox.status,
+               EmailOutbox.attempts, EmailOutbox.last_error)
+        .where(EmailOutbox.last_error.is_not(None))
+        .order_by(EmailOutbox.id.desc())
+        .limit(10)
+    ).all()
+    return {
+        "transport": email_transport.get().name,
+        "counts": counts,
+        "oldest_pending": oldest.isoformat() if oldest else None,
+        "recent_errors": [
+            {"id": r.id, "to": r.to_addr, "subject": r.subject, "status": OutboxStatus(r.status).value,
+             "attempts": r.attempts, "error": r.last_error}
+            for r in errors
+        ],
+    }
+
+
+_wake = threading.Event()
+_stop = threading.Event()
+_thread: threading.Thread | None = None
+
+
+def _loop() -> None:
+    while not _stop.is_set():
+        _wake.clear()
+        claimed = 0
+        try:
+            claimed = run_once()["claimed"]
+        except Exception as e:
+            print("Outbox error:", e)
+        if claimed < settings.OUTBOX_BATCH:
+            _wake.wait(settings.OUTBOX_POLL_SEC)
+
+
+def start() -> None:
+    global _thread
+    if _thread and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name="outbox-worker", daemon=True)
+    _thread.start()
+
+
+def stop(timeout: float = 5.0) -> None:
+    _stop.set()
+    _wake.set()
+    if _thread:
+        _thread.join(timeout)
+
+
+if __name__ == "__main__":
+    import json
+
+    t0 = time.perf_counter()
+    res = run_once()
+    print(json.dumps({**res, "ms": round((time.perf_counter() - t0) * 1000, 1)}, indent=2))
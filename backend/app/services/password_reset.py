@@ -0,0 +1,91 @@
+# backend/app/services/password_reset.py
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.password_reset import PasswordResetToken
+
+
+def token_digest(token: str) -> str:
+    """Digest a lunghezza fissa (64 char) usato come chiave di lookup."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def issue_token(db: Session, user_id: int) -> str:
+    """
+    Crea un nuovo token per l'utente e ritorna il valore in chiaro (da mettere
+    nel link). Oltre PASSWORD_RESET_MAX_PER_USER token attivi, i più vecchi
+    vengono eliminati: /auth/forgot ripetuto non fa crescere la tabella.
+    """
+    keep = max(1, settings.PASSWORD_RESET_MAX_PER_USER) - 1
+    stale_ids = select(PasswordResetToken.id).where(
+        PasswordResetToken.user_id == user_id
+    ).order_by(PasswordResetToken.id.desc()).offset(keep)
+    db.execute(
+        delete(PasswordResetToken).where(PasswordResetToken.id.in_(stale_ids.scalar_subquery()))
+    )
+
+    token = secrets.token_urlsafe(48)
+    db.add(
+        PasswordResetToken(
+            user_id=user_id,
+            token_hash=token_digest(token),
+            expires_at=datetime.now(timezone.utc)
+            + timedelta(minutes=settings.PASSWORD_RESET_TTL_MIN),
+            used=False,
+        )
+    )
+    return token
+
+
+def _valid(token: str):
+    return (
+        PasswordResetToken.token_hash == token_digest(token),
+        PasswordResetToken.used == False,
+        PasswordResetToken.expires_at > datetime.now(timezone.utc),
+    )
+
+
+def peek_token(db: Session, token: str) -> int | None:
+    """Solo lettura: lo user_id se il token è ancora valido, senza consumarlo."""
+    return db.scalar(select(PasswordResetToken.user_id).where(*_valid(token)))
+
+
+def consume_token(db: Session, token: str) -> int | None:
+    """
+    Marca il token come usato e ritorna lo user_id, in un solo UPDATE sull'indice
+    unico di token_hash. Ritorna None se inesistente, già usato o scaduto: due
+    reset concorrenti con lo stesso token non possono passare entrambi.
+    """
+    return db.execute(
+        update(PasswordResetToken)
+        .where(*_valid(token))
+        .values(used=True)
+        .returning(PasswordResetToken.user_id)
+    ).scalar_one_or_none()
+
+
+def revoke_user_tokens(db: Session, user_id: int) -> None:
+    """Dopo un reset riuscito nessun altro link dell'utente deve restare valido."""
+    db.execute(delete(PasswordResetToken).where(PasswordResetToken.user_id == user_id))
+
+
+def purge_expired(db: Session, batch_size: int = 500) -> int:
+    """
+    Elimina al massimo `batch_size` token scaduti o usati (un batch per
+    chiamata, transazioni brevi). Ritorna quante righe ha rimosso.
+    """
+    now = datetime.now(timezone.utc)
+    ids = (
+        select(PasswordResetToken.id)
+        .where(or_(PasswordResetToken.used == True, PasswordResetToken.expires_at <= now))
+        .limit(batch_size)
+    )
+    res = db.execute(
+        delete(PasswordResetToken).where(PasswordResetToken.id.in_(ids.scalar_subquery()))
+    )
+    return res.rowcount or 0
@@ -0,0 +1,170 @@
+# backend/app/services/recipients.py
+"""
+A chi mandare le notifiche, senza query a ogni invio.
+
+Una fotografia per processo, caricata al primo uso (2 query):
+  - manager: MANAGER_EMAILS da .env (CSV, ; o newline), se vuoto i manager
+    attivi nel DB
+  - opt-out: per email (minuscola) gli eventi per cui l'utente non vuole
+    email (notification_opt_outs)
+
+Si butta via dopo il commit di una modifica ORM che la cambia: utente
+creato/eliminato, o con ruolo, stato attivo o email cambiati, o opt-out
+aggiunto/tolto (stesso schema di core.user_cache). Le modifiche fatte da
+altri processi o a mano sul DB valgono al più dopo RECIPIENTS_CACHE_TTL_SEC.
+"""
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.notification_pref import NotificationOptOut
+from ..models.user import User, Role
+
+# eventi che si possono disattivare (chiave usata da routers/booking.py)
+EVENTS = {
+    "request": "Nuova richiesta di prenotazione (producer)",
+    "producer_accept": "Richiesta accettata dal producer",
+    "producer_reject": "Richiesta rifiutata dal producer",
+    "manager_accept": "Prenotazione confermata",
+    "manager_reject": "Prenotazione rifiutata dal manager",
+    "producer_cancel": "Prenotazione annullata dal producer",
+    "artist_cancel": "Prenotazione annullata dall'artista",
+}
+
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_SPLIT_RE = re.compile(r"[,\n;]+")
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    managers: tuple[str, ...]
+    opt_out: dict[str, frozenset[str]]
+    expires_at: float
+
+
+_lock = threading.Lock()
+_snapshot: _Snapshot | None = None
+_generation = 0  # cambia a ogni invalidate: un caricamento partito prima non viene salvato
+loads = 0
+
+
+def _dedup(addresses) -> list[str]:
+    """Pulisce e deduplica case-insensitive, mantenendo l'ordine."""
+    seen = set()
+    out: list[str] = []
+    for a in addresses or []:
+        a = (a or "").strip()
+        key = a.lower()
+        if key and key not in seen:
+            seen.add(key)
+            out.append(a)
+    return out
+
+
+def _env_managers() -> list[str]:
+    raw = (settings.MANAGER_EMAILS or "").strip()
+    return _dedup(p for p in _SPLIT_RE.split(raw) if _EMAIL_RE.match(p.strip())) if raw else []
+
+
+def _load(db: Session) -> tuple[tuple[str, ...], dict[str, frozenset[str]]]:
+    managers = _env_managers()
+    if not managers:
+        managers = _dedup(
+            db.scalars(
+                select(User.email).where(User.role == Role.MANAGER, User.is_active == True).order_by(User.id)
+            )
+        )
+    opt_out: dict[str, set[str]] = {}
+    for email, ev in db.execute(
+        select(User.email, NotificationOptOut.event).join(User, User.id == NotificationOptOut.user_id)
+    ):
+        if email:
+            opt_out.setdefault(email.strip().lower(), set()).add(ev)
+    return tuple(managers), {k: frozenset(v) for k, v in opt_out.items()}
+
+
+def _current(db: Session) -> _Snapshot:
+    global _snapshot, loads
+    with _lock:
+        snap, gen = _snapshot, _generation
+    if snap is not None and snap.expires_at > time.monotonic():
+        return snap
+    managers, opt_out = _load(db)
+    snap = _Snapshot(managers, opt_out, time.monotonic() + settings.RECIPIENTS_CACHE_TTL_SEC)
+    with _lock:
+        loads += 1
+        if _generation == gen:
+            _snapshot = snap
+    return snap
+
+
+def invalidate() -> None:
+    global _snapshot, _generation
+    with _lock:
+        _snapshot = None
+        _generation += 1
+
+
+def allowed(db: Session, addresses: list[str], event: str) -> list[str]:
+    """addresses deduplicati, senza chi ha disattivato le email di `event`."""
+    opt_out = _current(db).opt_out
+    return [a for a in _dedup(addresses) if event not in opt_out.get(a.lower(), ())]
+
+
+def managers(db: Session, event: str) -> list[str]:
+    """Indirizzi dei manager che vogliono le email di `event`."""
+    return allowed(db, list(_current(db).managers), event)
+
+
+def stats() -> dict:
+    with _lock:
+        snap = _snapshot
+        return {
+            "loaded": snap is not None,
+            "managers": len(snap.managers) if snap else None,
+            "opt_out_users": len(snap.opt_out) if snap else None,
+            "loads": loads,
+            "generation": _generation,
+        }
+
+
+# -----------------------------------------------------------------------------
+# Invalidazione dopo il commit (come core.user_cache)
+# -----------------------------------------------------------------------------
+_PENDING_KEY = "recipients_changed"
+_USER_FIELDS = ("role", "is_active", "email")
+
+
+def _touches(session, obj) -> bool:
+    if isinstance(obj, NotificationOptOut):
+        return True
+    if not isinstance(obj, User):
+        return False
+    if obj in session.new or obj in session.deleted:
+        return True
+    attrs = inspect(obj).attrs
+    return any(attrs[f].history.has_changes() for f in _USER_FIELDS)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_changes(session, flush_context):
+    # in after_flush new/dirty/deleted e la history sono ancora quelli di prima del flush
+    if any(_touches(session, o) for o in list(session.new) + list(session.dirty) + list(session.deleted)):
+        session.info[_PENDING_KEY] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_after_commit(session):
+    if session.info.pop(_PENDING_KEY, False):
+        invalidate()
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
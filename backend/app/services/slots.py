@@ -0,0 +1,102 @@
+# backend/app/services/slots.py
+"""
+Generazione e inserimento massivo degli slot di disponibilità.
+
+Gli slot di un manager sono unici per (manager_id, date, start_time, end_time)
+tra quelli non eliminati (indice ux_slots_live_manager_slot): l'inserimento
+usa INSERT ... ON CONFLICT DO NOTHING su quell'indice, quindi i doppioni li
+scarta il DB senza pre-letture e senza race tra due manager/tab in parallelo.
+"""
+from datetime import date, datetime, time, timedelta
+from typing import Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..models.slot import AvailabilitySlot, SlotStatus
+
+LIVE_SLOT_INDEX = "ux_slots_live_manager_slot"
+LIVE_SLOT_COLS = ("manager_id", "date", "start_time", "end_time")
+
+# righe per singolo INSERT multi-VALUES: 6 colonne x 500 = 3000 parametri,
+# sotto i limiti di SQLite >= 3.32 (32766) e Postgres (65535) senza
+# frammentare troppo
+_CHUNK = 500
+
+
+def day_times(start: time, end: time, step_minutes: int) -> list[tuple[time, time]]:
+    """
+    Coppie (inizio, fine) di durata step_minutes da start a end nello stesso
+    giorno; end = 00:00 vale come mezzanotte successiva. Lista vuota se la
+    finestra è vuota o più corta di uno step.
+    """
+    base = date(2000, 1, 1)
+    start_dt = datetime.combine(base, start)
+    end_dt = datetime.combine(base, end)
+    if end == time(0, 0):
+        end_dt += timedelta(days=1)
+    step = timedelta(minutes=step_minutes)
+
+    out: list[tuple[time, time]] = []
+    cur = start_dt
+    while cur + step <= end_dt:
+        out.append((cur.time(), (cur + step).time()))
+        cur += step
+    return out
+
+
+def days_in_range(date_from: date, date_to: date, weekdays: Iterable[int] | None = None) -> list[date]:
+    """Giorni da date_from a date_to inclusi, filtrati per weekday (0 = lunedì)."""
+    mask = set(weekdays) if weekdays is not None else None
+    out = []
+    d = date_from
+    while d <= date_to:
+        if mask is None or d.weekday() in mask:
+            out.append(d)
+        d += timedelta(days=1)
+    return out
+
+
+def _insert_stmt(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Dialect non supportato per l'inserimento slot: {dialect}")
+    return insert(AvailabilitySlot).on_conflict_do_nothing(
+        index_elements=list(LIVE_SLOT_COLS),
+        index_where=text("is_deleted = false" if dialect == "postgresql" else "is_deleted = 0"),
+    )
+
+
+def insert_slots(db: Session, manager_id: int, days: Iterable[date], times: list[tuple[time, time]]) -> int:
+    """
+    Inserisce il prodotto days x times come slot LIBERO del manager, a blocchi
+    di _CHUNK righe. Ritorna quanti ne ha creati davvero (gli altri esistevano
+    già). Non fa commit.
+    """
+    insert = _insert_stmt(db.get_bind().dialect.name)
+    rows = (
+        {
+            "manager_id": manager_id,
+            "date": d,
+            "start_time": st,
+            "end_time": et,
+            "status": SlotStatus.LIBERO,
+            "is_deleted": False,
+        }
+        for d in days
+        for st, et in times
+    )
+
+    created = 0
+    chunk: list[dict] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == _CHUNK:
+            created += db.execute(insert.values(chunk)).rowcount
+            chunk = []
+    if chunk:
+        created += db.execute(insert.values(chunk)).rowcount
+    return created
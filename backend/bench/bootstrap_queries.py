@@ -0,0 +1,167 @@
+# backend/bench/bootstrap_queries.py
+"""
+Conteggio query/connessioni del primo caricamento delle dashboard.
+
+Per ogni ruolo confronta le GET che la dashboard faceva una per una con
+GET /booking/bootstrap, e verifica che il bootstrap resti nel budget:
+una sola connessione presa dal pool e al massimo MAX_QUERIES[ruolo] statement
+(con la cache utenti già calda; a freddo +1 per il controllo del token).
+Con If-None-Match dell'ultima risposta deve bastare la query delle versioni.
+
+    python -m backend.bench.bootstrap_queries                 # SQLite temporaneo
+    DB_URL=postgresql+psycopg2://... SECRET_KEY=x python -m backend.bench.bootstrap_queries
+
+Su un DB esistente crea utenti/slot/regole con email "boot-*" e li ripulisce.
+Esce con 1 se un budget è superato.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import uuid
+from datetime import date, time as dtime, timedelta
+
+# statement per GET /booking/bootstrap (cache utenti calda, cache calendario vuota)
+MAX_QUERIES = {"ARTIST": 9, "PRODUCER": 3, "MANAGER": 6}
+
+# quello che le dashboard chiamavano al caricamento, prima del bootstrap
+LEGACY = {
+    "ARTIST": [
+        "/auth/me",
+        "/users?role=PRODUCER",
+        "/booking/availability",
+        "/booking/availability/summary",
+        "/booking/agenda/confirmed",
+    ],
+    "PRODUCER": ["/auth/me", "/booking/producer/incoming", "/booking/agenda/confirmed"],
+    "MANAGER": [
+        "/auth/me",
+        "/booking/manager/pending",
+        "/booking/manager/slots",
+        "/booking/manager/rules",
+        "/booking/manager/exceptions",
+        "/booking/agenda/confirmed",
+    ],
+}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--slots", type=int, default=50, help="slot salvati da creare")
+    args = ap.parse_args()
+
+    if "DB_URL" not in os.environ:
+        tmp = tempfile.mkdtemp(prefix="bootstrap-")
+        os.environ["DB_URL"] = f"sqlite:///{tmp}/bench.db"
+    os.environ.setdefault("SECRET_KEY", "bench")
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import delete, event, select
+
+    from backend.app import migrations
+    from backend.app.main import app
+    from backend.app.core.security import create_access_token
+    from backend.app.core.user_cache import user_cache
+    from backend.app.database import SessionLocal, engine
+    from backend.app.models.availability_rule import AvailabilityRule
+    from backend.app.models.booking import Booking, BookingStatus
+    from backend.app.models.slot import AvailabilitySlot, SlotStatus
+    from backend.app.models.user import User, Role
+    from backend.app.services import availability
+
+    migrations.upgrade()
+    tag = uuid.uuid4().hex[:8]
+    with SessionLocal() as db:
+        manager = User(email=f"boot-{tag}-m@example.com", password_hash="-", role=Role.MANAGER)
+        producer = User(email=f"boot-{tag}-p@example.com", password_hash="-", role=Role.PRODUCER)
+        artist = User(email=f"boot-{tag}-a@example.com", password_hash="-", role=Role.ARTIST)
+        db.add_all([manager, producer, artist])
+        db.flush()
+        start = date.today() + timedelta(days=1)
+        slots = [
+            AvailabilitySlot(
+                manager_id=manager.id,
+                date=start + timedelta(days=i // 8),
+                start_time=dtime(10 + i % 8, 0),
+                end_time=dtime(11 + i % 8, 0),
+                status=SlotStatus.LIBERO,
+                is_deleted=False,
+            )
+            for i in range(args.slots)
+        ]
+        db.add_all(slots)
+        db.add_all(
+            AvailabilityRule(
+                manager_id=manager.id, weekday=w, start_time=dtime(9, 0), end_time=dtime(13, 0),
+                step_minutes=60, is_deleted=False,
+            )
+            for w in range(5)
+        )
+        db.flush()
+        for s, st in zip(slots, (BookingStatus.PENDING_PRODUCER, BookingStatus.PENDING_MANAGER, BookingStatus.CONFIRMED)):
+            s.status = SlotStatus.OCCUPATO if st == BookingStatus.CONFIRMED else SlotStatus.IN_SOSPESO
+            db.add(Booking(slot_id=s.id, artist_id=artist.id, producer_id=producer.id, status=st))
+        db.commit()
+        users = {u.role.value: u for u in (manager, producer, artist)}
+        headers = {r: {"Authorization": f"Bearer {create_access_token(u)}"} for r, u in users.items()}
+        user_ids = [u.id for u in users.values()]
+
+    stats = {"queries": 0, "checkouts": 0}
+
+    def _on_query(*_):
+        stats["queries"] += 1
+
+    def _on_checkout(*_):
+        stats["checkouts"] += 1
+
+    event.listen(engine, "before_cursor_execute", _on_query)
+    event.listen(engine.pool, "checkout", _on_checkout)
+    client = TestClient(app)
+
+    def measure(path: str, role: str, extra: dict | None = None):
+        stats.update(queries=0, checkouts=0)
+        r = client.get(path, headers={**headers[role], **(extra or {})})
+        assert r.status_code in (200, 304), f"{path} {role}: {r.status_code} {r.text[:200]}"
+        return r, stats["queries"], stats["checkouts"]
+
+    failures = 0
+    try:
+        for role, paths in LEGACY.items():
+            availability._summary_cache.clear()
+            legacy_q = legacy_c = 0
+            for p in paths:
+                _, q, c = measure(p, role)
+                legacy_q += q
+                legacy_c += c
+
+            user_cache.clear()
+            availability._summary_cache.clear()
+            _, cold_q, _ = measure("/booking/bootstrap", role)
+            availability._summary_cache.clear()
+            r, warm_q, warm_c = measure("/booking/bootstrap", role)
+            _, nm_q, _ = measure("/booking/bootstrap", role, {"If-None-Match": r.headers["ETag"]})
+
+            ok = warm_q <= MAX_QUERIES[role] and warm_c == 1 and nm_q == 1 and r.json()["me"]["role"] == role
+            failures += not ok
+            print(
+                f"{role:<9} {'OK ' if ok else 'FAIL'} prima: {len(paths)} richieste, {legacy_q} query, "
+                f"{legacy_c} connessioni | bootstrap: {warm_q} query (a freddo {cold_q}, "
+                f"max {MAX_QUERIES[role]}), {warm_c} connessione, 304 con {nm_q} query"
+            )
+    finally:
+        event.remove(engine, "before_cursor_execute", _on_query)
+        event.remove(engine.pool, "checkout", _on_checkout)
+        with SessionLocal() as db:
+            slot_ids = db.scalars(
+                select(AvailabilitySlot.id).where(AvailabilitySlot.manager_id.in_(user_ids))
+            ).all()
+            db.execute(delete(Booking).where(Booking.slot_id.in_(slot_ids)))
+            db.execute(delete(AvailabilitySlot).where(AvailabilitySlot.id.in_(slot_ids)))
+            db.execute(delete(AvailabilityRule).where(AvailabilityRule.manager_id.in_(user_ids)))
+            db.execute(delete(User).where(User.id.in_(user_ids)))
+            db.commit()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
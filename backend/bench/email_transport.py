@@ -0,0 +1,192 @@
+# backend/bench/email_transport.py
+"""
+Throughput dei trasporti di services.email_transport contro un server SMTP
+finto locale (con PIPELINING e un ritardo simulato per ogni risposta, come
+la latenza di rete verso un relay vero).
+
+Confronta, a blocchi di --batch email come fa l'outbox:
+  - smtp nuovo:   connessione aperta e chiusa per ogni email (smtplib semplice)
+  - smtp pool:    SmtpTransport, connessione riusata, un comando per round-trip
+  - smtp pipe:    SmtpTransport con PIPELINING (MAIL/RCPT/DATA insieme)
+  - smtp pipe xN: come sopra con --pool connessioni in parallelo
+  - capture:      CaptureTransport in memoria (il tetto: niente rete)
+Ogni 25 email un destinatario "fail-..." viene rifiutato dal server SMTP:
+il suo esito (e solo il suo) deve essere un errore.
+
+    python -m backend.bench.email_transport
+    python -m backend.bench.email_transport --emails 500 --rtt-ms 10 --pool 4
+
+Esce con 1 se gli esiti per email non tornano o se pool/pipelining non
+sono più veloci della connessione per email.
+"""
+import argparse
+import os
+import smtplib
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _fake_smtp(rtt_ms: float, connect_ms: float):
+    stats = {"connections": 0, "messages": 0, "flushes": 0}
+    lock = threading.Lock()
+
+    class Handler(socketserver.BaseRequestHandler):
+        def _reply(self, sock, replies: list[bytes]) -> None:
+            # una risposta (o un gruppo, col pipelining) = un round-trip
+            time.sleep(rtt_ms / 1000)
+            sock.sendall(b"".join(replies))
+            with lock:
+                stats["flushes"] += 1
+
+        def handle(self):
+            sock = self.request
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with lock:
+                stats["connections"] += 1
+            time.sleep(connect_ms / 1000)  # handshake TCP/TLS
+            sock.sendall(b"220 bench ESMTP\r\n")
+            buf, in_data, rcpt_ok = b"", False, False
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    return
+                buf += chunk
+                replies: list[bytes] = []
+                while True:
+                    if in_data:
+                        if buf.startswith(b".\r\n"):
+                            end, skip = 0, 3
+                        else:
+                            end = buf.find(b"\r\n.\r\n")
+                            skip = 5
+                        if end < 0:
+                            break
+                        buf = buf[end + skip:]
+                        in_data = False
+                        with lock:
+                            stats["messages"] += 1
+                        replies.append(b"250 2.0.0 queued\r\n")
+                        continue
+                    i = buf.find(b"\r\n")
+                    if i < 0:
+                        break
+                    line, buf = buf[:i], buf[i + 2:]
+                    cmd = line[:4].upper()
+                    if cmd == b"EHLO":
+                        replies.append(b"250-bench\r\n250-PIPELINING\r\n250 8BITMIME\r\n")
+                    elif cmd == b"MAIL":
+                        rcpt_ok = False
+                        replies.append(b"250 2.1.0 ok\r\n")
+                    elif cmd == b"RCPT":
+                        if b"<fail-" in line.lower():
+                            replies.append(b"550 5.1.1 no such user\r\n")
+                        else:
+                            rcpt_ok = True
+                            replies.append(b"250 2.1.5 ok\r\n")
+                    elif cmd == b"DATA":
+                        if rcpt_ok:
+                            in_data = True
+                            replies.append(b"354 go ahead\r\n")
+                        else:
+                            replies.append(b"554 5.5.1 no valid recipients\r\n")
+                    elif cmd == b"QUIT":
+                        self._reply(sock, replies + [b"221 bye\r\n"])
+                        return
+                    else:  # HELO, RSET, NOOP
+                        replies.append(b"250 ok\r\n")
+                if replies:
+                    self._reply(sock, replies)
+
+    srv = socketserver.ThreadingTCPServer(("127.0.0.1", _free_port()), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, stats
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emails", type=int, default=200)
+    ap.add_argument("--batch", type=int, default=20, help="email per send_many (come OUTBOX_BATCH)")
+    ap.add_argument("--rtt-ms", type=float, default=5, help="ritardo simulato per risposta del server")
+    ap.add_argument("--connect-ms", type=float, default=20, help="ritardo simulato di apertura connessione")
+    ap.add_argument("--pool", type=int, default=4, help="connessioni per 'smtp pipe xN'")
+    args = ap.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("DB_URL", "sqlite://")
+    from backend.app.services.email_transport import CaptureTransport, Email, SmtpTransport
+
+    srv, stats = _fake_smtp(args.rtt_ms, args.connect_ms)
+    host, port = srv.server_address
+    html = "<p>" + "Prenotazione confermata. " * 40 + "</p>"
+    emails = [
+        Email(f"{'fail' if i % 25 == 0 else 'r'}-{i}@example.com", f"Bench {i}", html)
+        for i in range(args.emails)
+    ]
+    expected = [e.to.startswith("fail-") for e in emails]
+
+    class NoPool(SmtpTransport):
+        # il modo semplice: connessione nuova per ogni email
+        name = "smtp nuovo"
+
+        def send_many(self, batch):
+            out = []
+            for e in batch:
+                try:
+                    with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as conn:
+                        conn.sendmail(self.sender, [e.to], self._data(e))
+                    out.append(None)
+                except smtplib.SMTPException as ex:
+                    out.append(str(ex))
+            return out
+
+    def smtp(pool: int, pipelining: bool, cls=SmtpTransport):
+        return cls(host, port, starttls=False, sender="bench@example.com", pool_size=pool, pipelining=pipelining)
+
+    runs = [
+        ("smtp nuovo", smtp(1, False, NoPool)),
+        ("smtp pool", smtp(1, False)),
+        ("smtp pipe", smtp(1, True)),
+        (f"smtp pipe x{args.pool}", smtp(args.pool, True)),
+        ("capture", CaptureTransport(quiet=True)),
+    ]
+    rate: dict[str, float] = {}
+    failures = 0
+    try:
+        for name, transport in runs:
+            stats.update(connections=0, messages=0, flushes=0)
+            results: list[str | None] = []
+            t0 = time.perf_counter()
+            for i in range(0, len(emails), args.batch):
+                results.extend(transport.send_many(emails[i:i + args.batch]))
+            wall = time.perf_counter() - t0
+            transport.close()
+            # capture non rifiuta niente
+            ok = [r is not None for r in results] == (expected if isinstance(transport, SmtpTransport) else [False] * len(emails))
+            failures += not ok
+            rate[name] = len(emails) / wall
+            print(
+                f"{name:<14} {'OK ' if ok else 'FAIL'} {len(emails)} email in {wall:6.2f}s = {rate[name]:8.1f} email/s | "
+                f"connessioni={stats['connections']} round-trip={stats['flushes']} "
+                f"rifiutate={sum(r is not None for r in results)}"
+            )
+    finally:
+        srv.shutdown()
+
+    faster = rate["smtp nuovo"] < rate["smtp pool"] < rate["smtp pipe"]
+    if not faster:
+        print("FAIL pool/pipelining non più veloci della connessione per email")
+    return 1 if failures or not faster else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,261 @@
+# backend/bench/gmail_client.py
+"""
+Latenza per email di services.email_gmail contro un server finto locale
+(token endpoint OAuth + Gmail API), con ritardi simulati di rete.
+
+Invio singolo, per email:
+  - prima: client e credenziali ricostruiti a ogni invio (refresh del token
+    + build del client ogni volta, come faceva _gmail_service)
+  - dopo:  client del processo, token rinnovato solo vicino alla scadenza
+
+Notifiche a più destinatari (send_many), per notifica:
+  - ciclo:   una send_email_html per destinatario (il vecchio _send_to_many)
+  - thread:  send_many con GMAIL_BATCH=False (EMAIL_SEND_THREADS in parallelo)
+  - batch:   send_many con il batch HTTP di Gmail, un round-trip
+Un destinatario per notifica ("fail-...") viene rifiutato dal server finto:
+l'esito deve tornare solo su quella email.
+
+    python -m backend.bench.gmail_client
+    python -m backend.bench.gmail_client --emails 100 --threads 4 --token-ms 150
+    python -m backend.bench.gmail_client --recipients 8 --notifications 20
+
+Esce con 1 se "dopo" chiede il token più di una volta (a token non scaduto),
+non è più veloce di "prima", se il batch non è più veloce del ciclo o se gli
+esiti per email non tornano.
+"""
+import argparse
+import base64
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+
+def _pct(values: list[float], p: float) -> float:
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _gmail_reply(raw_json: bytes) -> tuple[int, dict]:
+    # il server finto rifiuta i destinatari "fail-..."
+    raw = json.loads(raw_json or b"{}").get("raw", "")
+    mime = base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4))
+    if b"\nto: fail-" in mime.lower():
+        return 400, {"error": {"code": 400, "message": "Invalid To header"}}
+    return 200, {"id": str(time.time_ns()), "labelIds": ["SENT"]}
+
+
+def _batch_reply(content_type: str, body: bytes) -> tuple[str, bytes, int]:
+    """Risposta multipart/mixed a una batch request (formato di googleapiclient)."""
+    msg = BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+    out, n = [], 0
+    for part in msg.get_payload():
+        inner = part.get_payload(decode=False)
+        inner_body = inner.split("\r\n\r\n", 1)[1] if "\r\n\r\n" in inner else inner.split("\n\n", 1)[-1]
+        status, reply = _gmail_reply(inner_body.encode())
+        n += 1
+        out.append(
+            f"--END\r\nContent-Type: application/http\r\nContent-ID: <response-{part['Content-ID'][1:-1]}>\r\n\r\n"
+            f"HTTP/1.1 {status} {'OK' if status == 200 else 'Bad Request'}\r\nContent-Type: application/json\r\n\r\n"
+            f"{json.dumps(reply)}\r\n"
+        )
+    return "multipart/mixed; boundary=END", ("".join(out) + "--END--\r\n").encode(), n
+
+
+def _fake_google(token_ms: float, send_ms: float, expires_in: int):
+    stats = {"token": 0, "send": 0, "batch": 0, "connections": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+        disable_nagle_algorithm = True  # header e corpo in due write: senza, +40ms di ACK ritardato
+
+        def setup(self):
+            super().setup()
+            with lock:
+                stats["connections"] += 1
+
+        def do_POST(self):
+            req = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            path = self.path.split("?")[0]
+            ctype, status = "application/json", 200
+            if path == "/token":
+                key, delay = "token", token_ms
+                data = json.dumps(
+                    {"access_token": f"tok-{time.time_ns()}", "expires_in": expires_in, "token_type": "Bearer"}
+                ).encode()
+            elif path.endswith("/messages/send"):
+                key, delay = "send", send_ms
+                status, reply = _gmail_reply(req)
+                data = json.dumps(reply).encode()
+            elif path == "/batch/gmail/v1":
+                ctype, data, parts = _batch_reply(self.headers["Content-Type"], req)
+                key, delay = "batch", send_ms + 2 * parts  # un round-trip, poco lavoro in più per parte
+            else:
+                self.send_error(404)
+                return
+            with lock:
+                stats[key] += 1
+            time.sleep(delay / 1000)
+            self.send_response(status)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *_):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", _free_port()), Handler)
+    srv.daemon_threads = True
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, stats
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--emails", type=int, default=40)
+    ap.add_argument("--threads", type=int, default=4, help="invii in parallelo (come EMAIL_SEND_THREADS)")
+    ap.add_argument("--token-ms", type=float, default=80, help="latenza simulata del token endpoint")
+    ap.add_argument("--send-ms", type=float, default=40, help="latenza simulata di messages.send")
+    ap.add_argument("--expires-in", type=int, default=3600, help="durata access token del server finto")
+    ap.add_argument("--recipients", type=int, default=5, help="destinatari per notifica (send_many)")
+    ap.add_argument("--notifications", type=int, default=10)
+    args = ap.parse_args()
+
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("DB_URL", "sqlite://")
+    os.environ.update(
+        {
+            "GOOGLE_CLIENT_ID": "bench-client",
+            "GOOGLE_CLIENT_SECRET": "bench-secret",
+            "GOOGLE_REFRESH_TOKEN": "bench-refresh",
+            "EMAIL_FROM": "bench@example.com",
+        }
+    )
+    from backend.app.config import settings
+    from backend.app.services import email_gmail
+
+    srv, stats = _fake_google(args.token_ms, args.send_ms, args.expires_in)
+    base = f"http://127.0.0.1:{srv.server_address[1]}"
+    email_gmail.TOKEN_URI = f"{base}/token"
+    email_gmail.API_ENDPOINT = f"{base}/"
+    email_gmail.BATCH_URI = f"{base}/batch/gmail/v1"
+
+    builds = {"n": 0}
+    real_build = email_gmail.build
+
+    def counting_build(*a, **kw):
+        builds["n"] += 1
+        return real_build(*a, **kw)
+
+    email_gmail.build = counting_build
+    html = "<p>" + "Prenotazione confermata. " * 40 + "</p>"
+
+    def legacy_send(to: str, subject: str, body: str) -> None:
+        # il vecchio _gmail_service: credenziali nuove, refresh forzato e build a ogni invio
+        msg = MIMEText(body, "html", "utf-8")
+        msg["to"], msg["from"], msg["subject"] = to, os.environ["EMAIL_FROM"], subject
+        raw = base64.urlsafe_b64encode(msg.as_bytes()).decode("utf-8")
+        creds = Credentials(
+            token=None, refresh_token="bench-refresh", token_uri=email_gmail.TOKEN_URI,
+            client_id="bench-client", client_secret="bench-secret", scopes=email_gmail.GMAIL_SCOPES,
+        )
+        creds.refresh(Request())
+        svc = counting_build(
+            "gmail", "v1", credentials=creds, cache_discovery=False,
+            client_options={"api_endpoint": email_gmail.API_ENDPOINT},
+        )
+        svc.users().messages().send(userId="me", body={"raw": raw}).execute()
+
+    def run(name: str, send) -> float:
+        email_gmail.reset()
+        stats.update(token=0, send=0, connections=0)
+        builds["n"] = 0
+        lat: list[float] = []
+
+        def one(i: int) -> None:
+            t0 = time.perf_counter()
+            send(f"r{i}@example.com", f"Bench {i}", html)
+            lat.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as pool:
+            list(pool.map(one, range(args.emails)))
+        wall = time.perf_counter() - t0
+        ms = [v * 1000 for v in lat]
+        print(
+            f"{name:<6} {len(ms)} email in {wall:6.2f}s | per email p50={_pct(ms, 50):7.1f}ms "
+            f"p95={_pct(ms, 95):7.1f}ms media={statistics.mean(ms):7.1f}ms | token={stats['token']} "
+            f"build={builds['n']} connessioni={stats['connections']}"
+        )
+        return statistics.mean(ms)
+
+    def loop_send(emails):
+        out = []
+        for e in emails:
+            try:
+                email_gmail.send_email_html(e.to, e.subject, e.html)
+                out.append(None)
+            except Exception as ex:
+                out.append(str(ex))
+        return out
+
+    def run_many(name: str, send, batch: bool) -> tuple[float, bool]:
+        settings.GMAIL_BATCH = batch
+        stats.update(token=0, send=0, batch=0, connections=0)
+        lat: list[float] = []
+        results_ok = True
+        for n in range(args.notifications):
+            emails = [
+                email_gmail.Email(f"{'fail' if i == 0 else 'm'}-{n}-{i}@example.com", f"Notifica {n}", html)
+                for i in range(args.recipients)
+            ]
+            t0 = time.perf_counter()
+            res = send(emails)
+            lat.append(time.perf_counter() - t0)
+            results_ok &= res[0] is not None and all(r is None for r in res[1:])
+        ms = [v * 1000 for v in lat]
+        print(
+            f"{name:<6} {args.notifications} notifiche x {args.recipients} destinatari | per notifica "
+            f"p50={_pct(ms, 50):7.1f}ms media={statistics.mean(ms):7.1f}ms | richieste send={stats['send']} "
+            f"batch={stats['batch']} | esiti per email {'ok' if results_ok else 'SBAGLIATI'}"
+        )
+        return statistics.mean(ms), results_ok
+
+    try:
+        before = run("prima", legacy_send)
+        after = run("dopo", email_gmail.send_email_html)
+        token_after = stats["token"]
+        loop, loop_ok = run_many("ciclo", loop_send, batch=False)
+        _, threads_ok = run_many("thread", email_gmail.send_many, batch=False)
+        batched, batch_ok = run_many("batch", email_gmail.send_many, batch=True)
+    finally:
+        srv.shutdown()
+
+    ok = after < before and (token_after <= 1 or args.expires_in < 300)
+    print(f"{'OK' if ok else 'FAIL'} media per email {before:.1f}ms -> {after:.1f}ms ({before / after:.1f}x)")
+    ok_many = batched < loop and loop_ok and threads_ok and batch_ok
+    print(f"{'OK' if ok_many else 'FAIL'} media per notifica {loop:.1f}ms -> {batched:.1f}ms ({loop / batched:.1f}x)")
+    return 0 if ok and ok_many else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
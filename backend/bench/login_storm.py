@@ -0,0 +1,165 @@
+# backend/bench/login_storm.py
+"""
+Benchmark: tempesta di login concorrenti + letture "economiche" in parallelo.
+
+Avvia l'app con uvicorn su un DB SQLite temporaneo, lancia N login concorrenti
+e nel frattempo misura la latenza di GET /booking/availability. Confronto tipico:
+
+    python -m backend.bench.login_storm --pool 0   # bcrypt inline nel threadpool
+    python -m backend.bench.login_storm --pool 2   # bcrypt nel process pool
+
+Stampa p50/p95/p99 per login e per l'endpoint non correlato.
+
+Alla fine controlla il throttle per IP dietro un proxy (TRUSTED_PROXY_HOPS=1):
+un client che manda un X-Forwarded-For diverso a ogni richiesta deve prendere
+comunque 429. Esce con 1 se non succede.
+"""
+import argparse
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _pct(values: list[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+def _report(name: str, values: list[float], errors: int) -> None:
+    ms = [v * 1000 for v in values]
+    print(
+        f"{name:<22} n={len(ms):<5} err={errors:<4} "
+        f"p50={_pct(ms, 50):8.1f}ms p95={_pct(ms, 95):8.1f}ms "
+        f"p99={_pct(ms, 99):8.1f}ms max={max(ms) if ms else float('nan'):8.1f}ms"
+    )
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pool", type=int, default=2, help="HASH_POOL_SIZE (0 = inline)")
+    ap.add_argument("--logins", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--probe-interval", type=float, default=0.02)
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="login-storm-")
+    os.environ.update(
+        {
+            "APP_ENV": "dev",
+            "SECRET_KEY": "bench",
+            "DB_URL": f"sqlite:///{tmp}/bench.db",
+            "HASH_POOL_SIZE": str(args.pool),
+            "HASH_QUEUE_MAX": str(args.logins),
+            "HASH_QUEUE_TIMEOUT_SEC": "120",
+            "LOGIN_MAX_ATTEMPTS_PER_IP": str(args.logins * 10),
+            "LOGIN_MAX_FAILURES_PER_EMAIL": str(args.logins * 10),
+            "TRUSTED_PROXY_HOPS": "1",
+        }
+    )
+
+    import requests
+    import uvicorn
+
+    from backend.app.main import app
+    from backend.app.database import Base, engine, SessionLocal
+    from backend.app.models.user import User, Role
+    from backend.app.core.hashing import pwd
+    from backend.app.routers import auth as auth_router
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        db.add(User(email="bench@example.com", password_hash=pwd.hash("pw"), role=Role.ARTIST))
+        db.commit()
+
+    port = _free_port()
+    # come in render.yaml: niente proxy headers di uvicorn, l'IP lo ricava core.throttle
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", proxy_headers=False)
+    )
+    t = threading.Thread(target=server.run, daemon=True)
+    t.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    base = f"http://127.0.0.1:{port}"
+    creds = {"email": "bench@example.com", "password": "pw"}
+    token = requests.post(f"{base}/auth/login", json=creds).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # baseline senza carico
+    idle: list[float] = []
+    for _ in range(50):
+        t0 = time.perf_counter()
+        requests.get(f"{base}/booking/availability", headers=headers)
+        idle.append(time.perf_counter() - t0)
+
+    login_lat: list[float] = []
+    probe_lat: list[float] = []
+    errors = {"login": 0, "probe": 0}
+    stop = threading.Event()
+
+    def one_login(_):
+        t0 = time.perf_counter()
+        r = requests.post(f"{base}/auth/login", json=creds)
+        login_lat.append(time.perf_counter() - t0)
+        if r.status_code != 200:
+            errors["login"] += 1
+
+    def probe():
+        s = requests.Session()
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            r = s.get(f"{base}/booking/availability", headers=headers)
+            probe_lat.append(time.perf_counter() - t0)
+            if r.status_code != 200:
+                errors["probe"] += 1
+            time.sleep(args.probe_interval)
+
+    pt = threading.Thread(target=probe)
+    pt.start()
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as ex:
+        list(ex.map(one_login, range(args.logins)))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    pt.join()
+
+    print(f"HASH_POOL_SIZE={args.pool} logins={args.logins} concurrency={args.concurrency} "
+          f"cpu={os.cpu_count()} elapsed={elapsed:.2f}s ({args.logins / elapsed:.1f} login/s)")
+    _report("availability (idle)", idle, 0)
+    _report("availability (storm)", probe_lat, errors["probe"])
+    _report("login (storm)", login_lat, errors["login"])
+    print(f"mean availability slowdown: x{statistics.mean(probe_lat) / statistics.mean(idle):.1f}")
+
+    # X-Forwarded-For a rotazione: il client scrive la voce a sinistra, il
+    # proxy aggiunge a destra l'IP che vede (sempre lo stesso)
+    limit = 5
+    auth_router._ip_throttle.max_attempts = limit
+    codes = []
+    for i in range(limit + 1):
+        xff = {"X-Forwarded-For": f"203.0.113.{i}, 198.51.100.7"}
+        codes.append(requests.post(f"{base}/auth/register", headers=xff, json={**creds, "role": "ARTIST"}).status_code)
+    ok = codes[-1] == 429 and 429 not in codes[:-1]
+    print(f"{'OK  ' if ok else 'FAIL'} throttle con X-Forwarded-For a rotazione: {codes}")
+
+    server.should_exit = True
+    t.join(timeout=5)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# backend/bench/slot_race.py
+"""
+Test di concorrenza: N thread provano a prenotare lo STESSO slot insieme.
+
+Richiede un DB di prova (meglio PostgreSQL, come in prod):
+
+    DB_URL=postgresql+psycopg2://... SECRET_KEY=x python -m backend.bench.slot_race --threads 32
+
+Crea artisti/producer/manager e uno slot LIBERO con email "race-*", fa partire
+tutti i thread su una barriera, verifica che vinca esattamente una richiesta e
+che nel DB ci sia una sola prenotazione attiva, poi ripulisce le sue righe.
+"""
+import argparse
+import sys
+import threading
+import time
+import uuid
+from datetime import date, time as dtime, timedelta
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=32)
+    ap.add_argument("--rounds", type=int, default=5)
+    args = ap.parse_args()
+
+    from sqlalchemy import delete, func, select
+
+    from backend.app import migrations
+    from backend.app.database import SessionLocal
+    from backend.app.models.booking import Booking, ACTIVE_BOOKING_STATUSES
+    from backend.app.models.slot import AvailabilitySlot, SlotStatus
+    from backend.app.models.user import User, Role
+    from backend.app.services.booking_state import claim_slot, SlotUnavailable
+
+    migrations.upgrade()
+    tag = uuid.uuid4().hex[:8]
+    with SessionLocal() as db:
+        users = [
+            User(email=f"race-{tag}-{i}@example.com", password_hash="-", role=Role.ARTIST)
+            for i in range(args.threads)
+        ]
+        manager = User(email=f"race-{tag}-m@example.com", password_hash="-", role=Role.MANAGER)
+        producer = User(email=f"race-{tag}-p@example.com", password_hash="-", role=Role.PRODUCER)
+        db.add_all(users + [manager, producer])
+        db.commit()
+        artist_ids = [u.id for u in users]
+        manager_id, producer_id = manager.id, producer.id
+        all_ids = artist_ids + [manager_id, producer_id]
+
+    failures = 0
+    try:
+        for rnd in range(args.rounds):
+            with SessionLocal() as db:
+                slot = AvailabilitySlot(
+                    manager_id=manager_id,
+                    date=date.today() + timedelta(days=365 + rnd),
+                    start_time=dtime(10, 0),
+                    end_time=dtime(11, 0),
+                    status=SlotStatus.LIBERO,
+                    is_deleted=False,
+                )
+                db.add(slot)
+                db.commit()
+                slot_id = slot.id
+
+            barrier = threading.Barrier(args.threads)
+            results: list[tuple[str, float]] = []
+            lock = threading.Lock()
+
+            def attempt(artist_id: int):
+                with SessionLocal() as db:
+                    barrier.wait()
+                    t0 = time.perf_counter()
+                    try:
+                        claim_slot(db, slot_id=slot_id, artist_id=artist_id, producer_id=producer_id)
+                        db.commit()
+                        outcome = "won"
+                    except SlotUnavailable:
+                        outcome = "409"
+                    except Exception as e:  # qualsiasi altro errore è un fallimento del test
+                        outcome = f"error: {e!r}"
+                    with lock:
+                        results.append((outcome, time.perf_counter() - t0))
+
+            threads = [threading.Thread(target=attempt, args=(a,)) for a in artist_ids]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+            with SessionLocal() as db:
+                active = db.scalar(
+                    select(func.count()).select_from(Booking).where(
+                        Booking.slot_id == slot_id, Booking.status.in_(ACTIVE_BOOKING_STATUSES)
+                    )
+                )
+                slot_status = db.get(AvailabilitySlot, slot_id).status
+
+            won = sum(1 for o, _ in results if o == "won")
+            lost = sum(1 for o, _ in results if o == "409")
+            errors = [o for o, _ in results if o not in ("won", "409")]
+            lose_ms = sorted(d * 1000 for o, d in results if o == "409")
+            ok = won == 1 and active == 1 and not errors and slot_status == SlotStatus.IN_SOSPESO
+            failures += not ok
+            print(
+                f"round {rnd + 1}: {'OK ' if ok else 'FAIL'} won={won} 409={lost} errors={len(errors)} "
+                f"active_bookings={active} slot={slot_status.value} "
+                f"409 max={lose_ms[-1] if lose_ms else 0:.1f}ms"
+            )
+            for e in errors[:3]:
+                print("   ", e)
+    finally:
+        with SessionLocal() as db:
+            slot_ids = select(AvailabilitySlot.id).where(AvailabilitySlot.manager_id == manager_id)
+            db.execute(delete(Booking).where(Booking.slot_id.in_(slot_ids)))
+            db.execute(delete(AvailabilitySlot).where(AvailabilitySlot.manager_id == manager_id))
+            db.execute(delete(User).where(User.id.in_(all_ids)))
+            db.commit()
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,6 +10,7 @@ if (!localStorage.getItem('token')) {
 
 function logout() {
   localStorage.removeItem('token');
+  localStorage.removeItem('refresh_token');
   location.href = '/frontend/auth/login.html';
 }
 
@@ -0,0 +1,61 @@
+// Aggiornamenti live dalle modifiche su slot/prenotazioni (/booking/events, SSE).
+// Usa fetch (e non EventSource) così passa dal rinnovo token di session.js;
+// riconnette da solo mandando Last-Event-ID, il server recupera gli eventi persi.
+//   live.ascolta({ booking: fn, slots: fn, reset: fn }, idIniziale)
+// idIniziale = events_id di /booking/bootstrap: arrivano anche le modifiche
+// fatte tra il caricamento della pagina e la connessione.
+// Le callback sono raggruppate: una raffica di eventi = una sola ricarica.
+(function(){
+  let ultimoId = null;
+  let attesa = 3000;
+
+  function raggruppa(fn){
+    let t = null;
+    return (dati) => { clearTimeout(t); t = setTimeout(() => fn(dati), 300); };
+  }
+
+  async function collega(gestori){
+    const token = localStorage.getItem('token');
+    if(!token) return;
+    const h = {Authorization: `Bearer ${token}`};
+    if(ultimoId) h['Last-Event-ID'] = ultimoId;
+    try{
+      const r = await fetch(`${location.origin}/booking/events`, {headers: h});
+      if(!r.ok || !r.body) throw new Error(`HTTP ${r.status}`);
+      const lettore = r.body.getReader();
+      const dec = new TextDecoder();
+      let buf = '';
+      for(;;){
+        const {value, done} = await lettore.read();
+        if(done) break;
+        buf += dec.decode(value, {stream: true});
+        let i;
+        while((i = buf.indexOf('\n\n')) >= 0){
+          const blocco = buf.slice(0, i); buf = buf.slice(i + 2);
+          const ev = {};
+          blocco.split('\n').forEach(riga => {
+            if(!riga || riga.startsWith(':')) return; // commento / heartbeat
+            const p = riga.indexOf(':');
+            ev[riga.slice(0, p)] = riga.slice(p + 1).trimStart();
+          });
+          if(ev.retry) attesa = Number(ev.retry) || attesa;
+          if(ev.id) ultimoId = ev.id;
+          const fn = ev.event && gestori[ev.event];
+          if(fn) fn(ev.data ? JSON.parse(ev.data) : {});
+        }
+      }
+    }catch(e){
+      console.warn('live:', e.message);
+    }
+    setTimeout(() => collega(gestori), attesa);
+  }
+
+  window.live = {
+    ascolta(gestori, idIniziale){
+      if(idIniziale) ultimoId = idIniziale;
+      const g = {};
+      for(const k in gestori) g[k] = raggruppa(gestori[k]);
+      collega(g);
+    }
+  };
+})();
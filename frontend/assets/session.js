@@ -0,0 +1,41 @@
+// Rinnovo automatico dell'access token (breve) con il refresh token.
+// Avvolge window.fetch: le chiamate con header Authorization usano sempre
+// il token più recente e, su 401, ritentano una volta dopo /auth/refresh.
+(function(){
+  const fetchOriginale = window.fetch.bind(window);
+  let rinnovo = null;
+
+  async function rinnova(){
+    const rt = localStorage.getItem('refresh_token');
+    if(!rt) return null;
+    const r = await fetchOriginale(`${location.origin}/auth/refresh`, {
+      method: 'POST',
+      headers: {'Content-Type': 'application/json'},
+      body: JSON.stringify({refresh_token: rt})
+    }).catch(() => null);
+    if(!r || !r.ok) return null;
+    const j = await r.json();
+    localStorage.setItem('token', j.access_token);
+    if(j.refresh_token) localStorage.setItem('refresh_token', j.refresh_token);
+    return j.access_token;
+  }
+
+  function conToken(init, tok){
+    const h = new Headers(init.headers || {});
+    h.set('Authorization', `Bearer ${tok}`);
+    return {...init, headers: h};
+  }
+
+  window.fetch = async function(input, init = {}){
+    if(!new Headers(init.headers || {}).has('Authorization')) return fetchOriginale(input, init);
+
+    const attuale = localStorage.getItem('token');
+    const r = await fetchOriginale(input, attuale ? conToken(init, attuale) : init);
+    if(r.status !== 401) return r;
+
+    // un solo refresh alla volta anche se più richieste falliscono insieme
+    rinnovo = rinnovo || rinnova().finally(() => { rinnovo = null; });
+    const nuovo = await rinnovo;
+    return nuovo ? fetchOriginale(input, conToken(init, nuovo)) : r;
+  };
+})();